@@ -4,6 +4,9 @@ import math
 import warnings
 from sys import maxsize
 import json
+from itertools import compress
+from operator import ne
+from gamelib.arena import LOCATIONS
 
 """
 
@@ -16,14 +19,21 @@ Additional functions are made available by importing the AdvancedGameState
 class from gamelib/advanced.py as a replcement for the regular GameState class 
 in game.py.
 
-You can analyze action frames by modifying algocore.py.
+You can analyze action frames by modifying algocore.py, or read their 
+events cheaply with gamelib.ActionFrame as on_action_frame does.
 
 The GameState.map object can be manually manipulated to create hypothetical 
 board states. Though, we recommended making a copy of the map to preserve 
-the actual current map state.
+the actual current map state. For pathing on a hypothetical board, 
+game_state.with_overlay(blocked=[...], unblocked=[...]) answers 
+find_path_to_edge without copying or changing the game state.
 """
 
 
+# The quadrant id of tiles outside the arena
+NO_QUADRANT = 255
+
+
 # Quadrant names
 class Quadrant:
 
@@ -36,37 +46,83 @@ class Quadrant:
     OP_LEFT = 6 # This is still left from my perspective
     OP_RIGHT = 7 # This is still right from my persective
 
-    def __init__(self):
-        
-        self.arena_size = 28
-        self.half_area = 14
-        self.left_div = 8
-        self.right_div = 19
-        self.front_back_div_me = 8
-        self.front_back_div_enemy = 19
-        
-        self.all_quadrants = (self.MY_BACK, self.MY_FRONT, self.MY_LEFT, self.MY_RIGHT, self.OP_BACK, self.OP_FRONT, self.OP_LEFT, self.OP_RIGHT)
-        
-        self.all_points = tuple([(x,y) for x in range(0,self.arena_size) for y in range(0, self.arena_size)])
-        
-        self.my_points = tuple([pt for pt in self.all_points if pt[1] < self.half_area])
-        self.enemy_points = tuple([pt for pt in self.all_points if pt[1] >= self.half_area])
-
-        self.quadrant_points = {};
-        self.quadrant_points[self.MY_BACK]  = tuple([pt for pt in self.my_points if pt[1] <= self.front_back_div_me and pt[0] > self.left_div and pt[0] < self.right_div])
-        self.quadrant_points[self.MY_FRONT] = tuple([pt for pt in self.my_points if pt[1] >  self.front_back_div_me and pt[0] > self.left_div and pt[0] < self.right_div])
-        self.quadrant_points[self.MY_LEFT]  = tuple([pt for pt in self.my_points if pt[0] <= self.left_div ])
-        self.quadrant_points[self.MY_RIGHT] = tuple([pt for pt in self.my_points if pt[0] >= self.right_div])
-        
-        self.quadrant_points[self.OP_BACK]  = tuple([pt for pt in self.enemy_points if pt[1] >= self.front_back_div_enemy and pt[0] > self.left_div and pt[0] < self.right_div])
-        self.quadrant_points[self.OP_FRONT] = tuple([pt for pt in self.enemy_points if pt[1] <  self.front_back_div_enemy and pt[0] > self.left_div and pt[0] < self.right_div])
-        self.quadrant_points[self.OP_LEFT]  = tuple([pt for pt in self.enemy_points if pt[0] <= self.left_div ])
-        self.quadrant_points[self.OP_RIGHT] = tuple([pt for pt in self.enemy_points if pt[0] >= self.right_div])
-        
+    arena_size = 28
+    half_area = 14
+    left_div = 8
+    right_div = 19
+    front_back_div_me = 8
+    front_back_div_enemy = 19
+
+    all_quadrants = (MY_BACK, MY_FRONT, MY_LEFT, MY_RIGHT, OP_BACK, OP_FRONT, OP_LEFT, OP_RIGHT)
+
+    # Built once by the first analyzer and shared by all of them:
+    #   quadrant_ids:    the quadrant of each tile, indexed by x + y * arena_size, NO_QUADRANT outside the arena
+    #   quadrant_points: the in arena points of each quadrant
+    #   tile_counts:     the number of in arena tiles of each quadrant, indexed by quadrant
+    #   all_points, my_points and enemy_points: the in arena points of the board and of each half
+    quadrant_ids = None
+    quadrant_points = None
+    tile_counts = None
+
+    def __init__(self, check=False):
+        
+        if Quadrant.quadrant_ids is None:
+            Quadrant._build_tables()
+        
+        # Running sums kept by update. With check, every update is compared with analyze
+        self.check = check
+        # (config, {UnitType: (strength per stability, danger per stability)}, the same weights by type index) for the
+        # firewall types of the last config seen, so an analyzer never holds on to older configs
+        self._weights = None
+        self.reset_running_sums()
         self.reset_firewalls_per_quadrant()
+
+    @classmethod
+    def _build_tables(cls):
+        quadrant_ids = bytearray([NO_QUADRANT] * (cls.arena_size * cls.arena_size))
+        for x, y in LOCATIONS:
+            quadrant_ids[x + y * cls.arena_size] = cls._classify(x, y)
+        cls.quadrant_points = {quad: tuple([(x, y) for x, y in LOCATIONS if quadrant_ids[x + y * cls.arena_size] == quad])
+                               for quad in cls.all_quadrants}
+        cls.tile_counts = tuple([len(cls.quadrant_points[quad]) for quad in cls.all_quadrants])
+        cls.all_points = tuple([(x, y) for x, y in LOCATIONS])
+        cls.my_points = tuple([pt for pt in cls.all_points if pt[1] < cls.half_area])
+        cls.enemy_points = tuple([pt for pt in cls.all_points if pt[1] >= cls.half_area])
+        cls.quadrant_ids = bytes(quadrant_ids)
+
+    @classmethod
+    def _classify(cls, x, y):
+        if y < cls.half_area:
+            if x <= cls.left_div:
+                return cls.MY_LEFT
+            if x >= cls.right_div:
+                return cls.MY_RIGHT
+            return cls.MY_BACK if y <= cls.front_back_div_me else cls.MY_FRONT
+        if x <= cls.left_div:
+            return cls.OP_LEFT
+        if x >= cls.right_div:
+            return cls.OP_RIGHT
+        return cls.OP_BACK if y >= cls.front_back_div_enemy else cls.OP_FRONT
+
+    def _cached_weights(self, config):
+        cached = self._weights
+        if cached is None or cached[0] is not config:
+            weights = {}
+            by_index = []
+            for index in range(3):
+                type_config = config['unitInformation'][index]
+                # Encryptors shield instead of dealing damage, so only destructors add danger
+                damage = type_config['damage'] if index == 2 else 0
+                by_index.append((1 / type_config['stability'], damage / type_config['stability']))
+                weights[gamelib.unit.get_unit_type(config, type_config['shorthand'])] = by_index[-1]
+            cached = self._weights = (config, weights, tuple(by_index))
+        return cached
+
+    def _weights_for(self, config):
+        return self._cached_weights(config)[1]
         
     def get_quadrant_points(self, quadrant):
-        return self.quadrant_points(quadrant)
+        return self.quadrant_points[quadrant]
         
     def get_my_points(self):
         return self.my_points
@@ -76,41 +132,127 @@ class Quadrant:
     
     def get_all_points(self):
         return self.all_points
+
+    def analyze(self, game_state):
+        """
+        Computes the strength and danger of every quadrant in one pass over the firewalls.
+        Strength is the health fraction of the firewalls of a quadrant, danger the damage of its destructors
+        scaled by their health fraction, both per in arena tile of the quadrant.
+        """
+        weights = self._weights_for(game_state.config)
+        quadrant_ids = self.quadrant_ids
+        arena_size = self.arena_size
+        strength = [0.0] * len(self.all_quadrants)
+        danger = [0.0] * len(self.all_quadrants)
+        for player in ('me', 'enemy'):
+            for unit in game_state.get_all_units_of_type('all', player):
+                weight = weights.get(unit.type_info)
+                if weight is None:
+                    continue
+                quad = quadrant_ids[unit.x + unit.y * arena_size]
+                strength[quad] += unit.stability * weight[0]
+                danger[quad] += unit.stability * weight[1]
+        
+        counts = self.tile_counts
+        return ({quad: strength[quad] / counts[quad] for quad in self.all_quadrants},
+                {quad: danger[quad] / counts[quad] for quad in self.all_quadrants})
+        
+    def reset_running_sums(self):
+        # (p1Units or p2Units, type index) -> the firewall list of the last update
+        self.tracked_lists = {}
+        self.quadrant_firewall_counts = [0] * len(self.all_quadrants)
+        self.strength_sums = [0.0] * len(self.all_quadrants)
+        self.danger_sums = [0.0] * len(self.all_quadrants)
+
+    def update(self, config, state):
+        """
+        Brings the running strength and danger sums up to date with the parsed game state of a new turn,
+        and returns them like analyze. The firewall lists of the state are compared with the ones of the last
+        update, and only the firewalls that were added, removed or changed stability are taken off or added
+        to the sums of their quadrant. With check, the result is compared with analyze, and the sums are
+        started again from the state if they drifted.
+        The engine sends every firewall each turn, so finding the changes still looks at every entry, but
+        with list comparisons that run in C. Only the changes are handled in Python, which makes this about
+        twice as fast as analyze, and it needs the parsed state only, not a GameState with its map.
+        """
+        type_weights = self._cached_weights(config)[2]
+        arena_size = self.arena_size
+        for key in ('p1Units', 'p2Units'):
+            for type_index in range(3):
+                listed = state[key][type_index]
+                previous = self.tracked_lists.get((key, type_index), [])
+                if listed == previous:
+                    # Most lists do not change between turns, and comparing them whole is cheaper than position by position
+                    self.tracked_lists[(key, type_index)] = listed
+                    continue
+                # Entries are compared position by position, so only the [x, y, stability, id] entries that differ are
+                # taken off and added back one by one. Whatever the order of the lists, that leaves the sums of the new list
+                shared = min(len(previous), len(listed))
+                changed = list(compress(range(shared), map(ne, previous, listed)))
+                weight = type_weights[type_index]
+                for x, y, stability, _ in [previous[i] for i in changed] + previous[shared:]:
+                    self._add_to_sums(x + y * arena_size, weight, stability, -1)
+                for x, y, stability, _ in [listed[i] for i in changed] + listed[shared:]:
+                    self._add_to_sums(x + y * arena_size, weight, stability, 1)
+                self.tracked_lists[(key, type_index)] = listed
+        
+        counts = self.tile_counts
+        result = ({quad: self.strength_sums[quad] / counts[quad] for quad in self.all_quadrants},
+                  {quad: self.danger_sums[quad] / counts[quad] for quad in self.all_quadrants})
+        if self.check:
+            expected = self.analyze(gamelib.GameState.from_state(config, state))
+            consistent = True
+            for name, values, full in zip(('strength', 'danger'), result, expected):
+                for quad in self.all_quadrants:
+                    if not math.isclose(values[quad], full[quad], rel_tol=1e-9, abs_tol=1e-9):
+                        warnings.warn("Running {} of quadrant {} is {}, recomputing it gives {}".format(name, quad, values[quad], full[quad]))
+                        consistent = False
+            if not consistent:
+                self.reset_running_sums()
+                self.update(config, state)
+                return expected
+        return result
+
+    def _add_to_sums(self, index, weight, stability, sign):
+        strength_weight, danger_weight = weight
+        quad = self.quadrant_ids[index]
+        self.quadrant_firewall_counts[quad] += sign
+        if self.quadrant_firewall_counts[quad] == 0:
+            # Exactly zero once a quadrant is empty, whatever rounding the sums picked up
+            self.strength_sums[quad] = 0.0
+            self.danger_sums[quad] = 0.0
+            return
+        self.strength_sums[quad] += sign * stability * strength_weight
+        self.danger_sums[quad] += sign * stability * danger_weight
         
     def compute_quadrant_strengths(self, game_state):
     
+        weights = self._weights_for(game_state.config)
         quad_strength = {}
         for quad in self.all_quadrants:
             numerator = 0
-            denominator = len(self.quadrant_points[quad])
             for unit in self.firewalls_per_quadrant[quad]:
-                if unit.unit_type == 'FF':
-                    orig_stab = game_state.config['unitInformation'][0]['stability']
-                elif unit.unit_type == 'EF':
-                    orig_stab = game_state.config['unitInformation'][1]['stability']
-                elif unit.unit_type == 'DF':
-                    orig_stab = game_state.config['unitInformation'][2]['stability']
-                else:
+                weight = weights.get(unit.type_info)
+                if weight is None:
                     raise ValueError('Invalid unit type')
-                    
-                numerator = numerator + unit.stability/orig_stab
+                numerator = numerator + unit.stability * weight[0]
             
-            quad_strength[quad] = numerator/float(denominator)
+            quad_strength[quad] = numerator / self.tile_counts[quad]
         
         return quad_strength
 
     def compute_quadrant_danger(self, game_state):
+        
+        weights = self._weights_for(game_state.config)
         quad_danger = {}
         for quad in self.all_quadrants:
             numerator = 0
-            denominator = len(self.quadrant_points[quad])
             for unit in self.firewalls_per_quadrant[quad]:
-                if unit.unit_type == 'DF':
-                    orig_stab = game_state.config['unitInformation'][2]['stability']
-                    disruption = game_state.config['unitInformation'][2]['damage']
-                    numerator = numerator + unit.stability/orig_stab * disruption
+                weight = weights.get(unit.type_info)
+                if weight is not None:
+                    numerator = numerator + unit.stability * weight[1]
             
-            quad_danger[quad] = numerator/float(denominator)
+            quad_danger[quad] = numerator / self.tile_counts[quad]
         
         return quad_danger
         
@@ -138,33 +280,12 @@ class Quadrant:
         
     def get_quadrant_for_location(self,x,y):
         
-        if y < self.half_area:
-            mine = True
-        else:
-            mine = False
-            
-        if mine:
-            if y <= self.front_back_div_me and x > self.left_div and x < self.right_div:
-                return self.MY_BACK
-            elif y >  self.front_back_div_me and x > self.left_div and x < self.right_div:
-                return self.MY_FRONT
-            elif x <= self.left_div:
-                return self.MY_LEFT
-            elif x >= self.right_div:
-                return self.MY_RIGHT
-            else:
-                raise ValueError("Invalid unit location")       
-        else:
-            if y >= self.front_back_div_enemy and x > self.left_div and x < self.right_div:
-                return self.OP_BACK
-            elif y <  self.front_back_div_enemy and x > self.left_div and x < self.right_div:
-                return self.OP_FRONT
-            elif x <= self.left_div:
-                return self.OP_LEFT
-            elif x >= self.right_div:
-                return self.OP_RIGHT
-            else:
-                raise ValueError("Invalid unit location")
+        quad = NO_QUADRANT
+        if 0 <= x < self.arena_size and 0 <= y < self.arena_size:
+            quad = self.quadrant_ids[x + y * self.arena_size]
+        if quad == NO_QUADRANT:
+            raise ValueError("Invalid unit location")
+        return quad
             
 
 
@@ -191,6 +312,13 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.quadrant_analyzer = Quadrant()
         self.scoring_locations = {'me': [], 'enemy':[]}
         
+        # Set rollout_attacks to pick each turn's attack by simulating the options instead of alternating them.
+        # The worker processes that simulate them are started now so they are ready on turn 0
+        self.rollout_attacks = False
+        self.rollouts = gamelib.RolloutEngine(config)
+        if self.rollout_attacks:
+            self.rollouts.start()
+        
 
     def on_turn(self, turn_state):
         """
@@ -201,6 +329,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         game engine.
         """
         game_state = gamelib.GameState(self.config, turn_state)
+        # The parsed state of the turn, which the quadrant analyzer compares with the last turn
+        self.turn_message = getattr(turn_state, 'state', None) or json.loads(turn_state)
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         #game_state.suppress_warnings(True)  #Uncomment this line to suppress warnings.
 
@@ -212,7 +342,7 @@ class AlgoStrategy(gamelib.AlgoCore):
   
     def on_action_frame(self, turn_state):
         
-        action_frame = gamelib.GameState(self.config, turn_state)
+        action_frame = gamelib.ActionFrame(self.config, turn_state)
         breach_locations = action_frame.get_breach_locations()
         
         for location in breach_locations:
@@ -228,6 +358,11 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
         
         
+    def on_game_end(self, turn_state):
+        
+        self.rollouts.close()
+        
+        
     def custom_strategy(self, game_state):
         """
         My custom strategy:
@@ -240,8 +375,8 @@ class AlgoStrategy(gamelib.AlgoCore):
             boost_attackers
         Offsense
             target_weak_side
-            EMP_blast
-            brute_force_pings
+            EMP_blast_plan
+            brute_force_pings_plan
         """
         
         
@@ -265,10 +400,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.reinforce_wall(game_state,'evens')
         self.boost_attackers(game_state)
         
-        if game_state.turn_number % 2 == 0:
-            self.EMP_blast(game_state)
-        else:
-            self.brute_force_pings(game_state,'left')
+        self.attack(game_state)
             
         
         # Clean up 
@@ -277,11 +409,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         
     def analyze_defense_strength(self, game_state):
         
-        self.quadrant_analyzer.assign_all_firewalls_to_quadrants(game_state)
-        quad_strength = self.quadrant_analyzer.compute_quadrant_strengths(game_state)
-        quad_danger = self.quadrant_analyzer.compute_quadrant_danger(game_state)
-        
-        return (quad_strength, quad_danger)
+        return self.quadrant_analyzer.update(game_state.config, self.turn_message)
         
 
     def build_wall(self, game_state, evens_or_odds=''):
@@ -364,25 +492,41 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
         Utility function to build as many units at the given locations as possilbe
         """
-        count = 0
-        for location in locations:
-            if game_state.can_spawn(unit, location):
-                game_state.attempt_spawn(unit, location)
-                count = count + 1
-        return count
+        outcomes = game_state.attempt_spawn_batch([(unit, location, 1) for location in locations], warn=False)
+        return sum(outcome.spawned for outcome in outcomes)
 
 
-    def EMP_blast(self, game_state):
+    def attack(self, game_state):
+        """
+        Send an EMP blast on even turns and pings on the left on odd turns, or with rollout_attacks
+        simulate those and pings on the right against the current board and send the best one
+        """
+        
+        plans = [self.EMP_blast_plan(game_state), self.brute_force_pings_plan(game_state, 'left')]
+        best = None
+        if self.rollout_attacks:
+            plans.append(self.brute_force_pings_plan(game_state, 'right'))
+            best = self.rollouts.best_plan(game_state, plans)
+        if best is None:
+            # Rollouts are off or ran out of time
+            best_plan = plans[0] if game_state.turn_number % 2 == 0 else plans[1]
+        else:
+            best_plan = best.plan
+        for unit_type, count, location in best_plan:
+            if count > 0:
+                game_state.attempt_spawn(unit_type, location, count)
+
+    def EMP_blast_plan(self, game_state):
         """
         Build as many EMPs as we can alternating sides
         """
         
         locations = [[8,5],[19,5]]
         n_to_build = game_state.number_affordable(EMP)
-        for i in range(n_to_build):
-            game_state.attempt_spawn(EMP, locations[i%2])
+        plan = [(EMP, (n_to_build + 1) // 2, locations[0]), (EMP, n_to_build // 2, locations[1])]
+        return [entry for entry in plan if entry[1] > 0]
             
-    def brute_force_pings(self, game_state, side):
+    def brute_force_pings_plan(self, game_state, side):
         """
         Send as many pings as possible
         """
@@ -393,8 +537,7 @@ class AlgoStrategy(gamelib.AlgoCore):
             location = [16,2]
             
         n_to_build = game_state.number_affordable(PING)
-        for i in range(n_to_build):
-            game_state.attempt_spawn(PING, location)
+        return [(PING, n_to_build, location)] if n_to_build > 0 else []
             
 
 
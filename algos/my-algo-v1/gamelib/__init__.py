@@ -8,6 +8,10 @@ from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
 from .advanced_game_state import AdvancedGameState
+from .action_frame import ActionFrame
+from .action_phase_tracker import ActionPhaseTracker
+from .action_phase_simulator import ActionPhaseSimulator
+from .rollout_engine import RolloutEngine
 
-__all__ = ["advanced_game_state", "algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["action_frame", "action_phase_simulator", "action_phase_tracker", "advanced_game_state", "algocore", "arena", "bitboard", "game_state", "game_map", "navigation", "path_cache", "path_damage", "path_engine", "path_overlay", "rollout_engine", "shared_board", "shield_map", "snapshot", "threat_map", "unit", "util"]
  
\ No newline at end of file
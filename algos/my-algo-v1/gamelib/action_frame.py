@@ -0,0 +1,196 @@
+import json
+from collections import namedtuple
+
+# Events of an action frame. Locations are [x, y] lists, unit types are shorthands like "PI" and
+# player indices are 0 for you and 1 for your opponent, as everywhere else in gamelib.
+BreachEvent = namedtuple("BreachEvent", ["location", "damage", "unit_type", "unit_id", "player_index"])
+DamageEvent = namedtuple("DamageEvent", ["location", "damage", "unit_type", "unit_id", "player_index"])
+DeathEvent = namedtuple("DeathEvent", ["location", "unit_type", "unit_id", "player_index", "removed_by_owner"])
+SpawnEvent = namedtuple("SpawnEvent", ["location", "unit_type", "unit_id", "player_index"])
+SelfDestructEvent = namedtuple("SelfDestructEvent", ["location", "targets", "damage", "unit_type", "unit_id", "player_index"])
+ShieldEvent = namedtuple("ShieldEvent", ["location", "target_location", "amount", "unit_type", "unit_id", "target_id", "player_index"])
+MoveEvent = namedtuple("MoveEvent", ["location", "new_location", "unit_type", "unit_id", "player_index"])
+
+
+def _decode_breach(event, shorthands):
+    location, damage, unit_type, unit_id, player = event[:5]
+    return BreachEvent(location, damage, shorthands[unit_type], unit_id, player - 1)
+
+
+def _decode_damage(event, shorthands):
+    location, damage, unit_type, unit_id, player = event[:5]
+    return DamageEvent(location, damage, shorthands[unit_type], unit_id, player - 1)
+
+
+def _decode_death(event, shorthands):
+    location, unit_type, unit_id, player, removed_by_owner = event[:5]
+    return DeathEvent(location, shorthands[unit_type], unit_id, player - 1, removed_by_owner)
+
+
+def _decode_spawn(event, shorthands):
+    location, unit_type, unit_id, player = event[:4]
+    return SpawnEvent(location, shorthands[unit_type], unit_id, player - 1)
+
+
+def _decode_self_destruct(event, shorthands):
+    location, targets, damage, unit_type, unit_id, player = event[:6]
+    return SelfDestructEvent(location, targets, damage, shorthands[unit_type], unit_id, player - 1)
+
+
+def _decode_shield(event, shorthands):
+    location, target_location, amount, unit_type, unit_id, target_id, player = event[:7]
+    return ShieldEvent(location, target_location, amount, shorthands[unit_type], unit_id, target_id, player - 1)
+
+
+def _decode_move(event, shorthands):
+    location, new_location = event[:2]
+    unit_type, unit_id, player = event[3:6]
+    return MoveEvent(location, new_location, shorthands[unit_type], unit_id, player - 1)
+
+
+_DECODERS = {
+    "breach": _decode_breach,
+    "damage": _decode_damage,
+    "death": _decode_death,
+    "spawn": _decode_spawn,
+    "selfDestruct": _decode_self_destruct,
+    "shield": _decode_shield,
+    "move": _decode_move,
+}
+
+
+class ActionFrame:
+    """A light view of one action phase frame
+
+    Reading the events and stats of a frame does not need the board, so unlike GameState this
+    does not build a GameMap or any GameUnits. Events are decoded the first time each kind is
+    asked for, and the full GameState is only built if game_state or game_map is used.
+
+    Attributes:
+        * config (JSON): Contains information about the game
+        * state (dict): The parsed frame
+        * BITS (int): A constant representing the bits resource
+        * CORES (int): A constant representing the cores resource
+        * turn_number (int): The turn this frame belongs to
+        * frame_number (int): The index of this frame in the action phase
+        * my_health (float): Your current remaining health
+        * my_time (float): The time you took to submit your previous turn
+        * enemy_health (float): Your opponents current remaining health
+        * enemy_time (float): Your opponents current remaining time
+
+    """
+    def __init__(self, config, serialized_string, state=None):
+        """Reads the turn info and stats of a frame
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * serialized_string (string): The frame as sent by the engine
+            * state (dict): The already parsed serialized_string. Read from serialized_string if it is a StateMessage
+
+        """
+        if state is None:
+            state = getattr(serialized_string, "state", None)
+        if state is None:
+            state = json.loads(serialized_string)
+        self.config = config
+        self.state = state
+        self.BITS = 0
+        self.CORES = 1
+
+        turn_info = state["turnInfo"]
+        self.turn_number = int(turn_info[1])
+        self.frame_number = int(turn_info[2])
+
+        p1_health, p1_cores, p1_bits, p1_time = map(float, state["p1Stats"][:4])
+        p2_health, p2_cores, p2_bits, p2_time = map(float, state["p2Stats"][:4])
+        self.my_health = p1_health
+        self.my_time = p1_time
+        self.enemy_health = p2_health
+        self.enemy_time = p2_time
+        self._player_resources = [
+            {'cores': p1_cores, 'bits': p1_bits},
+            {'cores': p2_cores, 'bits': p2_bits}]
+
+        self.__events = {}
+        self.__game_state = None
+
+    @property
+    def game_state(self):
+        """The full GameState of this frame, built on first use"""
+        if self.__game_state is None:
+            from .game_state import GameState
+            self.__game_state = GameState.from_state(self.config, self.state)
+        return self.__game_state
+
+    @property
+    def game_map(self):
+        """The GameMap of this frame, built on first use"""
+        return self.game_state.game_map
+
+    def get_resource(self, resource_type, player_index=0):
+        """Gets a players resources at this frame
+
+        Args:
+            * resource_type: self.CORES or self.BITS
+            * player_index: The index corresponding to the player whos resources you are querying, 0 for you 1 for the enemy
+
+        Returns:
+            The number of the given resource the given player controls
+
+        """
+        return self._player_resources[player_index]['bits' if resource_type == self.BITS else 'cores']
+
+    def raw_events(self, kind):
+        """Gets the events of one kind exactly as the engine sent them
+
+        Args:
+            * kind: The key of the event in the frame, for example "breach" or "selfDestruct"
+
+        Returns:
+            The list of serialized events, empty if there were none
+
+        """
+        return self.state["events"].get(kind, [])
+
+    def events(self, kind):
+        """Gets the decoded events of one kind
+
+        Args:
+            * kind: One of "breach", "damage", "death", "spawn", "selfDestruct", "shield" or "move"
+
+        Returns:
+            A list of event namedtuples, see the *Event types of this module
+
+        """
+        decoded = self.__events.get(kind)
+        if decoded is None:
+            decode = _DECODERS[kind]
+            shorthands = [type_config.get("shorthand") for type_config in self.config["unitInformation"]]
+            decoded = self.__events[kind] = [decode(event, shorthands) for event in self.raw_events(kind)]
+        return decoded
+
+    def breaches(self):
+        return self.events("breach")
+
+    def damages(self):
+        return self.events("damage")
+
+    def deaths(self):
+        return self.events("death")
+
+    def spawns(self):
+        return self.events("spawn")
+
+    def self_destructs(self):
+        return self.events("selfDestruct")
+
+    def shields(self):
+        return self.events("shield")
+
+    def moves(self):
+        return self.events("move")
+
+    def get_breach_locations(self):
+        """Gets the locations units scored at this frame, like GameState.get_breach_locations
+        """
+        return [breach[0] for breach in self.raw_events("breach")]
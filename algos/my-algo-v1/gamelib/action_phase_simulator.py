@@ -0,0 +1,487 @@
+import math
+
+from .action_frame import ActionFrame
+from .arena import ARENA_SIZE, HALF_ARENA, EDGE_INDICES, indices_in_range
+from .game_map import GameMap
+from .path_engine import PathEngine
+from .unit import GameUnit, get_unit_type
+
+
+class _SimUnit:
+    """The state of one unit during a simulated action phase
+    """
+    __slots__ = ('unit_id', 'type_info', 'player_index', 'x', 'y', 'stability', 'shield', 'shielded_by',
+                 'target_edge', 'path', 'path_step', 'move_progress', 'steps')
+
+    def __init__(self, type_info, player_index, x, y, stability, unit_id):
+        self.unit_id = unit_id
+        self.type_info = type_info
+        self.player_index = player_index
+        self.x = x
+        self.y = y
+        self.stability = stability
+        self.shield = 0
+        self.shielded_by = set()
+        self.target_edge = None
+        self.path = None
+        self.path_step = 0
+        self.move_progress = 0
+        self.steps = 0
+
+    def to_game_unit(self):
+        unit = GameUnit(self.type_info.unit_type, self.type_info.config, self.player_index, None, self.x, self.y, self.unit_id)
+        unit.stability = self.stability
+        return unit
+
+
+def target_edge_for(location, player_index):
+    """Gets the edge an information unit at a location heads for
+
+    Units target the edge opposite the one they were spawned on, so a unit spawned on your bottom
+    left edge heads for the top right edge. Units that left their spawn edge are assumed to still be
+    on the half of the board they started on.
+
+    Args:
+        * location: The location of the unit
+        * player_index: The player controlling the unit, 0 for you 1 for the enemy
+
+    Returns:
+        The target edge, see GameMap.TOP_RIGHT and friends
+
+    """
+    left = location[0] < HALF_ARENA
+    if player_index == 0:
+        return 0 if left else 1
+    return 3 if left else 2
+
+
+class SimulationResult:
+    """What happened during a simulated action phase
+
+    Attributes:
+        * frames (int): The number of frames simulated
+        * breaches (list): (frame, [x, y], unit_type, player_index) for every unit that reached its edge
+        * health_damage (list): The health each player lost, [you, enemy]
+        * damage_dealt (list): The damage dealt to enemy units by the units of each player, [you, enemy]
+        * deaths (list): (frame, GameUnit) for every unit destroyed, GameUnit holding its last state
+        * survivors (list): A GameUnit for every unit alive at the end of the phase
+        * my_health (float): Your health at the end of the phase
+        * enemy_health (float): Your opponents health at the end of the phase
+
+    """
+    def __init__(self, my_health, enemy_health):
+        self.frames = 0
+        self.breaches = []
+        self.health_damage = [0, 0]
+        self.damage_dealt = [0, 0]
+        self.deaths = []
+        self.survivors = []
+        self.my_health = my_health
+        self.enemy_health = enemy_health
+
+    def __repr__(self):
+        return "SimulationResult(frames={}, breaches={}, health_damage={}, damage_dealt={}, deaths={}, survivors={})".format(
+            self.frames, len(self.breaches), self.health_damage, self.damage_dealt, len(self.deaths), len(self.survivors))
+
+
+class ActionPhaseSimulator:
+    """Steps an action phase frame by frame, without the game engine
+
+    Each frame runs in this order:
+        1. Encryptors shield every friendly information unit in range they have not shielded yet
+        2. Shields decay by shieldDecayPerFrame
+        3. Information units move one tile every 1/speed frames, along the path find_path_to_edge would give.
+           A unit at the end of its path scores if it is on its target edge, and otherwise self destructs,
+           damaging enemy firewalls within selfDestructRadius by its max stability if it moved at least
+           stepsRequiredSelfDestruct tiles
+        4. Every destructor and information unit attacks the target AdvancedGameState.get_target would pick.
+           Targets are picked before any damage of the frame is dealt
+        5. Units without stability are removed. With rerouteMidRound, information units then path again
+
+    Shields are added to stability, take damage first and decay until used up. These are the rules
+    as the configs describe them; use validate to compare them with recorded frames of the engine.
+
+    Attributes:
+        * config (JSON): Contains information about the game
+
+    """
+    def __init__(self, config, units, my_health=0, enemy_health=0):
+        """Sets up a phase from a list of units
+
+        Use from_game_state or from_frame to set up the phase of a turn.
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * units: (unit_type, player_index, x, y, stability, unit_id) for every unit on the board when the phase starts
+            * my_health: Your health when the phase starts
+            * enemy_health: Your opponents health when the phase starts
+
+        """
+        self.config = config
+        self.__units = list(units)
+        self.__my_health = my_health
+        self.__enemy_health = enemy_health
+
+        unit_information = config["unitInformation"]
+        mechanics = config["mechanics"]
+        self.__encryptor = unit_information[1]["shorthand"]
+        self.__destructor = unit_information[2]["shorthand"]
+        self.__scrambler = unit_information[5]["shorthand"]
+        self.__player_damage = {type_config.get("shorthand"): type_config.get("damageToPlayer", mechanics["basePlayerHealthDamage"])
+                                for type_config in unit_information}
+        self.__shield_decay = mechanics["shieldDecayPerFrame"]
+        self.__steps_to_self_destruct = mechanics["stepsRequiredSelfDestruct"]
+        self.__self_destruct_radius = mechanics["selfDestructRadius"]
+        self.__reroute = mechanics["rerouteMidRound"]
+        self.__geometry = GameMap(config)
+        self.__range_cache = {}
+        self.__range_bits_cache = {}
+
+    @classmethod
+    def from_game_state(cls, game_state):
+        """Sets up the coming action phase of a turn
+
+        Every unit on the game map takes part, including the firewalls and information units placed with
+        attempt_spawn this turn.
+
+        Args:
+            * game_state: The GameState of the turn
+
+        Returns:
+            An ActionPhaseSimulator
+
+        """
+        units = []
+        for location in game_state.game_map:
+            for unit in game_state.game_map[location]:
+                units.append((unit.unit_type, unit.player_index, unit.x, unit.y, unit.stability, unit.unit_id))
+        return cls(game_state.config, units, game_state.my_health, game_state.enemy_health)
+
+    @classmethod
+    def from_frame(cls, config, frame):
+        """Sets up an action phase from a recorded frame, usually the first frame of the phase
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * frame: An ActionFrame, or anything ActionFrame can read
+
+        Returns:
+            An ActionPhaseSimulator
+
+        """
+        if isinstance(frame, dict):
+            frame = ActionFrame(config, None, frame)
+        elif not isinstance(frame, ActionFrame):
+            frame = ActionFrame(config, frame)
+        shorthands = [type_config.get("shorthand") for type_config in config["unitInformation"]]
+        units = []
+        for player_index, units_key in ((0, "p1Units"), (1, "p2Units")):
+            # The last type marks firewalls that are being removed, not units
+            for type_index, unit_list in enumerate(frame.state[units_key][:len(shorthands) - 1]):
+                for uinfo in unit_list:
+                    units.append((shorthands[type_index], player_index, int(uinfo[0]), int(uinfo[1]), float(uinfo[2]),
+                                  uinfo[3] if len(uinfo) > 3 else None))
+        return cls(config, units, frame.my_health, frame.enemy_health)
+
+    def __range(self, x, y, radius):
+        """The tile indices within radius of x, y, with the same rule as GameMap.get_locations_in_range
+        """
+        if radius == int(radius):
+            return indices_in_range(x, y, radius)
+        key = (x, y, radius)
+        indices = self.__range_cache.get(key)
+        if indices is None:
+            indices = self.__range_cache[key] = self.__geometry.get_indices_in_range([x, y], radius)
+        return indices
+
+    @staticmethod
+    def __mobile_bits(mobiles):
+        """The tiles holding living information units of each player, as bitboards
+        """
+        mobile_bits = [0, 0]
+        for unit in mobiles:
+            if unit.stability > 0:
+                mobile_bits[unit.player_index] |= 1 << (unit.x + unit.y * ARENA_SIZE)
+        return mobile_bits
+
+    def __range_bits(self, unit):
+        """The tiles within range of a firewall as a bitboard, to skip firewalls with nothing to do
+        """
+        key = (unit.x + unit.y * ARENA_SIZE, unit.type_info.range)
+        bits = self.__range_bits_cache.get(key)
+        if bits is None:
+            bits = 0
+            for index in self.__range(unit.x, unit.y, unit.type_info.range):
+                bits |= 1 << index
+            self.__range_bits_cache[key] = bits
+        return bits
+
+    def simulate(self, deploys=(), enemy_deploys=(), max_frames=1000, on_frame=None):
+        """Runs the phase until no information units are left
+
+        Args:
+            * deploys: Extra (unit_type, x, y) information units of yours, for example to compare attack plans on one board
+            * enemy_deploys: Extra (unit_type, x, y) information units of your opponent
+            * max_frames: Stop after this many frames
+            * on_frame: Called with the frame number and the list of living units after every frame, used by validate
+
+        Returns:
+            A SimulationResult
+
+        """
+        result = SimulationResult(self.__my_health, self.__enemy_health)
+        config = self.config
+        units = []
+        for unit_type, player_index, x, y, stability, unit_id in self.__units:
+            units.append(_SimUnit(get_unit_type(config, unit_type), player_index, x, y, stability, unit_id))
+        for player_index, extra in ((0, deploys), (1, enemy_deploys)):
+            for number, (unit_type, x, y) in enumerate(extra):
+                type_info = get_unit_type(config, unit_type)
+                units.append(_SimUnit(type_info, player_index, x, y, type_info.max_stability, "sim-{}-{}".format(player_index, number)))
+
+        tiles = [[] for _ in range(ARENA_SIZE * ARENA_SIZE)]
+        blocked_bits = 0
+        mobiles = []
+        attackers = []
+        encryptors = []
+        for unit in units:
+            index = unit.x + unit.y * ARENA_SIZE
+            tiles[index].append(unit)
+            if unit.type_info.stationary:
+                blocked_bits |= 1 << index
+                if unit.type_info.unit_type == self.__encryptor:
+                    encryptors.append(unit)
+                elif unit.type_info.unit_type == self.__destructor and unit.type_info.damage > 0:
+                    attackers.append(unit)
+            else:
+                unit.target_edge = target_edge_for([unit.x, unit.y], unit.player_index)
+                mobiles.append(unit)
+                attackers.append(unit)
+
+        engine = PathEngine()
+        edge_locations = self.__geometry.get_edges()
+        paths = {}
+        frame = 0
+        while mobiles and frame < max_frames:
+            frame += 1
+            dead = []
+
+            # 1. Shields
+            mobile_bits = self.__mobile_bits(mobiles)
+            for encryptor in encryptors:
+                if not self.__range_bits(encryptor) & mobile_bits[encryptor.player_index]:
+                    continue
+                for index in self.__range(encryptor.x, encryptor.y, encryptor.type_info.range):
+                    for unit in tiles[index]:
+                        if (unit.player_index == encryptor.player_index and not unit.type_info.stationary and
+                                encryptor not in unit.shielded_by and unit.stability > 0):
+                            unit.shielded_by.add(encryptor)
+                            unit.shield += encryptor.type_info.damage
+                            unit.stability += encryptor.type_info.damage
+
+            # 2. Shield decay
+            for unit in mobiles:
+                if unit.shield > 0:
+                    decay = min(unit.shield, self.__shield_decay)
+                    unit.shield -= decay
+                    unit.stability -= decay
+
+            # 3. Moves, breaches and self destructs
+            for unit in mobiles:
+                unit.move_progress += unit.type_info.speed
+                if unit.move_progress < 1 - 1e-9:
+                    continue
+                unit.move_progress -= 1
+                if unit.path is None:
+                    key = (unit.x, unit.y, unit.target_edge)
+                    path = paths.get(key)
+                    if path is None:
+                        path = paths[key] = engine.find_path([unit.x, unit.y], edge_locations[unit.target_edge], blocked_bits) or [[unit.x, unit.y]]
+                    unit.path = path
+                    unit.path_step = 0
+                if unit.path_step + 1 < len(unit.path):
+                    unit.path_step += 1
+                    tiles[unit.x + unit.y * ARENA_SIZE].remove(unit)
+                    unit.x, unit.y = unit.path[unit.path_step]
+                    tiles[unit.x + unit.y * ARENA_SIZE].append(unit)
+                    unit.steps += 1
+                    continue
+                index = unit.x + unit.y * ARENA_SIZE
+                if index in EDGE_INDICES[unit.target_edge]:
+                    result.breaches.append((frame, [unit.x, unit.y], unit.type_info.unit_type, unit.player_index))
+                    result.health_damage[1 - unit.player_index] += self.__player_damage[unit.type_info.unit_type]
+                elif unit.steps >= self.__steps_to_self_destruct:
+                    for target_index in self.__range(unit.x, unit.y, self.__self_destruct_radius):
+                        for target in tiles[target_index]:
+                            if target.type_info.stationary and not target.player_index == unit.player_index:
+                                target.stability -= unit.type_info.max_stability
+                                result.damage_dealt[unit.player_index] += unit.type_info.max_stability
+                unit.stability = 0
+                dead.append(unit)
+
+            # 4. Attacks, all targets are picked before damage is dealt
+            hits = []
+            # Destructors only attack information units, so most of them can skip the search
+            mobile_bits = self.__mobile_bits(mobiles)
+            for attacker in attackers:
+                if attacker.stability <= 0:
+                    continue
+                if attacker.type_info.stationary and not self.__range_bits(attacker) & mobile_bits[1 - attacker.player_index]:
+                    continue
+                target = self.__get_target(attacker, tiles)
+                if target is None:
+                    continue
+                if attacker.type_info.stationary:
+                    damage = attacker.type_info.damage
+                elif target.type_info.stationary:
+                    damage = attacker.type_info.damage_f
+                else:
+                    damage = attacker.type_info.damage_i
+                if damage > 0:
+                    hits.append((attacker, target, damage))
+            for attacker, target, damage in hits:
+                target.stability -= damage
+                if target.shield > 0:
+                    target.shield = max(0, target.shield - damage)
+                result.damage_dealt[attacker.player_index] += damage
+
+            # 5. Deaths
+            board_changed = False
+            dying = set(dead)
+            for unit in units:
+                if unit.stability <= 0 and unit not in dying:
+                    dead.append(unit)
+            if dead:
+                for unit in dead:
+                    tile = tiles[unit.x + unit.y * ARENA_SIZE]
+                    if unit in tile:
+                        tile.remove(unit)
+                    if unit.type_info.stationary:
+                        blocked_bits &= ~(1 << (unit.x + unit.y * ARENA_SIZE))
+                        board_changed = True
+                        if unit in encryptors:
+                            encryptors.remove(unit)
+                    if unit in attackers:
+                        attackers.remove(unit)
+                    if unit in mobiles:
+                        mobiles.remove(unit)
+                    result.deaths.append((frame, unit.to_game_unit()))
+                dead = set(dead)
+                units = [unit for unit in units if unit not in dead]
+                if board_changed and self.__reroute:
+                    paths = {}
+                    for unit in mobiles:
+                        unit.path = None
+
+            if on_frame is not None:
+                on_frame(frame, units)
+
+        result.frames = frame
+        result.survivors = [unit.to_game_unit() for unit in units]
+        result.my_health -= result.health_damage[0]
+        result.enemy_health -= result.health_damage[1]
+        return result
+
+    def __get_target(self, attacker, tiles):
+        """Picks the unit an attacker would attack, with the priorities of AdvancedGameState.get_target
+        """
+        target = None
+        target_stationary = True
+        target_distance = ARENA_SIZE * ARENA_SIZE
+        target_stability = float("inf")
+        target_y = ARENA_SIZE
+        target_x_distance = 0
+        attacker_stationary = attacker.type_info.stationary
+        skip_stationary = attacker_stationary or attacker.type_info.unit_type == self.__scrambler
+        for index in self.__range(attacker.x, attacker.y, attacker.type_info.range):
+            for unit in tiles[index]:
+                unit_stationary = unit.type_info.stationary
+                if unit.player_index == attacker.player_index or (skip_stationary and unit_stationary) or unit.stability <= 0:
+                    continue
+
+                new_target = False
+                unit_distance = math.sqrt((unit.x - attacker.x)**2 + (unit.y - attacker.y)**2)
+                unit_stability = unit.stability
+                unit_y = unit.y
+                unit_x_distance = abs(HALF_ARENA - 0.5 - unit.x)
+
+                if target_stationary and not unit_stationary:
+                    new_target = True
+                elif not target_stationary and unit_stationary:
+                    continue
+
+                if target_distance > unit_distance:
+                    new_target = True
+                elif target_distance < unit_distance and not new_target:
+                    continue
+
+                if target_stability > unit_stability:
+                    new_target = True
+                elif target_stability < unit_stability and not new_target:
+                    continue
+
+                if target_y > unit_y:
+                    new_target = True
+                elif target_y < unit_y and not new_target:
+                    continue
+
+                if target_x_distance < unit_x_distance:
+                    new_target = True
+
+                if new_target:
+                    target = unit
+                    target_stationary = unit_stationary
+                    target_distance = unit_distance
+                    target_stability = unit_stability
+                    target_y = unit_y
+                    target_x_distance = unit_x_distance
+        return target
+
+    def validate(self, frames, tolerance=0.01):
+        """Compares the simulation with the recorded frames of the same phase
+
+        Set the simulator up with from_frame on the first recorded frame, then pass the frames after it.
+        Units are matched by id.
+
+        Args:
+            * frames: The recorded frames, as ActionFrames or anything ActionFrame can read
+            * tolerance: The largest stability difference that still counts as a match
+
+        Returns:
+            A list of (frame_number, unit_id, recorded, simulated) for every unit that differs, where recorded and
+            simulated are (x, y, stability) or None if the unit is missing. An empty list means the phase matched
+
+        """
+        recorded = {}
+        last_frame = 0
+        for frame in frames:
+            if isinstance(frame, dict):
+                frame = ActionFrame(self.config, None, frame)
+            elif not isinstance(frame, ActionFrame):
+                frame = ActionFrame(self.config, frame)
+            snapshot = {}
+            for units_key in ("p1Units", "p2Units"):
+                for unit_list in frame.state[units_key][:len(self.config["unitInformation"]) - 1]:
+                    for uinfo in unit_list:
+                        snapshot[uinfo[3]] = (int(uinfo[0]), int(uinfo[1]), float(uinfo[2]))
+            recorded[frame.frame_number] = snapshot
+            last_frame = max(last_frame, frame.frame_number)
+
+        mismatches = []
+
+        def compare(frame_number, units):
+            expected = recorded.pop(frame_number, None)
+            if expected is None:
+                return
+            simulated = {unit.unit_id: (unit.x, unit.y, unit.stability) for unit in units}
+            for unit_id in sorted(set(expected) | set(simulated), key=str):
+                want, got = expected.get(unit_id), simulated.get(unit_id)
+                if want is None or got is None or not want[:2] == got[:2] or abs(want[2] - got[2]) > tolerance:
+                    mismatches.append((frame_number, unit_id, want, got))
+
+        self.simulate(max_frames=last_frame, on_frame=compare)
+        # Frames recorded after the simulated phase ended
+        for frame_number in sorted(recorded):
+            for unit_id, want in sorted(recorded[frame_number].items(), key=lambda item: str(item[0])):
+                mismatches.append((frame_number, unit_id, want, None))
+        return mismatches
@@ -0,0 +1,154 @@
+from .action_frame import ActionFrame
+from .game_map import GameMap
+from .unit import GameUnit
+
+
+class ActionPhaseTracker:
+    """Follows the units of an action phase from frame to frame
+
+    Every unit the engine sends has a stable id, so instead of building a new board for every frame
+    the tracker keeps one board and a table of the units on it by id. Each frame then only moves the
+    units whose location changed, updates stability and removes the units that are gone. The locations
+    each unit went through are recorded, so the whole phase can be looked at once it is over.
+
+    A frame from a new turn starts a new phase.
+
+    Attributes:
+        * config (JSON): Contains information about the game
+        * turn_number (int): The turn of the phase being tracked, None before the first frame
+        * frame_number (int): The last frame applied, None before the first frame
+        * game_map (:obj: GameMap): The board as of the last frame. Units are moved and removed in place
+        * units (dict): The GameUnit of every unit alive at the last frame, by unit id
+        * dead (dict): (frame_number, GameUnit) for every unit that died during the phase, by unit id
+
+    """
+    def __init__(self, config):
+        """Sets up an empty tracker
+
+        Args:
+            * config (JSON): A json object containing information about the game
+
+        """
+        self.config = config
+        self.__shorthands = [type_config.get("shorthand") for type_config in config["unitInformation"]]
+        self.reset()
+
+    def reset(self):
+        """Forgets the current phase
+        """
+        self.turn_number = None
+        self.frame_number = None
+        self.game_map = GameMap(self.config)
+        self.units = {}
+        self.dead = {}
+        self.__trajectories = {}
+
+    def update(self, frame):
+        """Applies the next frame of the phase
+
+        Args:
+            * frame: An ActionFrame, or anything ActionFrame can read: the frame string, a StateMessage or the parsed frame
+
+        Returns:
+            The frame as an ActionFrame
+
+        """
+        if isinstance(frame, dict):
+            frame = ActionFrame(self.config, None, frame)
+        elif not isinstance(frame, ActionFrame):
+            frame = ActionFrame(self.config, frame)
+        if not frame.turn_number == self.turn_number:
+            self.reset()
+            self.turn_number = frame.turn_number
+        frame_number = self.frame_number = frame.frame_number
+
+        game_map = self.game_map
+        units = self.units
+        trajectories = self.__trajectories
+        # This depends on RM always being the last type, like GameState.__create_parsed_units
+        remove_index = len(self.__shorthands) - 1
+        seen = set()
+        for player_index, units_key in ((0, "p1Units"), (1, "p2Units")):
+            for type_index, unit_list in enumerate(frame.state[units_key]):
+                if type_index == remove_index:
+                    for uinfo in unit_list:
+                        for unit in game_map[int(uinfo[0]), int(uinfo[1])]:
+                            if unit.stationary:
+                                unit.pending_removal = True
+                    continue
+                for uinfo in unit_list:
+                    x, y = int(uinfo[0]), int(uinfo[1])
+                    unit_id = uinfo[3]
+                    seen.add(unit_id)
+                    unit = units.get(unit_id)
+                    if unit is None:
+                        unit = units[unit_id] = GameUnit(self.__shorthands[type_index], self.config, player_index, float(uinfo[2]), x, y, unit_id)
+                        trajectories[unit_id] = [(frame_number, x, y)]
+                        self.__place(unit)
+                        continue
+                    unit.stability = float(uinfo[2])
+                    if not (unit.x == x and unit.y == y):
+                        game_map[unit.x, unit.y].remove(unit)
+                        unit.x, unit.y = x, y
+                        game_map[x, y].append(unit)
+                        trajectories[unit_id].append((frame_number, x, y))
+
+        if not len(seen) == len(units):
+            for unit_id in [unit_id for unit_id in units if unit_id not in seen]:
+                unit = units.pop(unit_id)
+                self.__remove(unit)
+                self.dead[unit_id] = (frame_number, unit)
+        return frame
+
+    def __place(self, unit):
+        location = (unit.x, unit.y)
+        if unit.stationary:
+            # Assigning the tile keeps the fingerprint of the map up to date
+            self.game_map[location] = self.game_map[location] + [unit]
+        else:
+            self.game_map[location].append(unit)
+
+    def __remove(self, unit):
+        location = (unit.x, unit.y)
+        if unit.stationary:
+            self.game_map[location] = [other for other in self.game_map[location] if other is not unit]
+        else:
+            self.game_map[location].remove(unit)
+
+    def trajectory(self, unit_id, with_frames=False):
+        """Gets the locations a unit went through during the phase
+
+        Args:
+            * unit_id: The id of a unit that was alive at some point of the phase
+            * with_frames: Also return the frame the unit reached each location at
+
+        Returns:
+            A list of [x, y] locations, starting where the unit was first seen, or of (frame_number, [x, y])
+            pairs if with_frames is set. None for unknown units
+
+        """
+        steps = self.__trajectories.get(unit_id)
+        if steps is None:
+            return
+        if with_frames:
+            return [(frame_number, [x, y]) for frame_number, x, y in steps]
+        return [[x, y] for _, x, y in steps]
+
+    def trajectories(self, mobile_only=True):
+        """Gets the trajectory of every unit seen during the phase
+
+        Args:
+            * mobile_only: Leave out firewalls, which never move
+
+        Returns:
+            A dict with the list of [x, y] locations of each unit, by unit id
+
+        """
+        trajectories = {}
+        for unit_id in self.__trajectories:
+            unit = self.units.get(unit_id)
+            if unit is None:
+                unit = self.dead[unit_id][1]
+            if not (mobile_only and unit.stationary):
+                trajectories[unit_id] = self.trajectory(unit_id)
+        return trajectories
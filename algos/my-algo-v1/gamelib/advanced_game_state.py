@@ -28,7 +28,7 @@ class AdvancedGameState(GameState):
             return
 
         attacker_location = [attacking_unit.x, attacking_unit.y]
-        possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.range)
+        possible_indices = self.game_map.get_indices_in_range(attacker_location, attacking_unit.range)
         target = None
         target_stationary = True
         target_distance = sys.maxsize
@@ -36,7 +36,8 @@ class AdvancedGameState(GameState):
         target_y = self.ARENA_SIZE
         target_x_distance = 0
 
-        for location in possible_locations:
+        for index in possible_indices:
+            location = [index % self.ARENA_SIZE, index // self.ARENA_SIZE]
             for unit in self.game_map[location]:
                 """
                 NOTE: scrambler units cannot attack firewalls so skip them if unit is firewall
@@ -106,9 +107,9 @@ class AdvancedGameState(GameState):
         """
         Get locations in the range of DESTRUCTOR units
         """
-        possible_locations= self.game_map.get_locations_in_range(location, self.config["unitInformation"][UNIT_TYPE_TO_INDEX[DESTRUCTOR]]["range"])
-        for location in possible_locations:
-            for unit in self.game_map[location]:
+        possible_indices = self.game_map.get_indices_in_range(location, self.config["unitInformation"][UNIT_TYPE_TO_INDEX[DESTRUCTOR]]["range"])
+        for index in possible_indices:
+            for unit in self.game_map[index % self.ARENA_SIZE, index // self.ARENA_SIZE]:
                 if unit.unit_type == DESTRUCTOR and unit.player_index != player_index:
                     attackers.append(unit)
         return attackers
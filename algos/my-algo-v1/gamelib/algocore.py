@@ -1,7 +1,7 @@
 import json
 
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .util import get_command, debug_write, BANNER_TEXT, send_command, StateMessage
 
 class AlgoCore(object):
     """This class handles communication with the game itself. Your strategy should subclass it.
@@ -23,7 +23,8 @@ class AlgoCore(object):
     def on_turn(self, game_state):
         """
         This step function is called every turn and is passed a string containing
-        the current game state, which can be used to initialize a new GameMap
+        the current game state, which can be used to initialize a new GameMap.
+        The string is a StateMessage, so GameState(self.config, game_state) does not parse it again.
         """
         self.submit_default_turn()
 
@@ -34,6 +35,13 @@ class AlgoCore(object):
     def on_action_frame(self, game_state):
         pass
 
+    def on_game_end(self, game_state):
+        """
+        This is called once with the end game message, before the parsing loop stops.
+        Override this to release what on_game_start set up, like worker processes and shared memory.
+        """
+        pass
+
     # only override this function if you have a 
     def start(self):
         """ 
@@ -56,6 +64,7 @@ class AlgoCore(object):
             elif "turnInfo" in game_state_string:
                 state = json.loads(game_state_string)
                 stateType = int(state.get("turnInfo")[0])
+                game_state_string = StateMessage(game_state_string, state)
                 if stateType == 0:
                     """
                     This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
@@ -72,6 +81,7 @@ class AlgoCore(object):
                     This is the end game message. This means the game is over so break and finish the program.
                     """
                     debug_write("Got end state quitting bot.")
+                    self.on_game_end(game_state_string)
                     break
                 else:
                     """
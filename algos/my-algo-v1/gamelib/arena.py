@@ -0,0 +1,145 @@
+"""
+Lookup tables describing the arena, built once at import: an in bounds bitmap, the list of
+tiles, per tile neighbor lists, idealness tables and the tiles of each edge.
+
+Tiles are numbered x + y * ARENA_SIZE. This is the index used by the flat arrays of PathEngine
+and the bit position used by the bitboard module.
+"""
+
+import math
+from array import array
+
+ARENA_SIZE = 28
+HALF_ARENA = 14
+
+
+def location_to_index(location):
+    """Converts an [x, y] location to its tile index
+    """
+    return location[0] + location[1] * ARENA_SIZE
+
+
+def index_to_location(index):
+    """Converts a tile index back to an [x, y] location
+    """
+    return [index % ARENA_SIZE, index // ARENA_SIZE]
+
+
+def _in_arena_bounds(x, y):
+    if y < HALF_ARENA:
+        return HALF_ARENA - y - 1 <= x <= HALF_ARENA + y
+    return y - HALF_ARENA <= x <= ARENA_SIZE - 1 - (y - HALF_ARENA)
+
+
+def _build_tables():
+    """Builds the in bounds bitmap, the tile list, the neighbor lists and the idealness tables
+
+    Neighbor lists keep the order used by ShortestPathFinder._get_neighbors
+    ([x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]) with out of bounds tiles removed,
+    which is what makes the tie breaking of every path finder identical.
+    """
+    in_bounds = bytearray(ARENA_SIZE * ARENA_SIZE)
+    for y in range(ARENA_SIZE):
+        for x in range(ARENA_SIZE):
+            if _in_arena_bounds(x, y):
+                in_bounds[x + y * ARENA_SIZE] = 1
+
+    tiles = []
+    neighbors = [() for _ in range(ARENA_SIZE * ARENA_SIZE)]
+    for y in range(ARENA_SIZE):
+        for x in range(ARENA_SIZE):
+            index = x + y * ARENA_SIZE
+            if not in_bounds[index]:
+                continue
+            tiles.append((index, x, y))
+            adjacent = []
+            for nx, ny in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+                if 0 <= nx < ARENA_SIZE and 0 <= ny < ARENA_SIZE and in_bounds[nx + ny * ARENA_SIZE]:
+                    adjacent.append(nx + ny * ARENA_SIZE)
+            neighbors[index] = tuple(adjacent)
+
+    # One idealness table per edge direction, see ShortestPathFinder._get_idealness
+    idealness = {}
+    for dx in (-1, 1):
+        for dy in (-1, 1):
+            table = array('l', [0] * (ARENA_SIZE * ARENA_SIZE))
+            for index, x, y in tiles:
+                value = 28 * y if dy == 1 else 28 * (27 - y)
+                value += x if dx == 1 else 27 - x
+                table[index] = value
+            idealness[(dx, dy)] = table
+
+    return bytes(in_bounds), tuple(tiles), tuple(neighbors), idealness
+
+
+def _build_edges():
+    """Builds the locations of each edge, in the order of GameMap.get_edges
+    """
+    edges = ([], [], [], [])
+    for num in range(HALF_ARENA):
+        edges[0].append((HALF_ARENA + num, ARENA_SIZE - 1 - num))
+        edges[1].append((HALF_ARENA - 1 - num, ARENA_SIZE - 1 - num))
+        edges[2].append((HALF_ARENA - 1 - num, num))
+        edges[3].append((HALF_ARENA + num, num))
+    return tuple(tuple(edge) for edge in edges)
+
+
+IN_BOUNDS, TILES, NEIGHBORS, IDEALNESS = _build_tables()
+# In bounds locations as (x, y), row by row from the bottom, the order GameMap iterates in
+LOCATIONS = tuple((x, y) for index, x, y in TILES)
+IN_BOUNDS_LOCATIONS = frozenset(LOCATIONS)
+
+def _tile_of(location):
+    # The (x, y) ints of a location if it is a tile of the arena, None for fractional or out of bounds locations
+    x, y = location
+    if (x, y) in IN_BOUNDS_LOCATIONS:
+        return int(x), int(y)
+
+
+# Edges are numbered like the GameMap constants: 0 = top right, 1 = top left, 2 = bottom left, 3 = bottom right
+EDGE_LOCATIONS = _build_edges()
+EDGE_INDICES = tuple(frozenset(x + y * ARENA_SIZE for x, y in edge) for edge in EDGE_LOCATIONS)
+# The edges information units can be deployed on by player 0 and player 1
+SPAWN_EDGE_INDICES = (EDGE_INDICES[2] | EDGE_INDICES[3], EDGE_INDICES[0] | EDGE_INDICES[1])
+
+
+_RANGE_STENCILS = {}
+_RANGE_INDICES = {}
+
+
+def range_stencil(radius):
+    """Gets the (dx, dy) offsets whose centers are within radius + 0.51 of a tile, for a whole number radius
+
+    The offsets are ordered by dx then dy, the order GameMap.get_locations_in_range returns locations in,
+    and are compared on squared integer distance against the largest squared distance the float
+    check would accept.
+    """
+    stencil = _RANGE_STENCILS.get(radius)
+    if stencil is None:
+        reach = int(radius)
+        # A unit with a given range affects all locations who's centers are within that range + 0.51
+        max_squared = max(squared for squared in range(2 * reach * reach + 1) if math.sqrt(squared) < radius + 0.51)
+        stencil = tuple((dx, dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1)
+                        if dx * dx + dy * dy <= max_squared)
+        _RANGE_STENCILS[radius] = stencil
+    return stencil
+
+
+def indices_in_range(x, y, radius):
+    """Gets the indices of the in bounds tiles within radius of x, y, for whole number x, y and radius
+
+    The result for each tile and radius is built once and then shared, so callers must not modify it.
+    """
+    if not (0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE):
+        return tuple((x + dx) + (y + dy) * ARENA_SIZE for dx, dy in range_stencil(radius)
+                     if 0 <= x + dx < ARENA_SIZE and 0 <= y + dy < ARENA_SIZE and IN_BOUNDS[(x + dx) + (y + dy) * ARENA_SIZE])
+    table = _RANGE_INDICES.get(radius)
+    if table is None:
+        table = _RANGE_INDICES[radius] = [None] * (ARENA_SIZE * ARENA_SIZE)
+    center = x + y * ARENA_SIZE
+    indices = table[center]
+    if indices is None:
+        indices = tuple((x + dx) + (y + dy) * ARENA_SIZE for dx, dy in range_stencil(radius)
+                        if 0 <= x + dx < ARENA_SIZE and 0 <= y + dy < ARENA_SIZE and IN_BOUNDS[(x + dx) + (y + dy) * ARENA_SIZE])
+        table[center] = indices
+    return indices
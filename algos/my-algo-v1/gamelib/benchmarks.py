@@ -0,0 +1,696 @@
+"""
+Micro benchmarks for the performance sensitive parts of gamelib.
+
+Run them from the algo directory with:
+
+    python3 -m gamelib.benchmarks
+"""
+
+import copy
+import io
+import json
+import math
+import os
+import pickle
+import random
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from .action_frame import ActionFrame
+from .advanced_game_state import AdvancedGameState
+from .action_phase_simulator import ActionPhaseSimulator
+from .action_phase_tracker import ActionPhaseTracker
+from .algocore import AlgoCore
+from .rollout_engine import RolloutEngine
+from .snapshot import SnapshotView
+from .game_state import GameState
+from .unit import GameUnit
+from .util import StateMessage
+from .navigation import ShortestPathFinder, PathContext
+from .path_engine import PathEngine, PathField
+from . import bitboard
+from .fixtures import CONFIG, TURN_0
+
+
+def make_random_game_state(seed=0, density=0.2):
+    """Builds a turn 0 GameState with randomly placed filters on both halves of the board
+    """
+    game_state = GameState(json.loads(CONFIG), TURN_0)
+    rng = random.Random(seed)
+    for location in game_state.game_map:
+        if rng.random() < density:
+            game_state.game_map.add_unit("FF", location, 0 if location[1] < game_state.HALF_ARENA else 1)
+    return game_state
+
+
+def make_turn_string(seed=0, firewalls=60, turn_number=10):
+    """Builds a serialized turn state with randomly placed firewalls for both players
+    """
+    rng = random.Random(seed)
+    game_state = GameState(json.loads(CONFIG), TURN_0)
+    locations = list(game_state.game_map)
+    unit_id = 0
+    units = [[[] for _ in range(7)], [[] for _ in range(7)]]
+    for player_index in range(2):
+        own = [location for location in locations if (location[1] < game_state.HALF_ARENA) == (player_index == 0)]
+        for x, y in rng.sample(own, firewalls):
+            type_index = rng.choice([0, 0, 1, 2, 2])
+            stability = json.loads(CONFIG)["unitInformation"][type_index]["stability"]
+            units[player_index][type_index].append([x, y, float(rng.randint(1, int(stability))), str(unit_id)])
+            unit_id += 1
+    state = json.loads(TURN_0)
+    state["turnInfo"] = [0, turn_number, -1]
+    state["p1Units"], state["p2Units"] = units
+    return json.dumps(state)
+
+
+def _rate(function, min_time=0.5):
+    """Calls function until min_time seconds have passed and returns the calls per second
+    """
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0
+    while elapsed < min_time:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return calls / elapsed
+
+
+def _report(name, before, after, unit="queries/s"):
+    print("{:<40} before {:>10.1f} {}  after {:>10.1f} {}  speedup {:.1f}x".format(name, before, unit, after, unit, after / before))
+
+
+def bench_path_engine():
+    """Queries per second of ShortestPathFinder against PathEngine, pathing from every friendly edge tile
+    """
+    game_state = make_random_game_state()
+    game_map = game_state.game_map
+    starts = [location for location in game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT)
+              if not game_state.contains_stationary_unit(location)]
+    end_points = game_map.get_edge_locations(game_map.TOP_RIGHT)
+    reference = ShortestPathFinder()
+    engine = PathEngine()
+
+    def run(finder):
+        for start in starts:
+            finder.navigate_multiple_endpoints(start, end_points, game_state)
+
+    before = _rate(lambda: run(reference)) * len(starts)
+    after = _rate(lambda: run(engine)) * len(starts)
+    _report("navigate_multiple_endpoints", before, after)
+
+
+def bench_path_field():
+    """Paths from all 28 friendly and all 28 enemy edge tiles, one query each against one field per target edge
+    """
+    game_state = make_random_game_state()
+    game_map = game_state.game_map
+    jobs = []
+    for start_edge, target_edge in ((game_map.BOTTOM_LEFT, game_map.TOP_RIGHT), (game_map.BOTTOM_RIGHT, game_map.TOP_LEFT),
+                                    (game_map.TOP_LEFT, game_map.BOTTOM_RIGHT), (game_map.TOP_RIGHT, game_map.BOTTOM_LEFT)):
+        starts = [location for location in game_map.get_edge_locations(start_edge) if not game_state.contains_stationary_unit(location)]
+        jobs.append((starts, target_edge))
+
+    def run_queries():
+        game_state.path_cache.clear()
+        for starts, target_edge in jobs:
+            for start in starts:
+                game_state.find_path_to_edge(start, target_edge)
+
+    def run_fields():
+        game_state._path_fields.clear()
+        for starts, target_edge in jobs:
+            game_state.path_field(target_edge).get_paths(starts)
+
+    before = _rate(run_queries)
+    after = _rate(run_fields)
+    _report("56 edge paths via path_field", before, after, "sweeps/s")
+
+
+def bench_paths_batch():
+    """find_path_to_edge in a loop against find_paths_batch given a pool of 4 processes, for the paths from every
+    edge tile of both players, which stays on this thread, and for the paths from every open tile to every edge
+    """
+    game_state = make_random_game_state()
+    game_map = game_state.game_map
+    sweep = []
+    for start_edge, target_edge in ((game_map.BOTTOM_LEFT, game_map.TOP_RIGHT), (game_map.BOTTOM_RIGHT, game_map.TOP_LEFT),
+                                    (game_map.TOP_LEFT, game_map.BOTTOM_RIGHT), (game_map.TOP_RIGHT, game_map.BOTTOM_LEFT)):
+        sweep += [(location, target_edge) for location in game_map.get_edge_locations(start_edge) if not game_state.contains_stationary_unit(location)]
+    every_tile = [(location, target_edge) for location in game_map if not game_state.contains_stationary_unit(location) for target_edge in range(4)]
+
+    def loop(queries):
+        game_state.path_cache.clear()
+        for start_location, target_edge in queries:
+            game_state.find_path_to_edge(start_location, target_edge)
+
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        def batch(queries):
+            game_state.path_cache.clear()
+            game_state.find_paths_batch(queries, executor)
+        batch(every_tile)
+        for name, queries in (("edge sweep", sweep), ("every tile", every_tile)):
+            _report("find_paths_batch, {} paths ({} cpus)".format(len(queries), os.cpu_count()),
+                    _rate(lambda: loop(queries)), _rate(lambda: batch(queries)), "batches/s")
+
+
+def bench_path_cache():
+    """find_path_to_edge from every friendly edge tile, repeated on an unchanged board, with and without the path cache
+    """
+    game_state = make_random_game_state()
+    game_map = game_state.game_map
+    starts = [location for location in game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT)
+              if not game_state.contains_stationary_unit(location)]
+
+    def run(clear):
+        if clear:
+            game_state.path_cache.clear()
+        for start in starts:
+            game_state.find_path_to_edge(start, game_map.TOP_RIGHT)
+
+    before = _rate(lambda: run(True)) * len(starts)
+    after = _rate(lambda: run(False)) * len(starts)
+    _report("find_path_to_edge (path cache)", before, after)
+
+
+def bench_path_field_repair():
+    """Keeping a path field up to date while single firewalls are toggled, rebuilt from scratch against repaired in place
+    """
+    game_state = make_random_game_state()
+    end_points = game_state.game_map.get_edge_locations(game_state.game_map.TOP_RIGHT)
+    locations = list(game_state.game_map)[::5]
+    game_state._shortest_path_finder.load_blocked(game_state.game_map)
+    blocked = bytearray(game_state._shortest_path_finder.blocked)
+    field = PathField(blocked, end_points)
+
+    def rebuild():
+        for location in locations:
+            index = location[0] + location[1] * game_state.ARENA_SIZE
+            blocked[index] ^= 1
+            PathField(blocked, end_points)
+
+    def repair():
+        for location in locations:
+            index = location[0] + location[1] * game_state.ARENA_SIZE
+            field.set_blocked(location, not field.blocked[index])
+
+    before = _rate(rebuild) * len(locations)
+    after = _rate(repair) * len(locations)
+    _report("path field update per firewall", before, after, "updates/s")
+
+
+def bench_path_overlay():
+    """Trying one extra filter per candidate tile: deep copying the GameState against a PathOverlay
+    """
+    game_state = make_random_game_state()
+    game_map = game_state.game_map
+    candidates = [location for location in game_map if location[1] < game_state.HALF_ARENA and not game_state.contains_stationary_unit(location)][::4]
+    start = [13, 0]
+
+    def copy_state():
+        for location in candidates:
+            if location == start:
+                continue
+            hypothetical = copy.deepcopy(game_state)
+            hypothetical.game_map.add_unit("FF", location)
+            hypothetical.find_path_to_edge(start, game_map.TOP_RIGHT)
+
+    def overlay():
+        game_state.path_cache.clear()
+        for location in candidates:
+            if location == start:
+                continue
+            game_state.with_overlay(blocked=[location]).find_path_to_edge(start, game_map.TOP_RIGHT)
+
+    before = _rate(copy_state) * len(candidates)
+    after = _rate(overlay) * len(candidates)
+    _report("what-if placement", before, after, "candidates/s")
+
+
+def bench_bitboard():
+    """Bitboard flood fills against the queue based _idealness_search and _validate of ShortestPathFinder
+    """
+    game_state = make_random_game_state()
+    game_map = game_state.game_map
+    starts = [location for location in game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT)
+              if not game_state.contains_stationary_unit(location)]
+    end_points = game_map.get_edge_locations(game_map.TOP_RIGHT)
+    reference = ShortestPathFinder()
+    blocked = bitboard.from_game_map(game_map)
+    open_bits = bitboard.ARENA_MASK & ~blocked
+
+    def queue_reachability():
+        for start in starts:
+            reference._idealness_search(PathContext(game_state), start, end_points)
+
+    def bitboard_reachability():
+        for start in starts:
+            bitboard.flood_fill(bitboard.location_bit(start), open_bits) & bitboard.EDGE_MASKS[game_map.TOP_RIGHT]
+
+    def queue_validate():
+        reference._validate(PathContext(game_state), end_points[0], end_points)
+
+    def bitboard_validate():
+        bitboard.distance_layers(bitboard.EDGE_MASKS[game_map.TOP_RIGHT], open_bits)
+
+    _report("reachability (queue -> bitboard)", _rate(queue_reachability) * len(starts), _rate(bitboard_reachability) * len(starts))
+    _report("validate field (queue -> bitboard)", _rate(queue_validate), _rate(bitboard_validate), "fields/s")
+
+
+class _DictGameUnit:
+    """GameUnit as it was before stats moved to shared UnitType records, kept as the baseline for bench_units
+    """
+    def __init__(self, unit_type, config, player_index=None, stability=None, x=-1, y=-1):
+        self.unit_type = unit_type
+        self.config = config
+        self.player_index = player_index
+        self.pending_removal = False
+        self.x = x
+        self.y = y
+        self.__serialize_type()
+        self.stability = self.max_stability if not stability else stability
+
+    def __serialize_type(self):
+        from .game_state import FIREWALL_TYPES, UNIT_TYPE_TO_INDEX, ENCRYPTOR
+        self.stationary = self.unit_type in FIREWALL_TYPES
+        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
+        if self.stationary:
+            self.speed = 0
+            if self.unit_type == ENCRYPTOR:
+                self.damage = type_config["shieldAmount"]
+            else:
+                self.damage = type_config["damage"]
+        else:
+            self.speed = type_config["speed"]
+            self.damage_f = type_config["damageF"]
+            self.damage_i = type_config["damageI"]
+        self.range = type_config["range"]
+        self.max_stability = type_config["stability"]
+        self.cost = type_config["cost"]
+
+
+def bench_lazy_game_state():
+    """A strategy that only reads the turn number and its resources, with an eager and a lazy GameState
+    """
+    config = json.loads(CONFIG)
+    turn_string = make_turn_string()
+    message = StateMessage(turn_string, json.loads(turn_string))
+
+    def read(lazy):
+        game_state = GameState(config, message, lazy=lazy)
+        return game_state.turn_number, game_state.get_resource(game_state.CORES)
+
+    _report("turn number and resources", _rate(lambda: read(False)), _rate(lambda: read(True)), "states/s")
+
+
+def make_action_phase(frames=120, mobiles=12, seed=0):
+    """Builds the frames of an action phase: the board of make_turn_string, with pings walking their paths
+    from the friendly edges at one step every other frame while the enemy firewalls lose stability
+    """
+    rng = random.Random(seed)
+    turn = json.loads(make_turn_string(seed))
+    game_state = GameState(json.loads(CONFIG), json.dumps(turn))
+    starts = [location for location in game_state.game_map.get_edge_locations(game_state.game_map.BOTTOM_LEFT)
+              if not game_state.contains_stationary_unit(location)]
+    paths = [game_state.find_path_to_edge(rng.choice(starts), game_state.game_map.TOP_RIGHT) for _ in range(mobiles)]
+    frames_out = []
+    for frame in range(frames):
+        state = json.loads(json.dumps(turn))
+        state["turnInfo"] = [1, 10, frame]
+        for firewall in state["p2Units"][0] + state["p2Units"][2]:
+            firewall[2] = max(1.0, firewall[2] - 0.1 * frame)
+        state["p1Units"][3] = [path[min(frame // 2, len(path) - 1)] + [15.0, str(10000 + i)] for i, path in enumerate(paths)]
+        frames_out.append(state)
+    return frames_out
+
+
+def bench_action_phase_tracker():
+    """Keeping a board of every frame of an action phase: a GameState per frame against one ActionPhaseTracker
+    """
+    config = json.loads(CONFIG)
+    messages = [StateMessage(json.dumps(state), state) for state in make_action_phase()]
+
+    def game_states():
+        for message in messages:
+            GameState(config, message)
+
+    def tracker():
+        phase = ActionPhaseTracker(config)
+        for message in messages:
+            phase.update(message)
+
+    _report("{} frame action phase board".format(len(messages)), _rate(game_states), _rate(tracker), "phases/s")
+
+
+def bench_action_phase_simulator():
+    """Simulated action phases per minute on the board of make_turn_string, with pings and EMPs from
+    both friendly edges against enemy scramblers
+    """
+    game_state = GameState(json.loads(CONFIG), make_turn_string())
+    game_map = game_state.game_map
+    starts = [location for location in game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT)
+              if not game_state.contains_stationary_unit(location)]
+    enemy_starts = [location for location in game_map.get_edge_locations(game_map.TOP_LEFT) + game_map.get_edge_locations(game_map.TOP_RIGHT)
+                    if not game_state.contains_stationary_unit(location)]
+    rng = random.Random(0)
+    deploys = [("PI",) + tuple(rng.choice(starts)) for _ in range(10)] + [("EI",) + tuple(rng.choice(starts)) for _ in range(3)]
+    enemy_deploys = [("SI",) + tuple(rng.choice(enemy_starts)) for _ in range(4)]
+    simulator = ActionPhaseSimulator.from_game_state(game_state)
+    result = simulator.simulate(deploys, enemy_deploys)
+    rate = _rate(lambda: simulator.simulate(deploys, enemy_deploys))
+    print("{:<40} {:>10.1f} phases/min ({} frames, {} breaches, {} deaths)".format(
+        "simulated action phase", rate * 60, result.frames, len(result.breaches), len(result.deaths)))
+
+
+def bench_rollouts(plans=200):
+    """Attack plans simulated per second on the board of make_turn_string, in process against a started RolloutEngine
+    """
+    config = json.loads(CONFIG)
+    game_state = GameState(config, make_turn_string())
+    starts = [location for location in game_state.game_map.get_edge_locations(game_state.game_map.BOTTOM_LEFT)
+              + game_state.game_map.get_edge_locations(game_state.game_map.BOTTOM_RIGHT) if not game_state.contains_stationary_unit(location)]
+    rng = random.Random(0)
+    candidates = [[(rng.choice(["PI", "EI"]), rng.randint(1, 8), rng.choice(starts)) for _ in range(rng.randint(1, 2))] for _ in range(plans)]
+    inline = RolloutEngine(config)
+    with RolloutEngine(config) as pooled:
+        _report("rollouts, {} workers".format(pooled.workers), _rate(lambda: inline.evaluate(game_state, candidates), 2) * plans,
+                _rate(lambda: pooled.evaluate(game_state, candidates), 2) * plans, "plans/s")
+
+
+def bench_snapshot():
+    """Size and speed of a GameState snapshot against pickling the GameState
+    """
+    config = json.loads(CONFIG)
+    game_state = GameState(config, make_turn_string())
+    pickled = pickle.dumps(game_state)
+    snapshot = game_state.to_snapshot()
+    print("{:<40} pickle {:>10} bytes  snapshot {:>10} bytes  {:.1f}x smaller".format(
+        "game state size", len(pickled), len(snapshot), len(pickled) / len(snapshot)))
+    _report("game state encode", _rate(lambda: pickle.dumps(game_state)), _rate(game_state.to_snapshot), "states/s")
+    _report("game state decode", _rate(lambda: pickle.loads(pickled)), _rate(lambda: GameState.from_snapshot(config, snapshot)), "states/s")
+    _report("board read by a worker", _rate(lambda: pickle.loads(pickled)), _rate(lambda: list(SnapshotView(snapshot).units())), "boards/s")
+
+
+def bench_shared_board():
+    """Evaluating a few plans in the pool with the board sent with each task against published once in a SharedBoard
+    """
+    config = json.loads(CONFIG)
+    game_state = GameState(config, make_turn_string())
+    plans = [[("PI", 1, [13, 0])]] * 8
+    snapshot = game_state.to_snapshot()
+    print("{:<40} snapshot {:>8} bytes  shared {:>8} bytes per task".format(
+        "board sent to a worker", len(pickle.dumps(snapshot)), len(pickle.dumps(("psm_00000000", 1)))))
+    with RolloutEngine(config, shared_board=False) as sent, RolloutEngine(config) as shared:
+        _report("evaluate, 1 plan per task", _rate(lambda: sent.evaluate(game_state, plans, chunk_size=1)),
+                _rate(lambda: shared.evaluate(game_state, plans, chunk_size=1)), "evaluates/s")
+
+
+def bench_action_frames(frames=120):
+    """Reading the breaches of every frame of an action phase, through a GameState per frame against an ActionFrame per frame
+    """
+    config = json.loads(CONFIG)
+    messages = []
+    for frame in range(frames):
+        state = json.loads(make_turn_string(seed=frame % 4))
+        state["turnInfo"] = [1, 10, frame]
+        if frame % 10 == 0:
+            state["events"]["breach"].append([[3, 17], 1.0, 3, "500", 1])
+        messages.append(StateMessage(json.dumps(state), state))
+
+    def game_states():
+        return [GameState(config, message).get_breach_locations() for message in messages]
+
+    def action_frames():
+        return [ActionFrame(config, message).get_breach_locations() for message in messages]
+
+    assert game_states() == action_frames()
+    _report("{} frame action phase".format(frames), _rate(game_states), _rate(action_frames), "phases/s")
+
+
+def bench_unit_store():
+    """Picking the target of every attacker of a frame: get_target per unit against one UnitStore.select_targets
+    """
+    try:
+        from .unit_store import UnitStore
+    except ImportError:
+        print("{:<40} skipped, NumPy is not installed".format("frame targeting"))
+        return
+    game_state = AdvancedGameState(json.loads(CONFIG), make_turn_string())
+    rng = random.Random(0)
+    middle = [location for location in game_state.game_map if 10 <= location[1] <= 17 and not game_state.contains_stationary_unit(location)]
+    for location in rng.sample(middle, 40):
+        game_state.game_map.add_unit(rng.choice(["PI", "EI", "SI"]), location, rng.randint(0, 1))
+    units = [unit for location in game_state.game_map for unit in game_state.game_map[location]]
+    attackers = [unit for unit in units if not unit.stationary or unit.unit_type == "DF"]
+    store = UnitStore.from_game_map(game_state.game_map)
+    indices = store.attackers()
+
+    def objects():
+        for unit in attackers:
+            game_state.get_target(unit)
+
+    _report("frame targeting, {} units".format(len(units)), _rate(objects), _rate(lambda: store.select_targets(indices)), "frames/s")
+
+
+def bench_units():
+    """Construction rate and memory of 1000 units, a mix of firewalls and information
+    """
+    config = json.loads(CONFIG)
+    GameState(config, TURN_0)
+    types = ["FF", "EF", "DF", "PI", "EI", "SI"] * 167
+
+    def build(unit_class):
+        return [unit_class(unit_type, config, 0, None, 13, 13) for unit_type in types[:1000]]
+
+    def memory(unit_class):
+        tracemalloc.start()
+        units = build(unit_class)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return size / len(units)
+
+    _report("construct 1000 units", _rate(lambda: build(_DictGameUnit)) * 1000, _rate(lambda: build(GameUnit)) * 1000, "units/s")
+    before, after = memory(_DictGameUnit), memory(GameUnit)
+    print("{:<40} before {:>10.1f} bytes/unit  after {:>10.1f} bytes/unit  saved {:.0f}%".format(
+        "unit memory", before, after, 100 * (1 - after / before)))
+
+
+def make_message_stream(turns=3, frames_per_turn=40):
+    """Builds the lines the engine sends over a few turns: the config, then per turn one turn message and its action frames
+    """
+    lines = [json.dumps(json.loads(CONFIG))]
+    for turn in range(turns):
+        lines.append(make_turn_string(seed=turn, turn_number=turn))
+        for frame in range(frames_per_turn):
+            state = json.loads(make_turn_string(seed=turn, turn_number=turn))
+            state["turnInfo"] = [1, turn, frame]
+            lines.append(json.dumps(state))
+    end = json.loads(TURN_0)
+    end["turnInfo"] = [2, turns, -1]
+    lines.append(json.dumps(end))
+    return "\n".join(lines) + "\n"
+
+
+class _ReplayAlgo(AlgoCore):
+    """Builds a GameState from every turn and action frame, like algo_strategy does
+    """
+    def __init__(self, reparse):
+        super().__init__()
+        self.reparse = reparse
+
+    def on_turn(self, turn_state):
+        # str() drops the parsed json of the StateMessage, which makes GameState parse the string again as it used to
+        GameState(self.config, str(turn_state) if self.reparse else turn_state)
+
+    def on_action_frame(self, turn_state):
+        GameState(self.config, str(turn_state) if self.reparse else turn_state)
+
+
+def bench_message_stream():
+    """Replays a recorded message stream through AlgoCore.start, with every message parsed twice against once
+    """
+    stream = make_message_stream()
+
+    def replay(reparse):
+        stdin, stderr = sys.stdin, sys.stderr
+        sys.stdin, sys.stderr = io.StringIO(stream), io.StringIO()
+        try:
+            _ReplayAlgo(reparse).start()
+        finally:
+            sys.stdin, sys.stderr = stdin, stderr
+
+    # Each replay builds over a hundred game states, so take the best of several interleaved runs to keep garbage collection out of it
+    best = {True: 0, False: 0}
+    for _ in range(5):
+        for reparse in best:
+            best[reparse] = max(best[reparse], _rate(lambda: replay(reparse), 0.2))
+    _report("replay {} messages".format(stream.count("\n")), best[True], best[False], "streams/s")
+
+
+def bench_range_stencils():
+    """get_locations_in_range around every tile, computed with math.sqrt per candidate tile against the stencil tables
+    """
+    game_state = make_random_game_state()
+    game_map = game_state.game_map
+    locations = list(game_map)
+
+    def sqrt_scan(location, radius):
+        x, y = location
+        found = []
+        for i in range(int(x - radius), int(x + radius + 1)):
+            for j in range(int(y - radius), int(y + radius + 1)):
+                if game_map.in_arena_bounds([i, j]) and math.sqrt((x - i)**2 + (y - j)**2) < radius + 0.51:
+                    found.append([i, j])
+        return found
+
+    for radius in (3, 5):
+        before = _rate(lambda: [sqrt_scan(location, radius) for location in locations]) * len(locations)
+        after = _rate(lambda: [game_map.get_locations_in_range(location, radius) for location in locations]) * len(locations)
+        indices = _rate(lambda: [game_map.get_indices_in_range(location, radius) for location in locations]) * len(locations)
+        _report("get_locations_in_range({})".format(radius), before, after, "calls/s")
+        _report("get_indices_in_range({})".format(radius), before, indices, "calls/s")
+
+
+def bench_threat_map():
+    """Destructor damage at every tile for both players, with get_attackers per tile against a ThreatMap,
+    and one firewall placed and removed against rebuilding the map
+    """
+    config = json.loads(CONFIG)
+    game_state = AdvancedGameState(config, make_turn_string())
+    locations = list(game_state.game_map)
+    damage = config["unitInformation"][2]["damage"]
+
+    def per_tile():
+        return [[damage * len(game_state.get_attackers(location, player_index)) for location in locations] for player_index in (0, 1)]
+
+    def one_pass():
+        game_state._threat_maps.clear()
+        return game_state.threat_map()
+
+    _report("threat at every tile", _rate(per_tile), _rate(one_pass), "boards/s")
+    threat_map = game_state.threat_map()
+    location = next(location for location in locations if not game_state.contains_stationary_unit(location))
+
+    def edit(rebuild):
+        game_state.game_map.add_unit("DF", location, 1)
+        (threat_map.rebuild if rebuild else threat_map.update)(game_state.game_map)
+        game_state.game_map.remove_unit(location)
+        (threat_map.rebuild if rebuild else threat_map.update)(game_state.game_map)
+
+    _report("threat after a firewall edit", _rate(lambda: edit(True)) * 2, _rate(lambda: edit(False)) * 2, "edits/s")
+
+
+def bench_shield_map():
+    """Shield coverage after attempt_spawn places an encryptor, rebuilding the ShieldMap against updating it
+    """
+    config = json.loads(CONFIG)
+    game_state = GameState(config, make_turn_string())
+    shield_map = game_state.shield_map()
+    location = next(location for location in game_state.game_map
+                    if location[1] < game_state.HALF_ARENA and not game_state.contains_stationary_unit(location))
+
+    def placed(rebuild):
+        game_state.game_map.add_unit("EF", location, 0)
+        (shield_map.rebuild if rebuild else shield_map.update)(game_state.game_map)
+        game_state.game_map.remove_unit(location)
+        (shield_map.rebuild if rebuild else shield_map.update)(game_state.game_map)
+
+    _report("shield map after an encryptor", _rate(lambda: placed(True)) * 2, _rate(lambda: placed(False)) * 2, "edits/s")
+
+
+def bench_path_damage():
+    """Survivors of 5 pings from every spawn location, simulating each location against one path_damage call
+    """
+    config = json.loads(CONFIG)
+    game_state = GameState(config, make_turn_string())
+    locations = [location for location in game_state.game_map.get_edge_locations(game_state.game_map.BOTTOM_LEFT)
+                 + game_state.game_map.get_edge_locations(game_state.game_map.BOTTOM_RIGHT) if not game_state.contains_stationary_unit(location)]
+    simulator = ActionPhaseSimulator.from_game_state(game_state)
+
+    def simulated():
+        return [len(simulator.simulate([("PI", location[0], location[1])] * 5).breaches) for location in locations]
+
+    _report("pings from every spawn location", _rate(simulated), _rate(lambda: game_state.path_damage("PI", 5, locations)), "turns/s")
+
+
+def bench_spawn_batch():
+    """The wall building of a turn, 40 firewall placements, with can_spawn and attempt_spawn per location against one attempt_spawn_batch
+    """
+    config = json.loads(CONFIG)
+    game_state = GameState(config, make_turn_string())
+    requests = [(unit_type, [x, y], 1) for y, unit_type in ((11, "FF"), (10, "DF")) for x in range(3, 25) if x not in (13, 14)]
+    free = [location for unit_type, location, count in requests if not game_state.game_map[location]]
+
+    def built(batch):
+        game_state._player_resources[0]['cores'] = 60
+        if batch:
+            game_state.attempt_spawn_batch(requests, warn=False)
+        else:
+            for unit_type, location, count in requests:
+                if game_state.can_spawn(unit_type, location):
+                    game_state.attempt_spawn(unit_type, location)
+        for location in free:
+            game_state.game_map.remove_unit(location)
+        game_state._build_stack.clear()
+
+    _report("wall building", _rate(lambda: built(False)), _rate(lambda: built(True)), "turns/s")
+
+
+def run_turn(config, turn_string):
+    """A typical turn: parse the state, scan the board, look at ranges around firewalls, place a wall and path once
+    """
+    game_state = GameState(config, turn_string)
+    game_map = game_state.game_map
+    for location in game_map:
+        game_state.contains_stationary_unit(location)
+    for unit in game_state.get_all_units_of_type("firewall", "enemy"):
+        game_map.get_locations_in_range([unit.x, unit.y], unit.range)
+    for x in range(3, 25):
+        for y in (10, 11):
+            if game_state.can_spawn("FF", [x, y]):
+                game_state.attempt_spawn("FF", [x, y])
+    for location in game_map.get_edge_locations(game_map.BOTTOM_LEFT):
+        game_state.can_spawn("PI", location)
+    game_state.path_cache.clear()
+    for location in game_map.get_edge_locations(game_map.BOTTOM_LEFT):
+        if not game_state.contains_stationary_unit(location):
+            game_state.find_path_to_edge(location, game_map.TOP_RIGHT)
+            break
+    return game_state
+
+
+def bench_turn():
+    """Wall clock time of run_turn
+    """
+    config = json.loads(CONFIG)
+    turn_string = make_turn_string()
+    rate = _rate(lambda: run_turn(config, turn_string))
+    print("{:<40} {:>10.3f} ms/turn".format("typical turn", 1000 / rate))
+
+
+def bench_arena_hot_paths():
+    """Calls per second of the GameMap and GameState functions that run inside most loops
+    """
+    game_state = GameState(json.loads(CONFIG), make_turn_string())
+    game_map = game_state.game_map
+    locations = [[x, y] for x in range(game_state.ARENA_SIZE) for y in range(game_state.ARENA_SIZE)]
+    spawn_locations = [[x, y] for x in range(28) for y in range(14)]
+    checks = [
+        ("in_arena_bounds", lambda: [game_map.in_arena_bounds(location) for location in locations], len(locations)),
+        ("iterate GameMap", lambda: list(game_map), 1),
+        ("can_spawn", lambda: [game_state.can_spawn("PI", location) for location in spawn_locations], len(spawn_locations)),
+        ("get_locations_in_range(3)", lambda: game_map.get_locations_in_range([13, 13], 3), 1),
+    ]
+    for name, function, calls in checks:
+        print("{:<40} {:>10.1f} calls/s".format(name, _rate(function) * calls))
+
+
+BENCHMARKS = [bench_turn, bench_lazy_game_state, bench_message_stream, bench_action_frames, bench_action_phase_tracker, bench_action_phase_simulator, bench_snapshot, bench_rollouts, bench_shared_board, bench_unit_store, bench_units, bench_arena_hot_paths, bench_range_stencils, bench_threat_map, bench_shield_map, bench_path_damage, bench_spawn_batch, bench_path_engine, bench_path_field, bench_paths_batch, bench_path_cache, bench_path_field_repair, bench_path_overlay, bench_bitboard]
+
+
+if __name__ == "__main__":
+    for benchmark in BENCHMARKS:
+        benchmark()
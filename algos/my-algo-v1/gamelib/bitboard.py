@@ -0,0 +1,160 @@
+"""
+Bitboards: sets of arena tiles stored as the bits of one Python int.
+
+Bit x + y * ARENA_SIZE stands for location [x, y], the same indexing as the flat arrays of
+PathEngine. Union, intersection and neighborhood expansion of whole tile sets are then a few
+integer operations, which makes flood fills and breadth first searches cost one step per
+distance layer instead of one step per tile.
+"""
+
+from .arena import ARENA_SIZE, EDGE_LOCATIONS, TILES
+
+ARENA_MASK = 0
+for _index, _x, _y in TILES:
+    ARENA_MASK |= 1 << _index
+
+# Columns that must not receive bits shifted in from the neighboring row
+_NOT_FIRST_COLUMN = 0
+_NOT_LAST_COLUMN = 0
+for _index, _x, _y in TILES:
+    if not _x == 0:
+        _NOT_FIRST_COLUMN |= 1 << _index
+    if not _x == ARENA_SIZE - 1:
+        _NOT_LAST_COLUMN |= 1 << _index
+
+ROW_MASK = (1 << ARENA_SIZE) - 1
+
+
+def location_bit(location):
+    """Gets the bitboard holding only the given location
+    """
+    return 1 << (location[0] + location[1] * ARENA_SIZE)
+
+
+def from_locations(locations):
+    """Converts a list of locations to a bitboard
+    """
+    bits = 0
+    for location in locations:
+        bits |= 1 << (location[0] + location[1] * ARENA_SIZE)
+    return bits
+
+
+# Indexed like GameMap.get_edges: [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right
+EDGE_MASKS = tuple(from_locations(edge) for edge in EDGE_LOCATIONS)
+
+
+def iter_indices(bits):
+    """Yields the flat index of every tile in a bitboard, lowest first
+    """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def to_locations(bits):
+    """Converts a bitboard to a list of [x, y] locations
+    """
+    return [[index % ARENA_SIZE, index // ARENA_SIZE] for index in iter_indices(bits)]
+
+
+def count(bits):
+    """The number of tiles in a bitboard
+    """
+    return bin(bits).count("1")
+
+
+def from_game_map(game_map):
+    """Gets the bitboard of every tile of a GameMap holding a stationary unit, as PathEngine.load_blocked reads it
+    """
+    # path_engine builds on this module, so it is imported on first use
+    from .path_engine import PathEngine
+    return PathEngine().load_blocked(game_map)
+
+
+def to_game_map(bits, game_map, unit_type, player_index=0):
+    """Places a unit of the given type on every tile of a bitboard
+
+    Args:
+        * bits: The tiles to fill
+        * game_map: The GameMap to add the units to
+        * unit_type: The type of unit to add
+        * player_index: The player controlling the new units, 0 for you 1 for the enemy
+
+    Returns:
+        The game_map that was passed in
+    """
+    for x, y in to_locations(bits & ARENA_MASK):
+        game_map.add_unit(unit_type, [x, y], player_index)
+    return game_map
+
+
+def expand(bits):
+    """Gets the tiles orthogonally adjacent to any tile in bits, inside the arena
+    """
+    return (((bits << 1) & _NOT_FIRST_COLUMN) | ((bits >> 1) & _NOT_LAST_COLUMN) |
+            (bits << ARENA_SIZE) | (bits >> ARENA_SIZE)) & ARENA_MASK
+
+
+def flood_fill(seeds, open_bits):
+    """Gets every tile of open_bits connected to the seeds
+
+    Args:
+        * seeds: The bitboard to start from, only seeds inside open_bits are used
+        * open_bits: The tiles that can be walked on
+
+    Returns:
+        The bitboard of reachable tiles
+    """
+    reached = seeds & open_bits
+    frontier = reached
+    while frontier:
+        frontier = expand(frontier) & open_bits & ~reached
+        reached |= frontier
+    return reached
+
+
+def distance_layers(seeds, open_bits):
+    """Breadth first search by layers
+
+    Seeds outside open_bits are part of the first layer but are not expanded, like blocked
+    end points in ShortestPathFinder._validate.
+
+    Args:
+        * seeds: The tiles at distance 0
+        * open_bits: The tiles that can be walked on
+
+    Returns:
+        A list of bitboards, the tiles at distance i being layers[i]
+    """
+    layers = [seeds]
+    reached = seeds
+    frontier = seeds & open_bits
+    while frontier:
+        frontier = expand(frontier) & open_bits & ~reached
+        if not frontier:
+            break
+        layers.append(frontier)
+        reached |= frontier
+    return layers
+
+
+def most_ideal(bits, direction):
+    """Gets the index of the tile of bits with the highest idealness, see ShortestPathFinder._get_idealness
+
+    Args:
+        * bits: A non empty bitboard
+        * direction: The (x, y) direction of the target edge
+
+    """
+    if direction[1] == 1:
+        row = (bits.bit_length() - 1) // ARENA_SIZE
+    else:
+        row = ((bits & -bits).bit_length() - 1) // ARENA_SIZE
+    row_bits = (bits >> (row * ARENA_SIZE)) & ROW_MASK
+    if direction[0] == 1:
+        x = row_bits.bit_length() - 1
+    else:
+        x = (row_bits & -row_bits).bit_length() - 1
+    return x + row * ARENA_SIZE
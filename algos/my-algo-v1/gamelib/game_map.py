@@ -1,6 +1,19 @@
 import math
+import random
 import warnings
 from .unit import GameUnit
+from .arena import IN_BOUNDS, IN_BOUNDS_LOCATIONS, LOCATIONS, EDGE_LOCATIONS, _in_arena_bounds, indices_in_range
+
+# A random 64 bit key per tile, used to fingerprint the set of blocked tiles (Zobrist hashing)
+_key_generator = random.Random(28)
+_TILE_KEYS = [[_key_generator.getrandbits(64) for y in range(28)] for x in range(28)]
+
+
+def fingerprint_key(location):
+    """The value a location contributes to GameMap.fingerprint while it is blocked
+    """
+    return _TILE_KEYS[location[0]][location[1]]
+
 
 class GameMap:
     """Holds data about the current game map and provides functions
@@ -13,6 +26,8 @@ class GameMap:
 
     Attributes:
         * config (JSON): Contains information about the game
+        * fingerprint (int): A hash of the set of tiles holding a stationary unit, kept up to date by add_unit,
+          remove_unit and item assignment. Call refresh_fingerprint after changing a tile's unit list in place.
         * ARENA_SIZE (int): The size of the arena.
         * HALF_ARENA (int): Half of the size of the arena.
         * TOP_RIGHT (int): A constant that represents the top right edge
@@ -36,7 +51,8 @@ class GameMap:
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
         self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self.fingerprint = 0
+        self.__blocked_listeners = []
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
@@ -46,34 +62,61 @@ class GameMap:
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            x, y = location
+            was_blocked = self.__tile_blocked(x, y)
+            self.__map[x][y] = val
+            if not was_blocked == self.__tile_blocked(x, y):
+                self.__blocked_changed(x, y, not was_blocked)
             return
         self._invalid_coordinates(location)
 
     def __iter__(self):
-        self.__start = [13,0]
-        return self
-    
-    def __next__(self):
-        location = self.__start
-        if location == [15,27]:
-            raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        # A new iterator each time, so that nested loops and other threads can iterate the map at the same time
+        return ([x, y] for x, y in LOCATIONS)
 
     def __empty_grid(self):
-        grid = []
-        for x in range(0, self.ARENA_SIZE):
-            grid.append([])
-            for _ in range(0, self.ARENA_SIZE):
-                grid[x].append([])
-        return grid
+        return [[[] for _ in range(self.ARENA_SIZE)] for _ in range(self.ARENA_SIZE)]
+
+    def __tile_blocked(self, x, y):
+        for unit in self.__map[x][y]:
+            if unit.stationary:
+                return True
+        return False
+
+    def __blocked_changed(self, x, y, blocked):
+        self.fingerprint ^= _TILE_KEYS[x][y]
+        for listener in self.__blocked_listeners:
+            listener([x, y], blocked, self.fingerprint)
+
+    def add_blocked_listener(self, listener):
+        """Registers a function to call whenever a tile becomes blocked or unblocked through add_unit,
+        remove_unit or item assignment
+
+        Args:
+            * listener: A function taking the location, True if it is now blocked or False if it was cleared,
+              and the new fingerprint. Listeners are kept by the map, so they should not hold on to the map or its owner
+
+        """
+        self.__blocked_listeners.append(listener)
+
+    def refresh_fingerprint(self):
+        """Recomputes the fingerprint from scratch. Needed only after the unit list of a tile was changed in place
+        """
+        fingerprint = 0
+        for x, column in enumerate(self.__map):
+            for y, units in enumerate(column):
+                for unit in units:
+                    if unit.stationary:
+                        fingerprint ^= _TILE_KEYS[x][y]
+                        break
+        self.fingerprint = fingerprint
+
+    def units(self):
+        """Iterates over every unit on the map, tile by tile in the order the map is iterated in
+        """
+        grid = self.__map
+        for x, y in LOCATIONS:
+            yield from grid[x][y]
 
     def _invalid_coordinates(self, location):
         warnings.warn("{} is out of bounds.".format(str(location)))
@@ -89,19 +132,10 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        if (x, y) in IN_BOUNDS_LOCATIONS:
+            return True
+        # The table only holds whole tiles, other coordinates are checked against the diamond itself
+        return not (type(x) is int and type(y) is int) and _in_arena_bounds(x, y)
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -120,8 +154,7 @@ class GameMap:
         if not quadrant_description in [self.TOP_LEFT, self.TOP_RIGHT, self.BOTTOM_LEFT, self.BOTTOM_RIGHT]:
             warnings.warn("Passed invalid quadrent_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
 
-        edges = self.get_edges()
-        return edges[quadrant_description]
+        return [[x, y] for x, y in EDGE_LOCATIONS[quadrant_description]]
 
     def get_edges(self):
         """Gets all of the edges and their edge locations
@@ -130,27 +163,7 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        return [[[x, y] for x, y in edge] for edge in EDGE_LOCATIONS]
     
     def add_unit(self, unit_type, location, player_index=0):
         """Add a single GameUnit to the map at the given location.
@@ -173,7 +186,10 @@ class GameMap:
         if not new_unit.stationary:
             self.__map[x][y].append(new_unit)
         else:
+            was_blocked = self.__tile_blocked(x, y)
             self.__map[x][y] = [new_unit]
+            if not was_blocked:
+                self.__blocked_changed(x, y, True)
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -188,7 +204,10 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
+        was_blocked = self.__tile_blocked(x, y)
         self.__map[x][y] = []
+        if was_blocked:
+            self.__blocked_changed(x, y, False)
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -207,15 +226,36 @@ class GameMap:
             self._invalid_coordinates(location)
 
         x, y = location
+        if x == int(x) and y == int(y) and radius == int(radius):
+            return [[index % 28, index // 28] for index in indices_in_range(int(x), int(y), radius)]
+
         locations = []
         for i in range(int(x - radius), int(x + radius + 1)):
             for j in range(int(y - radius), int(y + radius + 1)):
-                new_location = [i, j]
                 # A unit with a given range affects all locations who's centers are within that range + 0.51 so we add 0.51 here
-                if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + 0.51:
-                    locations.append(new_location)
+                if 0 <= i < 28 and 0 <= j < 28 and IN_BOUNDS[i + j * 28] and math.sqrt((x - i)**2 + (y - j)**2) < radius + 0.51:
+                    locations.append([i, j])
         return locations
 
+    def get_indices_in_range(self, location, radius):
+        """Gets the tiles in a circular area around a location as tile indices (x + y * ARENA_SIZE)
+
+        A faster version of get_locations_in_range for callers that only iterate over the result.
+        The tuple returned is shared between calls and must not be modified.
+
+        Args:
+            * location: The center of our search area, with whole number coordinates
+            * radius: The radius of our search area, a whole number
+
+        Returns:
+            A tuple with the index of each location within our search area
+
+        """
+        x, y = location
+        if not (x == int(x) and y == int(y) and radius == int(radius)):
+            return tuple(location[0] + location[1] * self.ARENA_SIZE for location in self.get_locations_in_range(location, radius))
+        return indices_in_range(int(x), int(y), radius)
+
     def distance_between_locations(self, location_1, location_2):
         """Euclidean distance
 
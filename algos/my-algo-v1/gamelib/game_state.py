@@ -1,15 +1,52 @@
+import functools
 import math
 import json
 import warnings
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
-from .navigation import ShortestPathFinder
+from .path_engine import PathEngine, PathField, find_paths
+from .path_cache import default_path_cache, copy_path
+from .path_overlay import PathOverlay
+from .path_damage import integrate_path_damage
 from .util import send_command, debug_write
 from .unit import GameUnit
-from .game_map import GameMap
+from .game_map import GameMap, fingerprint_key
+from .arena import SPAWN_EDGE_INDICES, _tile_of
+from .snapshot import pack_game_state, SnapshotView
+from .shield_map import ShieldMap
+from .threat_map import ThreatMap
+from .bitboard import iter_indices
 
 def is_stationary(unit_type):
     return unit_type in FIREWALL_TYPES
 
+# What one request of GameState.attempt_spawn_batch gave
+#   unit_type: The type of unit requested
+#   location:  The location requested
+#   requested: The number of units requested
+#   spawned:   The number of units spawned
+#   reason:    Why fewer units than requested were spawned, None if they all were. One of "invalid unit",
+#              "invalid count", "out of bounds" (also for fractional locations), "wrong territory", "blocked",
+#              "not on edge" or "unaffordable"
+SpawnOutcome = namedtuple("SpawnOutcome", ["unit_type", "location", "requested", "spawned", "reason"])
+
+# The attributes a lazy GameState reads on first use, and the section of the state each one is read from
+_LAZY_SECTIONS = {
+    'my_health': 'stats', 'my_time': 'stats', 'enemy_health': 'stats', 'enemy_time': 'stats', '_player_resources': 'stats',
+    'game_map': 'units', '_friendly_unit_list': 'units', '_enemy_unit_list': 'units',
+    '_breach_locations': 'events',
+}
+
+def _repair_path_fields(path_fields, location, blocked, fingerprint):
+    """Repairs the cached path fields of a GameState in place when a firewall is added or removed from the map
+    """
+    previous_fingerprint = fingerprint ^ fingerprint_key(location)
+    for cached in path_fields.values():
+        if cached[0] == previous_fingerprint:
+            cached[1].set_blocked(location, blocked)
+            cached[0] = fingerprint
+
 class GameState:
     """Represents the entire gamestate for a given turn
     Provides methods related to resources and unit deployment
@@ -35,14 +72,18 @@ class GameState:
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * path_cache (:obj: PathCache): The cache used by find_path_to_edge, shared between turns by default
     """
 
-    def __init__(self, config, serialized_string):
+    def __init__(self, config, serialized_string, state=None, lazy=False):
         """ Setup a turns variables using arguments passed
 
         Args:
             * config (JSON): A json object containing information about the game
             * serialized_string (string): A string containing information about the game state at the start of this turn
+            * state (dict): The already parsed serialized_string. Read from serialized_string if it is a StateMessage
+            * lazy (bool): Only read the turn number now. The stats, the map with the unit lists and the events are
+              each read from the parsed state the first time something uses them
 
         """
         self.serialized_string = serialized_string
@@ -73,28 +114,115 @@ class GameState:
         self.BITS = 0
         self.CORES = 1
 
-        self.game_map = GameMap(self.config)
-        self._shortest_path_finder = ShortestPathFinder()
+        self._shortest_path_finder = PathEngine()
+        self._path_fields = {}
+        self._threat_maps = {}
+        self._shield_map = None
+        self.path_cache = default_path_cache
         self._build_stack = []
         self._deploy_stack = []
-        self._breach_locations = []
-        self._enemy_unit_list = []
-        self._friendly_unit_list = []
-        self._player_resources = [
-                {'cores': 0, 'bits': 0},  # player 0, which is you
-                {'cores': 0, 'bits': 0}]  # player 1, which is the opponent
-        self.__parse_state(serialized_string)
+        if state is None:
+            state = getattr(serialized_string, "state", None)
+        if state is None:
+            state = json.loads(serialized_string)
+        self.turn_number = int(state["turnInfo"][1])
+        if lazy:
+            self.__state = state
+            return
+        self.__parse_stats(state)
+        self.__parse_units(state)
+        self.__parse_events(state)
+
+    @classmethod
+    def from_state(cls, config, state, lazy=False):
+        """Builds a game state from an already parsed game state message
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * state (dict): The parsed game state message. It is only read, so one message can back several game states
+            * lazy (bool): Read the sections of the state on first use, see __init__
+
+        Returns:
+            The new game state, whose serialized_string is None
 
-    def __parse_state(self, state_line):
         """
-        Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        return cls(config, None, state, lazy)
+
+    @classmethod
+    def from_snapshot(cls, config, snapshot):
+        """Rebuilds a game state from a snapshot made by to_snapshot
+
+        Args:
+            * config (JSON): The config the snapshot was made with
+            * snapshot: The snapshot, as bytes or any other buffer. It is read in place
+
+        Returns:
+            The game state, whose serialized_string is None
+
         """
-        state = json.loads(state_line)
+        view = SnapshotView(snapshot)
+        unit_types = len(config["unitInformation"])
+        state = {
+            "turnInfo": [0, view.turn_number, -1],
+            "p1Stats": list(view.stats[0]),
+            "p2Stats": list(view.stats[1]),
+            "p1Units": [[] for _ in range(unit_types)],
+            "p2Units": [[] for _ in range(unit_types)],
+            "events": {"breach": [[location] for location in view.breach_locations()]},
+        }
+        game_state = cls.from_state(config, state)
+        game_state.__add_snapshot_units(view)
+        return game_state
+
+    def to_snapshot(self):
+        """Packs this game state into a compact binary snapshot, to send to other processes or to store
+
+        The snapshot holds the turn, the stats and resources of both players, the units on the map and the
+        breach locations. Units placed with attempt_spawn are included, the queued builds and deploys are not.
+        See snapshot.py for the layout, and snapshot.SnapshotView to read one without rebuilding the game state.
+
+        Returns:
+            The snapshot as bytes
 
-        turn_info = state["turnInfo"]
-        self.turn_number = int(turn_info[1])
+        """
+        return pack_game_state(self)
+
+    def __add_snapshot_units(self, view):
+        config = self.config
+        game_map = self.game_map
+        unit_lists = (self._friendly_unit_list, self._enemy_unit_list)
+        shorthands = [type_config.get("shorthand") for type_config in config["unitInformation"]]
+        for unit_type, player_index, x, y, stability, pending_removal, unit_id in view.units(shorthands):
+            unit = GameUnit(unit_type, config, player_index, None, x, y, unit_id)
+            unit.stability = stability
+            unit.pending_removal = pending_removal
+            game_map[x, y].append(unit)
+            unit_lists[player_index].append(unit)
+        # The snapshot has the blocked tiles, so the fingerprint does not need a pass over the map
+        fingerprint = 0
+        for index in iter_indices(view.blocked_bits()):
+            fingerprint ^= fingerprint_key((index % self.ARENA_SIZE, index // self.ARENA_SIZE))
+        game_map.fingerprint = fingerprint
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not set, which are the sections a lazy game state has not read yet
+        state = self.__dict__.get("_GameState__state")
+        section = _LAZY_SECTIONS.get(name)
+        if state is None or section is None:
+            raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+        if section == "stats":
+            self.__parse_stats(state)
+        elif section == "units":
+            self.__parse_units(state)
+        else:
+            self.__parse_events(state)
+        return self.__dict__[name]
 
+    def __parse_stats(self, state):
+        """
+        Reads the health, time and resources of both players.
+        state is the game state as parsed json.
+        """
         p1_health, p1_cores, p1_bits, p1_time = map(float, state["p1Stats"][:4])
         p2_health, p2_cores, p2_bits, p2_time = map(float, state["p2Stats"][:4])
 
@@ -104,23 +232,36 @@ class GameState:
         self.enemy_time = p2_time
 
         self._player_resources = [
-            {'cores': p1_cores, 'bits': p1_bits},
-            {'cores': p2_cores, 'bits': p2_bits}]
+            {'cores': p1_cores, 'bits': p1_bits},  # player 0, which is you
+            {'cores': p2_cores, 'bits': p2_bits}]  # player 1, which is the opponent
 
-        p1units = state["p1Units"]
-        p2units = state["p2Units"]
+    def __parse_units(self, state):
+        """
+        Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
+        state is the game state as parsed json.
+        """
+        self.game_map = GameMap(self.config)
+        # Bound to the fields only, a bound method would make a reference cycle that keeps every GameState alive until garbage collection
+        self.game_map.add_blocked_listener(functools.partial(_repair_path_fields, self._path_fields))
+        self._enemy_unit_list = []
+        self._friendly_unit_list = []
 
-        self.__create_parsed_units(p1units, 0)
-        self.__create_parsed_units(p2units, 1)
-        
-        events = state['events']
-        
-        for breach in events['breach']:
+        self.__create_parsed_units(state["p1Units"], 0)
+        self.__create_parsed_units(state["p2Units"], 1)
+
+        self.game_map.refresh_fingerprint()
+
+    def __parse_events(self, state):
+        """
+        Reads the events of the serialized game state. state is the game state as parsed json.
+        """
+        self._breach_locations = []
+        for breach in state['events']['breach']:
             self._breach_locations.append(breach[0])
 
     def __create_parsed_units(self, units, player_number):
         """
-        Helper function for __parse_state to add units to the map.
+        Helper function for __parse_units to add units to the map.
         """
         typedef = self.config.get("unitInformation")
         for i, unit_types in enumerate(units):
@@ -132,7 +273,7 @@ class GameState:
                 # This depends on RM always being the last type to be processed
                 if unit_type == REMOVE:
                     self.game_map[x,y][0].pending_removal = True
-                unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
+                unit = GameUnit(unit_type, self.config, player_number, hp, x, y, uinfo[3] if len(uinfo) > 3 else None)
                 self.game_map[x,y].append(unit)
                 if player_number == 0:
                     self._friendly_unit_list.append(unit)
@@ -278,14 +419,14 @@ class GameState:
             self._invalid_unit(unit_type)
             return
         
-        if not self.game_map.in_arena_bounds(location):
+        if _tile_of(location) is None:
             return False
 
         affordable = self.number_affordable(unit_type) >= num
         stationary = is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = location[0] + location[1] * self.ARENA_SIZE in SPAWN_EDGE_INDICES[0]
 
         return (affordable and correct_territory and not blocked and
                 (stationary or on_edge) and
@@ -316,7 +457,7 @@ class GameState:
         for location in locations:
             for i in range(num):
                 if self.can_spawn(unit_type, location):
-                    x, y = map(int, location)
+                    x, y = _tile_of(location)
                     cost = self.type_cost(unit_type)
                     resource_type = self.__resource_required(unit_type)
                     self.__set_resource(resource_type, 0 - cost)
@@ -330,6 +471,83 @@ class GameState:
                     warnings.warn("Could not spawn {} number {} at location {}. Location is blocked, invalid, or you don't have enough resources.".format(unit_type, i, location))
         return spawned_units
 
+    def attempt_spawn_batch(self, requests, warn=True):
+        """Attempts many spawns at once, in order
+
+        Each request is checked like attempt_spawn checks it, against the resources and tiles the
+        requests before it left, but with a running count of your cores and bits and bitboards of the
+        tiles the batch has used instead of the map. Nothing changes until every request has been
+        checked: then the units are added to the map, in the order of the requests, the build and
+        deploy stacks are extended and your resources are updated, all together.
+
+        Args:
+            * requests: A list of (unit_type, location, count) requests, in the order to place them
+            * warn: Warn about each request that spawned fewer units than it asked for
+
+        Returns:
+            A SpawnOutcome for each request, in the order of requests
+
+        """
+        game_map = self.game_map
+        cores = self.get_resource(self.CORES)
+        bits = self.get_resource(self.BITS)
+        costs = {}
+        # The tiles the batch has put a firewall on, and an information unit on, as bitboards
+        built = occupied = 0
+        placed = []
+        outcomes = []
+        for unit_type, location, count in requests:
+            spawned = 0
+            reason = None
+            tile = _tile_of(location)
+            if unit_type not in ALL_UNITS:
+                reason = "invalid unit"
+            elif count < 1:
+                reason = "invalid count"
+            elif tile is None:
+                reason = "out of bounds"
+            elif tile[1] >= self.HALF_ARENA:
+                reason = "wrong territory"
+            else:
+                x, y = tile
+                index = x + y * self.ARENA_SIZE
+                bit = 1 << index
+                stationary = unit_type in FIREWALL_TYPES
+                if built & bit or (stationary and occupied & bit) or game_map[x, y] and (stationary or self.contains_stationary_unit((x, y))):
+                    reason = "blocked"
+                elif not stationary and index not in SPAWN_EDGE_INDICES[0]:
+                    reason = "not on edge"
+                else:
+                    cost = costs.get(unit_type)
+                    if cost is None:
+                        cost = costs[unit_type] = self.type_cost(unit_type)
+                    spawned = min(1 if stationary else count, math.floor((cores if stationary else bits) / cost))
+                    if spawned < count:
+                        # A firewall fills its tile, so the rest of the request is blocked by the first one
+                        reason = "blocked" if stationary and spawned else "unaffordable"
+                    if spawned:
+                        if stationary:
+                            cores -= cost * spawned
+                            built |= bit
+                        else:
+                            bits -= cost * spawned
+                            occupied |= bit
+                        placed.extend([(unit_type, x, y, stationary)] * spawned)
+            if reason is not None and warn:
+                if reason == "invalid unit":
+                    self._invalid_unit(unit_type)
+                else:
+                    warnings.warn("Could only spawn {} of {} {} at location {}: {}.".format(spawned, count, unit_type, location, reason))
+            outcomes.append(SpawnOutcome(unit_type, location, count, spawned, reason))
+
+        for unit_type, x, y, stationary in placed:
+            game_map.add_unit(unit_type, (x, y), 0)
+        self._build_stack.extend((unit_type, x, y) for unit_type, x, y, stationary in placed if stationary)
+        self._deploy_stack.extend((unit_type, x, y) for unit_type, x, y, stationary in placed if not stationary)
+        self.__set_resource(self.CORES, cores - self.get_resource(self.CORES))
+        self.__set_resource(self.BITS, bits - self.get_resource(self.BITS))
+        return outcomes
+
     def attempt_remove(self, locations):
         """Attempts to remove existing friendly firewalls in the given locations.
 
@@ -344,8 +562,9 @@ class GameState:
             locations = [locations]
         removed_units = 0
         for location in locations:
-            if location[1] < self.HALF_ARENA and self.contains_stationary_unit(location):
-                x, y = map(int, location)
+            tile = _tile_of(location)
+            if tile is not None and tile[1] < self.HALF_ARENA and self.contains_stationary_unit(tile):
+                x, y = tile
                 self._build_stack.append((REMOVE, x, y))
                 removed_units += 1
             else:
@@ -363,12 +582,171 @@ class GameState:
             A list of locations corresponding to the path the unit would take 
             to get from it's starting location to the best available end location
 
+        Paths are cached in self.path_cache, keyed on the current firewall layout.
         """
         if self.contains_stationary_unit(start_location):
             warnings.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
             return
-        end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        key = (self.game_map.fingerprint, int(start_location[0]), int(start_location[1]), target_edge)
+        path = self.path_cache.get(key)
+        if path is None:
+            end_points = self.game_map.get_edge_locations(target_edge)
+            path = self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+            self.path_cache.put(key, path)
+        return copy_path(start_location, path)
+
+    def find_paths_batch(self, queries, executor=None, workers=None, min_parallel=256):
+        """Gets the paths of many hypothetical units at once, like calling find_path_to_edge for each
+
+        The board is read once, cached paths are reused, and the remaining queries are split between
+        the workers of an executor. Pass a concurrent.futures.ProcessPoolExecutor to path on several
+        cores; its workers only receive the blocked tiles as one int and the query locations.
+        Sending work to a pool costs more than a full sweep of the spawn edges (at most 56 searches)
+        takes on one core, so smaller batches are searched on this thread.
+
+        Args:
+            * queries: A list of (start_location, target_edge) pairs
+            * executor: A concurrent.futures executor to run the searches on. Kept open, so it can be reused across turns
+            * workers: The number of chunks to split the searches into. Without an executor, a thread pool of
+              this size is used for the call, and the searches run on this thread if it is not given
+            * min_parallel: Run the searches on this thread when fewer than this many are not cached, whatever
+              executor or workers are given
+
+        Returns:
+            A list with the path for each query in the same order, None for blocked start locations
+
+        """
+        results = [None] * len(queries)
+        pending = {}
+        for i, (start_location, target_edge) in enumerate(queries):
+            if self.contains_stationary_unit(start_location):
+                warnings.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+                continue
+            key = (self.game_map.fingerprint, int(start_location[0]), int(start_location[1]), target_edge)
+            if key in pending:
+                pending[key].append(i)
+                continue
+            path = self.path_cache.get(key)
+            if path is None:
+                pending[key] = [i]
+            else:
+                results[i] = copy_path(start_location, path)
+        if not pending:
+            return results
+
+        keys = list(pending)
+        blocked_bits = self._shortest_path_finder.load_blocked(self.game_map)
+        jobs = [([x, y], self.game_map.get_edge_locations(target_edge)) for _, x, y, target_edge in keys]
+        if (executor is None and not workers) or len(jobs) < min_parallel:
+            paths = find_paths(blocked_bits, jobs)
+        else:
+            chunks = max(1, min(workers or getattr(executor, "_max_workers", 1), len(jobs)))
+            size = -(-len(jobs) // chunks)
+            job_chunks = [jobs[i:i + size] for i in range(0, len(jobs), size)]
+            if executor is None:
+                with ThreadPoolExecutor(max_workers=chunks) as pool:
+                    chunk_paths = list(pool.map(find_paths, [blocked_bits] * len(job_chunks), job_chunks))
+            else:
+                chunk_paths = list(executor.map(find_paths, [blocked_bits] * len(job_chunks), job_chunks))
+            paths = [path for chunk in chunk_paths for path in chunk]
+
+        for key, path in zip(keys, paths):
+            self.path_cache.put(key, path)
+            for i in pending[key]:
+                results[i] = copy_path(queries[i][0], path)
+        return results
+
+    def with_overlay(self, blocked=None, unblocked=None):
+        """Gets a hypothetical version of the board for pathing, without copying or changing this game state
+
+        Args:
+            * blocked: A list of locations to treat as holding a firewall
+            * unblocked: A list of locations to treat as empty
+
+        Returns:
+            A PathOverlay with find_path_to_edge and path_length methods that see the changed board
+
+        """
+        return PathOverlay(self, blocked, unblocked)
+
+    def path_field(self, target_edge):
+        """Gets the pathing field towards an edge, which gives the path from any start location
+
+        The field is built once per edge and reused, so getting the paths from every spawn location
+        costs one search instead of one per location. Firewalls added or removed through attempt_spawn or
+        game_map.add_unit / remove_unit are applied to existing fields incrementally.
+
+        Args:
+            * target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            A PathField, use field.get_path(start_location) to get the same path as find_path_to_edge
+
+        """
+        fingerprint = self.game_map.fingerprint
+        cached = self._path_fields.get(target_edge)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        self._shortest_path_finder.load_blocked(self.game_map)
+        field = PathField(self._shortest_path_finder.blocked, self.game_map.get_edge_locations(target_edge))
+        self._path_fields[target_edge] = [fingerprint, field]
+        return field
+
+    def threat_map(self, stability_weighted=False):
+        """Gets the damage per frame destructors deal at every tile, for both players
+
+        The map is built once and then updated only at the tiles whose firewall was added or removed
+        through attempt_spawn or game_map.add_unit / remove_unit since the last call.
+
+        Args:
+            * stability_weighted: Scale each destructor's damage by the fraction of its stability it has left
+
+        Returns:
+            A ThreatMap, use threat_map.damage[player_index][x + y * ARENA_SIZE] for the damage a unit of that player takes at x, y
+
+        """
+        threat_map = self._threat_maps.get(stability_weighted)
+        if threat_map is None:
+            threat_map = ThreatMap(self.config, stability_weighted)
+            threat_map.rebuild(self.game_map)
+            self.game_map.add_blocked_listener(threat_map.mark_changed)
+            self._threat_maps[stability_weighted] = threat_map
+        else:
+            threat_map.update(self.game_map)
+        return threat_map
+
+    def shield_map(self):
+        """Gets the encryptors that shield a unit on every tile, and the shield they give, for both players
+
+        The map is built once and then updated only at the tiles whose firewall was added or removed
+        through attempt_spawn or game_map.add_unit / remove_unit since the last call.
+
+        Returns:
+            A ShieldMap, use shield_map.shield[player_index][x + y * ARENA_SIZE] for the shield a unit of that player gets at x, y
+            and shield_map.path_shield for the shield left on each frame along a path
+
+        """
+        if self._shield_map is None:
+            self._shield_map = ShieldMap(self.config)
+            self._shield_map.rebuild(self.game_map)
+            self.game_map.add_blocked_listener(self._shield_map.mark_changed)
+        else:
+            self._shield_map.update(self.game_map)
+        return self._shield_map
+
+    def path_damage(self, unit_type, count=1, locations=None):
+        """Estimates the survivors, breaches and frames to the edge of your information units from every spawn location at once
+
+        Args:
+            * unit_type: The type of information unit to spawn
+            * count: The number of units spawned together on each location
+            * locations: The spawn locations to evaluate, every open location of your spawn edges if not given
+
+        Returns:
+            A PathDamage for each location, see path_damage.integrate_path_damage
+
+        """
+        return integrate_path_damage(self, unit_type, count, locations)
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked
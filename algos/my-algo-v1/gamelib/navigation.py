@@ -1,8 +1,9 @@
 import heapq
 import math
 import sys
-import queue
+from collections import deque
 from .util import debug_write
+from .arena import HALF_ARENA
 
 class Node:
     """A pathfinding node
@@ -20,6 +21,26 @@ class Node:
         self.blocked = False
         self.pathlength = -1
 
+
+class PathContext:
+    """The state of a single pathfinding query
+
+    ShortestPathFinder keeps everything a query changes in one of these instead of on itself,
+    so one finder can serve several queries at the same time, from several threads.
+
+    Attributes:
+        * game_state (:obj: GameState): The game state being pathed on
+        * game_map (list): A grid of Nodes, indexed [x][y]
+
+    """
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self.game_map = [[Node() for x in range(game_state.ARENA_SIZE)] for y in range(game_state.ARENA_SIZE)]
+        #Fill in walls
+        for location in game_state.game_map:
+            if game_state.contains_stationary_unit(location):
+                self.game_map[location[0]][location[1]].blocked = True
+
 """
 This class helps with pathfinding. We guarentee the results will
 be accurate, but top players may want to write their own pathfinding
@@ -32,8 +53,7 @@ class ShortestPathFinder:
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
 
-        * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
+    The finder holds no per-query state, see PathContext, so it is safe to share between threads.
 
     """
     def __init__(self):
@@ -57,32 +77,27 @@ class ShortestPathFinder:
             return
 
         #Initialize map 
-        self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
-        #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        context = PathContext(game_state)
         #Do pathfinding
-        ideal_endpoints = self._idealness_search(start_point, end_points)
-        self._validate(ideal_endpoints, end_points)
-        return self._get_path(start_point, end_points)
+        ideal_endpoints = self._idealness_search(context, start_point, end_points)
+        self._validate(context, ideal_endpoints, end_points)
+        return self._get_path(context, start_point, end_points)
 
-    def _idealness_search(self, start, end_points):
+    def _idealness_search(self, context, start, end_points):
         """
         Finds the most ideal tile in our 'pocket' of pathable space. 
         The edge if it is available, or the best self destruct location otherwise
         """
-        current = queue.Queue()
-        current.put(start)
+        current = deque()
+        current.append(start)
         best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
+        context.game_map[start[0]][start[1]].visited_idealness = True
         most_ideal = start
 
-        while not current.empty():
-            search_location = current.get()
+        while current:
+            search_location = current.popleft()
             for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+                if not context.game_state.game_map.in_arena_bounds(neighbor) or context.game_map[neighbor[0]][neighbor[1]].blocked:
                     continue
 
                 x, y = neighbor
@@ -92,9 +107,9 @@ class ShortestPathFinder:
                     best_idealness = current_idealness
                     most_ideal = neighbor
 
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+                if not context.game_map[x][y].visited_idealness and not context.game_map[x][y].blocked:
+                    context.game_map[x][y].visited_idealness = True
+                    current.append(neighbor)
 
         return most_ideal
 
@@ -117,9 +132,9 @@ class ShortestPathFinder:
         point = end_points[0]
         x, y = point
         direction = [1, 1]
-        if x < self.game_state.HALF_ARENA:
+        if x < HALF_ARENA:
            direction[0] = -1
-        if y < self.game_state.HALF_ARENA:
+        if y < HALF_ARENA:
             direction[1] = -1
         return direction
 
@@ -147,43 +162,43 @@ class ShortestPathFinder:
 
         return idealness
 
-    def _validate(self, ideal_tile, end_points):
+    def _validate(self, context, ideal_tile, end_points):
         """Breadth first search of the grid, setting the pathlengths of each node
 
         """
         #VALDIATION
         #Add our most ideal tiles to current
-        current = queue.Queue()
+        current = deque()
         if ideal_tile in end_points:
             for location in end_points:
-               current.put(location)
+               current.append(location)
                #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
+               context.game_map[location[0]][location[1]].pathlength = 0
+               context.game_map[location[0]][location[1]].visited_validate = True
         else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
+            current.append(ideal_tile)
+            context.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
+            context.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
 
         #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
+        while current:
+            current_location = current.popleft()
+            current_node = context.game_map[current_location[0]][current_location[1]]
             for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+                if not context.game_state.game_map.in_arena_bounds(neighbor) or context.game_map[neighbor[0]][neighbor[1]].blocked:
                     continue
 
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
+                neighbor_node = context.game_map[neighbor[0]][neighbor[1]]
                 if not neighbor_node.visited_validate and not current_node.blocked:
                     neighbor_node.pathlength = current_node.pathlength + 1
                     neighbor_node.visited_validate = True
-                    current.put(neighbor)
+                    current.append(neighbor)
 
         #debug_write("Print after validate")
         #self.print_map()
         return
 
-    def _get_path(self, start_point, end_points):
+    def _get_path(self, context, start_point, end_points):
         """Once all nodes are validated, and a target is found, the unit can path to its target
 
         """
@@ -192,9 +207,9 @@ class ShortestPathFinder:
         current = start_point
         move_direction = 0
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
-            next_move = self._choose_next_move(current, move_direction, end_points)
+        while not context.game_map[current[0]][current[1]].pathlength == 0:
+            #debug_write("current tile {} has cost {}".format(current, context.game_map[current[0]][current[1]].pathlength))
+            next_move = self._choose_next_move(context, current, move_direction, end_points)
             #debug_write(next_move)
 
             if current[0] == next_move[0]:
@@ -207,22 +222,22 @@ class ShortestPathFinder:
         #debug_write(path)
         return path
   
-    def _choose_next_move(self, current_point, previous_move_direction, end_points):
+    def _choose_next_move(self, context, current_point, previous_move_direction, end_points):
         """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
         """
         neighbors = self._get_neighbors(current_point)
         #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
 
         ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
+        best_pathlength = context.game_map[current_point[0]][current_point[1]].pathlength
         for neighbor in neighbors:
             #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+            if not context.game_state.game_map.in_arena_bounds(neighbor) or context.game_map[neighbor[0]][neighbor[1]].blocked:
                 continue
 
             new_best = False
             x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
+            current_pathlength = context.game_map[x][y].pathlength
 
             #Filter by pathlength
             if current_pathlength > best_pathlength:
@@ -278,13 +293,13 @@ class ShortestPathFinder:
             return False
         return True
 
-    def print_map(self):
+    def print_map(self, context):
         """Prints an ASCII version of the current game map for debug purposes
 
         """
         for y in range(28):
             for x in range(28):
-                node = self.game_map[x][28 - y - 1]
+                node = context.game_map[x][28 - y - 1]
                 if not node.blocked and not node.pathlength == -1:
                     self._print_justified(node.pathlength)
                 else:
@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+
+
+class PathCache:
+    """A bounded least recently used cache of paths
+
+    Paths are keyed on the fingerprint of the blocked tiles of the map, the start location and the
+    target edge. Since spawning or removing a firewall changes the fingerprint, entries never need to be
+    invalidated by hand; paths for the old board simply stop being looked up and age out. Because the
+    key does not depend on the turn, paths computed on earlier turns are reused for as long as the board
+    they were computed on comes back. The cache can be shared between threads.
+
+    Attributes:
+        * maxsize (int): The maximum number of paths kept
+        * hits (int): The number of lookups answered from the cache since the last reset_stats
+        * misses (int): The number of lookups that were not in the cache since the last reset_stats
+
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # Paths are keyed on the board they were found on, so copies of a game state can keep sharing the cache
+        return self
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_PathCache__lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key):
+        """Looks up a path, counting the lookup as a hit or a miss
+
+        Args:
+            * key: A (fingerprint, x, y, target_edge) tuple
+
+        Returns:
+            The cached path, or None if it is not in the cache
+
+        """
+        with self.__lock:
+            path = self.__entries.get(key)
+            if path is None:
+                self.misses += 1
+                return
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return path
+
+    def put(self, key, path):
+        """Stores a path, evicting the least recently used path if the cache is full
+
+        Args:
+            * key: A (fingerprint, x, y, target_edge) tuple
+            * path: The path to store
+
+        """
+        with self.__lock:
+            self.__entries[key] = path
+            self.__entries.move_to_end(key)
+            if len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+
+    def clear(self):
+        """Removes all paths from the cache
+        """
+        with self.__lock:
+            self.__entries.clear()
+
+    def reset_stats(self):
+        """Resets the hit and miss counters, for example at the start of each turn
+        """
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Gets the counters of the cache
+
+        Returns:
+            A dict with the hits, misses, hit rate and current size of the cache
+        """
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0, 'size': len(self.__entries)}
+
+
+def copy_path(start_location, path):
+    """Gets the path to hand to a caller from a cached path, starting from the caller's own start location
+
+    The steps are copied, so changing the returned path does not change the cached one.
+    """
+    return [start_location] + [[x, y] for x, y in path[1:]]
+
+
+# Shared by every GameState so that paths carry over between turns
+default_path_cache = PathCache()
@@ -0,0 +1,125 @@
+from collections import namedtuple
+
+from .action_phase_simulator import target_edge_for
+from .arena import ARENA_SIZE, EDGE_INDICES
+
+# What a group of information units spawned together can expect on its way to the edge
+#   location:     The spawn location
+#   path:         The path the group takes, as find_path_to_edge gives it. None if the location is blocked
+#   survivors:    The number of units left when the group reaches the end of its path
+#   survival:     survivors as a fraction of the units spawned
+#   breaches:     The number of units that score, survivors if the path ends on the target edge and 0 otherwise
+#   frames:       The frame the group scores or self destructs on, None if every unit dies first
+#   damage_taken: The damage enemy destructors deal to the group
+#   shielding:    The shield each unit gets from friendly encryptors
+PathDamage = namedtuple("PathDamage", ["location", "path", "survivors", "survival", "breaches", "frames", "damage_taken", "shielding"])
+
+
+def _integrate(path, stability, count, speed, shield_amount, shield_decay, damage, coverage, on_edge, max_frames):
+    # Every unit of the group stands on the same tile and has the same shields. Destructors pick their targets
+    # before dealing damage, and all pick the weakest unit of the group, so damage goes into one focused unit at a
+    # time and what is left over when it dies is lost. The other units keep the health of a fresh unit
+    alive = count
+    focused_health = fresh_health = stability
+    focused_shield = fresh_shield = 0.0
+    shielded_by = set()
+    shielding = damage_taken = 0.0
+    step = 0
+    progress = 0.0
+    last = len(path) - 1
+    for frame in range(1, max_frames + 1):
+        x, y = path[step]
+        index = x + y * ARENA_SIZE
+        # Shields, then decay, like ActionPhaseSimulator.simulate
+        for encryptor in coverage[index]:
+            if encryptor not in shielded_by:
+                shielded_by.add(encryptor)
+                shielding += shield_amount
+                focused_health += shield_amount
+                focused_shield += shield_amount
+                fresh_health += shield_amount
+                fresh_shield += shield_amount
+        if focused_shield > 0:
+            decay = min(focused_shield, shield_decay)
+            focused_shield -= decay
+            focused_health -= decay
+        if fresh_shield > 0:
+            decay = min(fresh_shield, shield_decay)
+            fresh_shield -= decay
+            fresh_health -= decay
+
+        progress += speed
+        if progress >= 1 - 1e-9:
+            progress -= 1
+            if step == last:
+                return alive, alive if on_edge else 0, frame, damage_taken, shielding
+            step += 1
+            x, y = path[step]
+            index = x + y * ARENA_SIZE
+
+        hit = damage[index]
+        if hit > 0:
+            damage_taken += hit
+            focused_health -= hit
+            focused_shield = max(0.0, focused_shield - hit)
+            if focused_health <= 0:
+                alive -= 1
+                if alive == 0:
+                    return 0, 0, None, damage_taken, shielding
+                focused_health, focused_shield = fresh_health, fresh_shield
+    return alive, 0, None, damage_taken, shielding
+
+
+def integrate_path_damage(game_state, unit_type, count=1, locations=None, player_index=0, max_frames=1000):
+    """Estimates what happens to a group of information units spawned at each of many locations
+
+    Each group follows the path find_path_to_edge gives and is attacked every frame by the enemy
+    destructors in range, using game_state.threat_map, while friendly encryptors shield it as it
+    passes them, using game_state.shield_map, and the shields decay by shieldDecayPerFrame. The board
+    is taken as it is: destructors do not die, and other information units are left out. Paths come
+    from game_state.path_field, one search per edge for every location, and the per tile damage and
+    shields are looked up from tables kept by the game state, so every spawn location of a turn can
+    be evaluated in a few milliseconds.
+
+    Args:
+        * game_state: The GameState of the turn, with the firewalls placed with attempt_spawn so far
+        * unit_type: The type of information unit to spawn
+        * count: The number of units spawned together on each location
+        * locations: The spawn locations to evaluate, every open location of the player's spawn edges if not given
+        * player_index: The player spawning the units, 0 for you 1 for the enemy
+        * max_frames: Stop following a group after this many frames
+
+    Returns:
+        A PathDamage for each location, in the order of locations
+
+    """
+    game_map = game_state.game_map
+    if locations is None:
+        edges = (game_map.BOTTOM_LEFT, game_map.BOTTOM_RIGHT) if player_index == 0 else (game_map.TOP_LEFT, game_map.TOP_RIGHT)
+        locations = [location for edge in edges for location in game_map.get_edge_locations(edge)
+                     if not game_state.contains_stationary_unit(location)]
+
+    unit_information = game_state.config["unitInformation"]
+    type_config = next(type_config for type_config in unit_information if type_config.get("shorthand") == unit_type)
+    shield_amount = unit_information[1]["shieldAmount"]
+    shield_decay = game_state.config["mechanics"]["shieldDecayPerFrame"]
+    damage = game_state.threat_map().damage[player_index]
+    coverage = game_state.shield_map().coverage[player_index]
+
+    results = []
+    fields = {}
+    for location in locations:
+        target_edge = target_edge_for(location, player_index)
+        field = fields.get(target_edge)
+        if field is None:
+            field = fields[target_edge] = game_state.path_field(target_edge)
+        path = field.get_path(location)
+        if path is None:
+            results.append(PathDamage(location, None, 0, 0.0, 0, None, 0.0, 0.0))
+            continue
+        x, y = path[-1]
+        survivors, breaches, frames, damage_taken, shielding = _integrate(
+            path, type_config["stability"], count, type_config["speed"], shield_amount, shield_decay, damage, coverage,
+            x + y * ARENA_SIZE in EDGE_INDICES[target_edge], max_frames)
+        results.append(PathDamage(location, path, survivors, survivors / count if count else 0.0, breaches, frames, damage_taken, shielding))
+    return results
@@ -0,0 +1,451 @@
+import heapq
+from array import array
+from collections import deque
+
+from .arena import ARENA_SIZE, HALF_ARENA, TILES, NEIGHBORS, IDEALNESS, location_to_index, index_to_location
+from .bitboard import ARENA_MASK, from_locations, flood_fill, distance_layers, most_ideal
+
+HORIZONTAL = 1
+VERTICAL = 2
+
+
+def direction_from_endpoints(end_points):
+    """Gets the direction of an edge as (x, y), for example (1, 1) for the top right
+    and (-1, 1) for the top left. See ShortestPathFinder._get_direction_from_endpoints
+    """
+    x, y = end_points[0]
+    return (-1 if x < HALF_ARENA else 1, -1 if y < HALF_ARENA else 1)
+
+
+class PathEngine:
+    """Pathfinding on a preallocated blocked bitmap
+
+    Returns exactly the same paths as ShortestPathFinder, but instead of building a grid of
+    Node objects for every query it keeps the firewalls in a flat bitmap indexed by
+    x + y * ARENA_SIZE, only reloaded when the map changes. The same tiles are also kept as
+    a bitboard, so the idealness search is a bitboard flood fill of the start's pocket and
+    the validate search produces one bitboard per pathlength. Both take one step per
+    distance layer instead of one per tile.
+
+    A query only reads the loaded board, and reloading swaps in new objects instead of
+    changing the old ones, so one engine can answer queries from several threads at once.
+
+    Attributes:
+        * blocked (bytearray): 1 for every tile holding a stationary unit
+        * blocked_bits (int): The same tiles as a bitboard
+        * fingerprint (int): The GameMap.fingerprint of the loaded map
+
+    """
+    def __init__(self):
+        self.blocked = bytearray(ARENA_SIZE * ARENA_SIZE)
+        self.blocked_bits = 0
+        self.fingerprint = None
+        self.__loaded = (None, self.blocked, 0)
+
+    def load_blocked(self, game_map):
+        """Loads the firewalls of a GameMap, unless they are already loaded
+
+        Args:
+            * game_map: The GameMap to read firewalls from
+
+        Returns:
+            The loaded tiles as a bitboard
+
+        """
+        loaded = self.__loaded
+        if loaded[0] == game_map.fingerprint:
+            return loaded[2]
+        fingerprint = game_map.fingerprint
+        blocked = bytearray(ARENA_SIZE * ARENA_SIZE)
+        blocked_bits = 0
+        for index, x, y in TILES:
+            for unit in game_map[x, y]:
+                if unit.stationary:
+                    blocked[index] = 1
+                    blocked_bits |= 1 << index
+                    break
+        self.__loaded = (fingerprint, blocked, blocked_bits)
+        self.blocked, self.blocked_bits, self.fingerprint = blocked, blocked_bits, fingerprint
+        return blocked_bits
+
+    def navigate_multiple_endpoints(self, start_point, end_points, game_state, blocked=(), unblocked=()):
+        """Finds the path a unit would take to reach a set of endpoints
+
+        Drop-in replacement for ShortestPathFinder.navigate_multiple_endpoints, which can also path on
+        a hypothetical board without changing the game state.
+
+        Args:
+            * start_point: The starting location of the unit
+            * end_points: The end points of the unit, should be a list of edge locations
+            * game_state: The current game state
+            * blocked: Extra locations to treat as holding a firewall
+            * unblocked: Locations to treat as empty even if they hold a firewall
+
+        Returns:
+            The path a unit at start_point would take when trying to reach end_points given the current game state.
+            Note that this path can change if a tower is destroyed during pathing, or if you or your enemy places firewalls.
+
+        """
+        blocked_bits = self.load_blocked(game_state.game_map)
+        if not blocked and not unblocked:
+            if game_state.contains_stationary_unit(start_point):
+                return
+            return self.find_path(start_point, end_points, blocked_bits)
+        blocked_bits = (blocked_bits & ~from_locations(unblocked)) | from_locations(blocked)
+        return self.find_path(start_point, end_points, blocked_bits)
+
+    def find_path(self, start_point, end_points, blocked_bits=None):
+        """Finds the path from start_point to end_points
+
+        Args:
+            * start_point: The starting location of the unit
+            * end_points: The end points of the unit, should be a list of edge locations
+            * blocked_bits: The blocked tiles as a bitboard, the loaded board if not given
+
+        Returns:
+            The path a unit at start_point would take, or None if start_point is blocked
+
+        """
+        if blocked_bits is None:
+            blocked_bits = self.__loaded[2]
+        start = location_to_index(start_point)
+        if (blocked_bits >> start) & 1:
+            return
+        open_bits = ARENA_MASK & ~blocked_bits
+        targets = from_locations(end_points)
+        direction = direction_from_endpoints(end_points)
+
+        # Idealness search: the edge if the pocket touches it, otherwise the pocket's most ideal tile
+        pocket = flood_fill(1 << start, open_bits)
+        if pocket & targets:
+            layers = distance_layers(targets, open_bits)
+        else:
+            layers = distance_layers(1 << most_ideal(pocket, direction), open_bits)
+        return _walk_layers(start_point, layers, blocked_bits, direction)
+
+
+def find_paths(blocked_bits, jobs):
+    """Finds many paths on one board, for running in a worker thread or process
+
+    Args:
+        * blocked_bits: The blocked tiles as a bitboard
+        * jobs: A list of (start_point, end_points) pairs
+
+    Returns:
+        The path of each job, in order. See PathEngine.find_path
+
+    """
+    engine = PathEngine()
+    return [engine.find_path(start_point, end_points, blocked_bits) for start_point, end_points in jobs]
+
+
+class PathField:
+    """The pathlengths towards one edge for every tile of a board
+
+    The validate search of ShortestPathFinder is run once from the whole edge, which gives
+    the pathlengths for every tile that can reach it. Tiles in pockets that cannot reach the
+    edge get pathlengths towards the most ideal tile of their pocket, computed the first
+    time a path is requested from inside that pocket. Pockets are disjoint, so all of them
+    share one pocket array and any path can be read off the arrays by following
+    ShortestPathFinder._choose_next_move.
+
+    When a single tile becomes blocked or unblocked, set_blocked repairs the edge pathlengths
+    locally instead of searching the whole board again. Pocket pathlengths are cheap and
+    depend on the shape of the whole pocket, so they are dropped and recomputed on demand.
+
+    Attributes:
+        * blocked (bytearray): The blocked bitmap this field is built for
+        * end_points (list): The edge locations this field leads to
+        * direction (tuple): The direction of the edge, see direction_from_endpoints
+        * pathlength (array): The pathlength of each tile to the edge, -1 if it cannot reach the edge
+
+    """
+    def __init__(self, blocked, end_points):
+        """Builds the field for the edge
+
+        Args:
+            * blocked: A blocked bitmap indexed like PathEngine.blocked
+            * end_points: The edge locations to build the field for
+
+        """
+        self.blocked = bytearray(blocked)
+        self.end_points = end_points
+        self.direction = direction_from_endpoints(end_points)
+        self.pathlength = array('l', [-1] * (ARENA_SIZE * ARENA_SIZE))
+        self._pocket_pathlength = None
+        self._targets = set(location_to_index(location) for location in end_points)
+        self._fill(self._targets, self.pathlength)
+
+    def _fill(self, seeds, pathlength):
+        blocked = self.blocked
+        current = deque()
+        for seed in seeds:
+            pathlength[seed] = 0
+            if not blocked[seed]:
+                current.append(seed)
+
+        while current:
+            current_location = current.popleft()
+            next_length = pathlength[current_location] + 1
+            for neighbor in NEIGHBORS[current_location]:
+                if blocked[neighbor] or not pathlength[neighbor] == -1:
+                    continue
+                pathlength[neighbor] = next_length
+                current.append(neighbor)
+
+    def _fill_pocket(self, start):
+        """Runs the idealness search over the pocket containing start, then fills the pocket
+        with the pathlengths towards its most ideal tile
+        """
+        blocked = self.blocked
+        idealness = IDEALNESS[self.direction]
+        most_ideal = start
+        visited = {start}
+        current = deque((start,))
+        while current:
+            search_location = current.popleft()
+            for neighbor in NEIGHBORS[search_location]:
+                if blocked[neighbor] or neighbor in visited:
+                    continue
+                if idealness[neighbor] > idealness[most_ideal]:
+                    most_ideal = neighbor
+                visited.add(neighbor)
+                current.append(neighbor)
+        self._fill((most_ideal,), self._pocket_pathlength)
+
+    def get_path(self, start_location):
+        """Gets the path a unit at start_location would take towards the edge of this field
+
+        Args:
+            * start_location: The location of a hypothetical unit
+
+        Returns:
+            The same path as GameState.find_path_to_edge, or None if start_location is blocked
+
+        """
+        start = location_to_index(start_location)
+        if self.blocked[start]:
+            return
+        pathlength = self.pathlength
+        if pathlength[start] == -1:
+            if self._pocket_pathlength is None:
+                self._pocket_pathlength = array('l', [-1] * (ARENA_SIZE * ARENA_SIZE))
+            pathlength = self._pocket_pathlength
+            if pathlength[start] == -1:
+                self._fill_pocket(start)
+        return _walk_path(start_location, pathlength.__getitem__, self.blocked, self.direction)
+
+    def get_paths(self, start_locations):
+        """Gets the paths from many start locations at once
+
+        Args:
+            * start_locations: A list of locations
+
+        Returns:
+            A list with the path for each start location, see get_path
+
+        """
+        return [self.get_path(location) for location in start_locations]
+
+    def reaches_edge(self, start_location):
+        """Checks if a unit at start_location can reach the edge of this field
+
+        Args:
+            * start_location: The location of a hypothetical unit
+
+        Returns:
+            True if start_location is open and connected to the edge
+        """
+        start = location_to_index(start_location)
+        return not self.blocked[start] and not self.pathlength[start] == -1
+
+    def set_blocked(self, location, blocked):
+        """Updates the field after a single tile became blocked or unblocked
+
+        Args:
+            * location: The location that changed
+            * blocked: True if the location now holds a firewall
+
+        """
+        index = location_to_index(location)
+        if bool(self.blocked[index]) == bool(blocked):
+            return
+        self.blocked[index] = 1 if blocked else 0
+        self._pocket_pathlength = None
+        if blocked:
+            self._repair_blocked(index)
+        else:
+            self._repair_unblocked(index)
+
+    def _repair_blocked(self, index):
+        """Raises the pathlengths of the tiles whose shortest paths all went through index
+
+        The tiles are found layer by layer below index: a tile is affected when every neighbor
+        one step closer to the edge is blocked or affected itself. The affected tiles are then
+        searched again starting from their unaffected neighbors.
+        """
+        blocked = self.blocked
+        pathlength = self.pathlength
+        old_length = pathlength[index]
+        if old_length == -1:
+            return
+        if index not in self._targets:
+            pathlength[index] = -1
+
+        affected = set()
+        current = deque(neighbor for neighbor in NEIGHBORS[index]
+                        if not blocked[neighbor] and pathlength[neighbor] == old_length + 1)
+        while current:
+            tile = current.popleft()
+            if tile in affected:
+                continue
+            length = pathlength[tile]
+            supported = False
+            for neighbor in NEIGHBORS[tile]:
+                if not blocked[neighbor] and pathlength[neighbor] == length - 1 and neighbor not in affected:
+                    supported = True
+                    break
+            if supported:
+                continue
+            affected.add(tile)
+            for neighbor in NEIGHBORS[tile]:
+                if not blocked[neighbor] and pathlength[neighbor] == length + 1:
+                    current.append(neighbor)
+
+        for tile in affected:
+            pathlength[tile] = -1
+        heap = []
+        for tile in affected:
+            best = -1
+            for neighbor in NEIGHBORS[tile]:
+                if blocked[neighbor] or neighbor in affected:
+                    continue
+                length = pathlength[neighbor]
+                if not length == -1 and (best == -1 or length < best):
+                    best = length
+            if not best == -1:
+                heap.append((best + 1, tile))
+        heapq.heapify(heap)
+        while heap:
+            length, tile = heapq.heappop(heap)
+            if not pathlength[tile] == -1:
+                continue
+            pathlength[tile] = length
+            for neighbor in NEIGHBORS[tile]:
+                if neighbor in affected and pathlength[neighbor] == -1 and not blocked[neighbor]:
+                    heapq.heappush(heap, (length + 1, neighbor))
+
+    def _repair_unblocked(self, index):
+        """Lowers the pathlengths around a tile that was opened, spreading outwards while they improve
+        """
+        blocked = self.blocked
+        pathlength = self.pathlength
+        if index not in self._targets:
+            best = -1
+            for neighbor in NEIGHBORS[index]:
+                length = pathlength[neighbor]
+                if not blocked[neighbor] and not length == -1 and (best == -1 or length < best):
+                    best = length
+            if best == -1:
+                return
+            pathlength[index] = best + 1
+
+        current = deque((index,))
+        while current:
+            tile = current.popleft()
+            next_length = pathlength[tile] + 1
+            for neighbor in NEIGHBORS[tile]:
+                if blocked[neighbor]:
+                    continue
+                length = pathlength[neighbor]
+                if length == -1 or length > next_length:
+                    pathlength[neighbor] = next_length
+                    current.append(neighbor)
+
+
+def _better_direction(prev_tile, new_tile, prev_best, previous_move_direction, direction):
+    """Index based port of ShortestPathFinder._better_direction
+    """
+    prev_x, prev_y = prev_tile % ARENA_SIZE, prev_tile // ARENA_SIZE
+    new_x, new_y = new_tile % ARENA_SIZE, new_tile // ARENA_SIZE
+    best_x, best_y = prev_best % ARENA_SIZE, prev_best // ARENA_SIZE
+
+    if previous_move_direction == HORIZONTAL and not new_x == best_x:
+        return not prev_y == new_y
+    if previous_move_direction == VERTICAL and not new_y == best_y:
+        return not prev_x == new_x
+    if previous_move_direction == 0:
+        return not prev_y == new_y
+
+    if new_y == best_y:
+        return (direction[0] == 1 and new_x > best_x) or (direction[0] == -1 and new_x < best_x)
+    if new_x == best_x:
+        return (direction[1] == 1 and new_y > best_y) or (direction[1] == -1 and new_y < best_y)
+    return True
+
+
+def _walk_path(start_point, get_pathlength, blocked, direction):
+    """Follows a pathlength field from start_point down to a tile with pathlength 0,
+    choosing each step the way ShortestPathFinder._choose_next_move does
+    """
+    path = [start_point]
+    current = location_to_index(start_point)
+    move_direction = 0
+
+    while not get_pathlength(current) == 0:
+        next_move = _choose_next_move(current, move_direction, get_pathlength, blocked, direction)
+        if current % ARENA_SIZE == next_move % ARENA_SIZE:
+            move_direction = VERTICAL
+        else:
+            move_direction = HORIZONTAL
+        path.append(index_to_location(next_move))
+        current = next_move
+    return path
+
+
+def _walk_layers(start_point, layers, blocked_bits, direction):
+    """Follows the layers of a validate search from start_point down to layer 0
+
+    The neighbor with the lowest pathlength is always in the layer below, so the step
+    ShortestPathFinder._choose_next_move takes is the first such neighbor, replaced by any
+    later one _better_direction prefers.
+    """
+    path = [start_point]
+    current = location_to_index(start_point)
+    length = 0
+    while not (layers[length] >> current) & 1:
+        length += 1
+
+    move_direction = 0
+    while length > 0:
+        length -= 1
+        lower = layers[length] & ~blocked_bits
+        next_move = -1
+        for neighbor in NEIGHBORS[current]:
+            if (lower >> neighbor) & 1 and (next_move == -1 or _better_direction(current, neighbor, next_move, move_direction, direction)):
+                next_move = neighbor
+        if current % ARENA_SIZE == next_move % ARENA_SIZE:
+            move_direction = VERTICAL
+        else:
+            move_direction = HORIZONTAL
+        path.append(index_to_location(next_move))
+        current = next_move
+    return path
+
+
+def _choose_next_move(current_point, previous_move_direction, get_pathlength, blocked, direction):
+    """Given the current tile, return the best 'next step' for a unit to take
+    """
+    ideal_neighbor = current_point
+    best_pathlength = get_pathlength(current_point)
+    for neighbor in NEIGHBORS[current_point]:
+        if blocked[neighbor]:
+            continue
+        current_pathlength = get_pathlength(neighbor)
+        if current_pathlength > best_pathlength:
+            continue
+        if current_pathlength == best_pathlength and not _better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, direction):
+            continue
+        ideal_neighbor = neighbor
+        best_pathlength = current_pathlength
+    return ideal_neighbor
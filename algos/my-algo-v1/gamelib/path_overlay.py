@@ -0,0 +1,136 @@
+import warnings
+
+from .arena import _tile_of
+from .game_map import fingerprint_key
+from .path_cache import copy_path
+
+
+class PathOverlay:
+    """A hypothetical board made of the firewalls of a GameState plus a small delta
+
+    The overlay answers pathing queries as if the extra blocked locations held firewalls and the
+    unblocked locations were empty, without modifying or copying the game state. Creating one is
+    cheap, so hundreds of candidate placements can be evaluated in a turn. Paths go through the
+    game state's path cache under the fingerprint the board would have with the delta applied.
+
+    Attributes:
+        * game_state (:obj: GameState): The game state the overlay is based on
+        * blocked (list): Locations without a firewall that the overlay blocks
+        * unblocked (list): Locations with a firewall that the overlay clears
+        * fingerprint (int): The GameMap.fingerprint the board would have with the delta applied
+
+    """
+    def __init__(self, game_state, blocked=None, unblocked=None):
+        """Builds the overlay, keeping only the locations whose blocked state actually changes
+
+        Args:
+            * game_state: The game state to base the overlay on
+            * blocked: A list of locations to treat as holding a firewall
+            * unblocked: A list of locations to treat as empty
+
+        """
+        self.game_state = game_state
+        self.blocked = []
+        self.unblocked = []
+        self.fingerprint = game_state.game_map.fingerprint
+        self.__blocked_set = set()
+        self.__unblocked_set = set()
+
+        for location in unblocked or []:
+            tile = _tile_of(location)
+            if tile is None:
+                warnings.warn("Could not unblock {} on an overlay. Location is not a tile of the arena.".format(location))
+                continue
+            x, y = tile
+            if (x, y) not in self.__unblocked_set and game_state.contains_stationary_unit([x, y]):
+                self.__unblocked_set.add((x, y))
+                self.unblocked.append([x, y])
+                self.fingerprint ^= fingerprint_key([x, y])
+        for location in blocked or []:
+            tile = _tile_of(location)
+            if tile is None:
+                warnings.warn("Could not block {} on an overlay. Location is not a tile of the arena.".format(location))
+                continue
+            x, y = tile
+            if (x, y) in self.__unblocked_set:
+                self.__unblocked_set.remove((x, y))
+                self.unblocked.remove([x, y])
+                self.fingerprint ^= fingerprint_key([x, y])
+            elif (x, y) not in self.__blocked_set and not game_state.contains_stationary_unit([x, y]):
+                self.__blocked_set.add((x, y))
+                self.blocked.append([x, y])
+                self.fingerprint ^= fingerprint_key([x, y])
+
+    def contains_stationary_unit(self, location):
+        """Check if a location is blocked on the hypothetical board
+
+        Args:
+            * location: The location to check
+
+        Returns:
+            True if the location is blocked with the delta applied, False for locations that are not tiles of the arena
+        """
+        tile = _tile_of(location)
+        if tile is None:
+            return False
+        if tile in self.__blocked_set:
+            return True
+        if tile in self.__unblocked_set:
+            return False
+        return bool(self.game_state.contains_stationary_unit(tile))
+
+    def find_path_to_edge(self, start_location, target_edge):
+        """Gets the path a unit at a given location would take on the hypothetical board
+
+        Args:
+            * start_location: The location of a hypothetical unit
+            * target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            A list of locations corresponding to the path the unit would take, see GameState.find_path_to_edge
+
+        """
+        tile = _tile_of(start_location)
+        if tile is None:
+            warnings.warn("Attempted to perform pathing from {}, which is not a tile of the arena".format(start_location))
+            return
+        if self.contains_stationary_unit(tile):
+            warnings.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+            return
+        game_state = self.game_state
+        key = (self.fingerprint, tile[0], tile[1], target_edge)
+        path = game_state.path_cache.get(key)
+        if path is None:
+            end_points = game_state.game_map.get_edge_locations(target_edge)
+            path = game_state._shortest_path_finder.navigate_multiple_endpoints(list(tile), end_points, game_state, self.blocked, self.unblocked)
+            game_state.path_cache.put(key, path)
+        return copy_path(start_location, path)
+
+    def path_length(self, start_location, target_edge):
+        """Gets the number of steps a unit would take on the hypothetical board
+
+        Args:
+            * start_location: The location of a hypothetical unit
+            * target_edge: The edge the unit wants to reach
+
+        Returns:
+            The number of moves along the path, or None if start_location is blocked
+
+        """
+        path = self.find_path_to_edge(start_location, target_edge)
+        if path is None:
+            return
+        return len(path) - 1
+
+    def reaches_edge(self, start_location, target_edge):
+        """Checks if a unit at start_location would reach the target edge on the hypothetical board
+
+        Args:
+            * start_location: The location of a hypothetical unit
+            * target_edge: The edge the unit wants to reach
+
+        Returns:
+            True if the path ends on the target edge
+        """
+        path = self.find_path_to_edge(start_location, target_edge)
+        return path is not None and path[-1] in self.game_state.game_map.get_edge_locations(target_edge)
@@ -0,0 +1,218 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .action_phase_simulator import ActionPhaseSimulator
+from .shared_board import SharedBoard, SharedBoardReader
+from .snapshot import SnapshotView
+from .util import debug_write
+
+# What one rollout of a plan gave. Damage lists are [you, enemy] like SimulationResult
+RolloutResult = namedtuple("RolloutResult", ["plan", "health_damage", "damage_dealt", "breaches", "frames"])
+
+
+def default_score(result):
+    """Scores a rollout: health taken from the enemy first, then damage dealt to enemy units
+    """
+    return (result.health_damage[1] - result.health_damage[0], result.damage_dealt[0])
+
+
+def expand_plan(plan):
+    """Turns a plan of (unit_type, count, location) entries into the (unit_type, x, y) deploys of ActionPhaseSimulator.simulate
+    """
+    deploys = []
+    for unit_type, count, location in plan:
+        deploys.extend([(unit_type, location[0], location[1])] * count)
+    return deploys
+
+
+# The state of a worker process: the config it was started with, the shared board it reads and the simulator of the last board it was sent
+_worker_config = None
+_worker_reader = None
+_worker_board = (None, None)
+
+
+def _init_worker(config):
+    global _worker_config
+    _worker_config = config
+
+
+def _warm_up(_):
+    return os.getpid()
+
+
+def _simulator_for(config, board):
+    global _worker_board, _worker_reader
+    if _worker_board[0] == board:
+        return _worker_board[1]
+    if isinstance(board, tuple):
+        # (name, version) of a SharedBoard
+        name, version = board
+        if _worker_reader is None or not _worker_reader.name == name:
+            if _worker_reader is not None:
+                _worker_reader.close()
+            _worker_reader = SharedBoardReader(name)
+        view = _worker_reader.read(version).snapshot
+    else:
+        view = SnapshotView(board)
+    shorthands = [type_config.get("shorthand") for type_config in config["unitInformation"]]
+    units = [(unit_type, player_index, x, y, stability, unit_id)
+             for unit_type, player_index, x, y, stability, _, unit_id in view.units(shorthands)]
+    simulator = ActionPhaseSimulator(config, units, view.stats[0][0], view.stats[1][0])
+    del view
+    if isinstance(board, tuple):
+        # The board must not have been replaced while it was being read
+        _worker_reader.check(board[1])
+    _worker_board = (board, simulator)
+    return simulator
+
+
+def run_rollouts(board, plans, config=None, max_frames=1000):
+    """Simulates each plan on a board, for running in a worker process
+
+    Args:
+        * board: The board, as packed by GameState.to_snapshot, or the (name, version) of a SharedBoard
+        * plans: A list of plans, see RolloutEngine.evaluate
+        * config (JSON): The config of the game, the one the worker was started with if not given
+        * max_frames: Stop each rollout after this many frames
+
+    Returns:
+        A RolloutResult for each plan
+
+    """
+    simulator = _simulator_for(config if config is not None else _worker_config, board)
+    results = []
+    for plan in plans:
+        result = simulator.simulate(expand_plan(plan), max_frames=max_frames)
+        results.append(RolloutResult(plan, result.health_damage, result.damage_dealt, len(result.breaches), result.frames))
+    return results
+
+
+class RolloutEngine:
+    """Compares candidate attack plans by simulating each of them against the current board
+
+    A plan is a list of (unit_type, count, location) entries, the arguments you would pass to attempt_spawn.
+    Plans are simulated with ActionPhaseSimulator in a pool of worker processes. Call start once in
+    on_game_start so the workers are running, with the config loaded, before the first turn, and close
+    at the end of the game. The board is published once per evaluate in a SharedBoard, or sent with each
+    task as a compact snapshot when shared_board is off, and each worker only reads it once.
+
+    Without start, plans are simulated in this process.
+
+    Attributes:
+        * config (JSON): Contains information about the game
+        * workers (int): The number of worker processes
+        * time_budget (float): The default seconds evaluate may take, a fraction of waitTimeBotSoft
+
+    """
+    def __init__(self, config, workers=None, time_fraction=0.25, max_frames=1000, shared_board=True):
+        """Sets up an engine, without starting the workers
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * workers: The number of worker processes, one per cpu but one if not given
+            * time_fraction: The fraction of the soft time limit of a turn (waitTimeBotSoft) evaluate may take by default
+            * max_frames: Stop each rollout after this many frames
+            * shared_board: Give the board to the workers through shared memory instead of with each task
+
+        """
+        self.config = config
+        self.workers = workers if workers is not None else max(1, (os.cpu_count() or 2) - 1)
+        self.time_budget = config["timingAndReplay"]["waitTimeBotSoft"] / 1000 * time_fraction
+        self.max_frames = max_frames
+        self.shared_board = shared_board
+        self.__executor = None
+        self.__board = None
+
+    def start(self):
+        """Starts the worker processes and waits until each of them is running
+        """
+        if self.__executor is not None:
+            return
+        if self.shared_board:
+            self.__board = SharedBoard()
+        self.__executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.config,))
+        pids = set(self.__executor.map(_warm_up, range(self.workers * 2)))
+        debug_write("Started {} rollout workers".format(len(pids)))
+
+    def close(self):
+        """Stops the worker processes and removes the shared board
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True, cancel_futures=True)
+            self.__executor = None
+        if self.__board is not None:
+            self.__board.close()
+            self.__board = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def evaluate(self, game_state, plans, time_budget=None, chunk_size=None):
+        """Simulates plans against the board of a game state until they are all done or time runs out
+
+        Plans are simulated against the board as it is, including the firewalls and units placed with
+        attempt_spawn so far. Plans are not checked against your resources.
+
+        Args:
+            * game_state: The GameState of the turn
+            * plans: A list of plans, each a list of (unit_type, count, location) entries
+            * time_budget: The seconds to spend at most, self.time_budget if not given
+            * chunk_size: The plans sent to a worker at a time. Smaller chunks make the deadline more accurate
+
+        Returns:
+            A RolloutResult for each plan simulated before the deadline, in the order of plans
+
+        """
+        deadline = time.monotonic() + (self.time_budget if time_budget is None else time_budget)
+        plans = [list(plan) for plan in plans]
+        if self.__executor is not None and self.__board is not None:
+            board = (self.__board.name, self.__board.publish(game_state, distance_fields=False))
+        else:
+            board = game_state.to_snapshot()
+        if chunk_size is None:
+            chunk_size = max(1, len(plans) // (self.workers * 4))
+        chunks = [(start, plans[start:start + chunk_size]) for start in range(0, len(plans), chunk_size)]
+
+        finished = {}
+        if self.__executor is None:
+            for start, chunk in chunks:
+                if time.monotonic() >= deadline:
+                    break
+                finished[start] = run_rollouts(board, chunk, self.config, self.max_frames)
+        else:
+            pending = {self.__executor.submit(run_rollouts, board, chunk, None, self.max_frames): start for start, chunk in chunks}
+            while pending:
+                done, _ = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    finished[pending.pop(future)] = future.result()
+            for future in pending:
+                future.cancel()
+            if pending:
+                debug_write("Rollouts ran out of time, {} of {} plans simulated".format(sum(map(len, finished.values())), len(plans)))
+        return [result for start in sorted(finished) for result in finished[start]]
+
+    def best_plan(self, game_state, plans, score=default_score, time_budget=None):
+        """Gets the best plan found before the deadline
+
+        Args:
+            * game_state: The GameState of the turn
+            * plans: A list of plans, each a list of (unit_type, count, location) entries
+            * score: Called with each RolloutResult, higher is better. See default_score
+            * time_budget: The seconds to spend at most, self.time_budget if not given
+
+        Returns:
+            The RolloutResult of the best plan, None if no plan was simulated in time
+
+        """
+        results = self.evaluate(game_state, plans, time_budget)
+        if not results:
+            return
+        return max(results, key=score)
@@ -0,0 +1,217 @@
+import struct
+from multiprocessing import shared_memory
+
+from .arena import ARENA_SIZE
+from .snapshot import SnapshotView
+
+# The segment starts with a header, then the distance fields, then the snapshot of the board:
+#   header:   magic, layout version, board version, turn number, snapshot length, whether the fields are set
+#   fields:   for each edge, the pathlength of every tile index to that edge as native int16, -1 if it cannot reach it.
+#             The segment never leaves the machine, so native byte order lets readers cast it in place
+#   snapshot: the board as GameState.to_snapshot packs it
+# The board version is odd while a board is being written and even once it is complete.
+BOARD_MAGIC = b"GLSB"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<4sHxxQIIB7x")
+FIELD_BYTES = 2 * ARENA_SIZE * ARENA_SIZE
+FIELDS_START = HEADER.size
+SNAPSHOT_START = FIELDS_START + 4 * FIELD_BYTES
+
+
+class StaleBoardError(Exception):
+    """Raised when a worker asks for a board that has been replaced by a newer one"""
+
+
+def _attach(name):
+    """Maps an existing segment. Workers share the resource tracker of the process that started them, which
+    already tracks the segment, so where Python allows it they do not register it again
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedBoard:
+    """Publishes the board of each turn in shared memory, so worker processes can read it without it being sent to them
+
+    The process that creates the board owns the segment and is the only one that writes to it. Each publish
+    gets a new board version. Workers are given the name and version of the board with each task and read it
+    through a SharedBoardReader, which refuses versions that have been replaced.
+
+    Attributes:
+        * name (string): The name of the shared memory segment, for SharedBoardReader
+        * version (int): The version of the last board published, 0 before the first one
+
+    """
+    def __init__(self, capacity=1 << 16):
+        """Creates the segment
+
+        Args:
+            * capacity: The largest snapshot the segment can hold without being replaced by a larger one
+
+        """
+        self.__capacity = capacity
+        self.__segment = shared_memory.SharedMemory(create=True, size=SNAPSHOT_START + capacity)
+        self.__sequence = 0
+        self.version = 0
+        self.__write_header(0, 0, False)
+
+    @property
+    def name(self):
+        return self.__segment.name
+
+    def __write_header(self, turn_number, length, fields):
+        HEADER.pack_into(self.__segment.buf, 0, BOARD_MAGIC, LAYOUT_VERSION, self.__sequence, turn_number, length, fields)
+
+    def publish(self, game_state, distance_fields=True):
+        """Writes the board of a game state into the segment, as a new version
+
+        Args:
+            * game_state: The GameState of the turn. Units placed with attempt_spawn are part of the board
+            * distance_fields: Also write the pathlength of every tile to each edge, from game_state.path_field
+
+        Returns:
+            The version of the board, to send to the workers with their tasks
+
+        """
+        snapshot = game_state.to_snapshot()
+        if len(snapshot) > self.__capacity:
+            # Retire the segment, so readers still mapping it see the board has been replaced.
+            # Workers see the new name with their next task and attach to it
+            self.__sequence += 1
+            self.__write_header(game_state.turn_number, 0, False)
+            self.close()
+            self.__capacity = max(len(snapshot), 2 * self.__capacity)
+            self.__segment = shared_memory.SharedMemory(create=True, size=SNAPSHOT_START + self.__capacity)
+
+        self.__sequence += 1 if self.__sequence % 2 == 0 else 0
+        self.__write_header(game_state.turn_number, 0, False)
+        buf = self.__segment.buf
+        if distance_fields:
+            for edge in range(4):
+                pathlength = game_state.path_field(edge).pathlength
+                struct.pack_into("{}h".format(len(pathlength)), buf, FIELDS_START + edge * FIELD_BYTES, *pathlength)
+        buf[SNAPSHOT_START:SNAPSHOT_START + len(snapshot)] = snapshot
+        self.__sequence += 1
+        self.__write_header(game_state.turn_number, len(snapshot), distance_fields)
+        self.version = self.__sequence // 2
+        return self.version
+
+    def close(self):
+        """Removes the segment. Called at the end of the game by whoever created the board
+        """
+        if self.__segment is not None:
+            self.__segment.close()
+            try:
+                self.__segment.unlink()
+            except FileNotFoundError:
+                pass
+            self.__segment = None
+
+    def __del__(self):
+        if hasattr(self, "_SharedBoard__segment"):
+            self.close()
+
+
+class SharedBoardReader:
+    """Reads the boards a SharedBoard publishes, from a worker process
+
+    Attributes:
+        * name (string): The name of the segment being read
+
+    """
+    def __init__(self, name):
+        """Maps the segment of a SharedBoard
+
+        Args:
+            * name: SharedBoard.name
+
+        """
+        self.name = name
+        self.__segment = _attach(name)
+        self.__buf = self.__segment.buf.toreadonly()
+
+    def __header(self):
+        magic, layout, sequence, turn_number, length, fields = HEADER.unpack_from(self.__buf, 0)
+        if not (magic == BOARD_MAGIC and layout == LAYOUT_VERSION):
+            raise ValueError("{} is not a version {} shared board".format(self.name, LAYOUT_VERSION))
+        return sequence, turn_number, length, fields
+
+    def check(self, version):
+        """Makes sure the board has not been replaced since it was read. Call it after reading a board
+
+        Args:
+            * version: The version the task was given
+
+        Raises:
+            StaleBoardError if a newer board is being written or was published
+
+        """
+        sequence = self.__header()[0]
+        if not sequence == 2 * version:
+            raise StaleBoardError("Board version {} was asked for, the shared board is at {}".format(version, sequence // 2))
+
+    def read(self, version):
+        """Gets a board, without copying it out of shared memory
+
+        Args:
+            * version: The version the task was given
+
+        Returns:
+            A SharedBoardView
+
+        Raises:
+            StaleBoardError if the board is not the version asked for
+
+        """
+        sequence, turn_number, length, fields = self.__header()
+        if not sequence == 2 * version:
+            raise StaleBoardError("Board version {} was asked for, the shared board is at {}".format(version, sequence // 2))
+        return SharedBoardView(self.__buf, version, turn_number, length, fields)
+
+    def close(self):
+        """Unmaps the segment. Views read from it must be dropped first
+        """
+        if self.__segment is not None:
+            self.__buf.release()
+            self.__segment.close()
+            self.__segment = None
+
+
+class SharedBoardView:
+    """One version of a shared board
+
+    Attributes:
+        * version (int): The version of the board
+        * turn_number (int): The turn of the board
+        * snapshot (:obj: SnapshotView): The units and stats of the board, read in place
+
+    """
+    def __init__(self, buf, version, turn_number, length, fields):
+        self.version = version
+        self.turn_number = turn_number
+        self.snapshot = SnapshotView(buf[SNAPSHOT_START:SNAPSHOT_START + length])
+        self.__buf = buf
+        self.__fields = fields
+
+    def blocked_bits(self):
+        """Gets the tiles holding a firewall as a bitboard
+        """
+        return self.snapshot.blocked_bits()
+
+    def distance_field(self, edge):
+        """Gets the pathlength of every tile to an edge
+
+        Args:
+            * edge: The target edge, game_map.TOP_RIGHT and friends
+
+        Returns:
+            A read only memoryview of int16 indexed by tile index, -1 for tiles that cannot reach the edge.
+            None if the board was published without distance fields
+
+        """
+        if not self.__fields:
+            return
+        start = FIELDS_START + edge * FIELD_BYTES
+        return self.__buf[start:start + FIELD_BYTES].cast("h")
@@ -0,0 +1,143 @@
+from array import array
+
+from .arena import ARENA_SIZE, indices_in_range
+
+
+class ShieldMap:
+    """The encryptors that shield a unit standing on each tile, for both players
+
+    Works like ThreatMap: the map is built in one pass over the board and then kept up to date per
+    tile, with mark_changed registered as a GameMap blocked listener by GameState.shield_map and
+    update restamping the tiles that changed. Each encryptor shields an information unit once, the
+    first frame the unit starts in its range, and shields then decay by shieldDecayPerFrame.
+
+    Replacing a firewall with another one on the same tile does not notify the listeners. Call rebuild after doing so.
+
+    Attributes:
+        * config (JSON): Contains information about the game
+        * shield (tuple): For each player, [you, enemy], an array indexed by tile index (x + y * ARENA_SIZE)
+          of the shield the player's encryptors in range of the tile give together
+        * coverage (tuple): For each player, a list indexed by tile index of the (x, y) of the player's encryptors
+          in range of the tile, in the order they were placed
+
+    """
+    def __init__(self, config):
+        """Sets up an empty map, see rebuild
+
+        Args:
+            * config (JSON): A json object containing information about the game
+
+        """
+        self.config = config
+        encryptor = config["unitInformation"][1]
+        self.__encryptor = encryptor["shorthand"]
+        self.__shield_amount = encryptor["shieldAmount"]
+        self.__range = encryptor["range"]
+        self.__shield_decay = config["mechanics"]["shieldDecayPerFrame"]
+        self.shield = (array('d', [0.0] * (ARENA_SIZE * ARENA_SIZE)), array('d', [0.0] * (ARENA_SIZE * ARENA_SIZE)))
+        self.coverage = ([()] * (ARENA_SIZE * ARENA_SIZE), [()] * (ARENA_SIZE * ARENA_SIZE))
+        # The player of the encryptor stamped on each tile, to take it back off when it goes
+        self.__stamps = {}
+        self.__changed = set()
+
+    def __stamp(self, x, y, player_index):
+        shield, coverage = self.shield[player_index], self.coverage[player_index]
+        for index in indices_in_range(x, y, self.__range):
+            shield[index] += self.__shield_amount
+            coverage[index] += ((x, y),)
+        self.__stamps[x + y * ARENA_SIZE] = player_index
+
+    def __unstamp(self, x, y):
+        player_index = self.__stamps.pop(x + y * ARENA_SIZE)
+        shield, coverage = self.shield[player_index], self.coverage[player_index]
+        for index in indices_in_range(x, y, self.__range):
+            coverage[index] = tuple(location for location in coverage[index] if not location == (x, y))
+            shield[index] = self.__shield_amount * len(coverage[index])
+
+    def __encryptor_at(self, game_map, x, y):
+        for unit in game_map[x, y]:
+            if unit.unit_type == self.__encryptor:
+                return unit
+
+    def rebuild(self, game_map):
+        """Computes the whole map from the encryptors of a board
+
+        Args:
+            * game_map: The GameMap to read
+
+        """
+        for player_index in (0, 1):
+            self.shield[player_index][:] = array('d', [0.0] * (ARENA_SIZE * ARENA_SIZE))
+            self.coverage[player_index][:] = [()] * (ARENA_SIZE * ARENA_SIZE)
+        self.__stamps.clear()
+        self.__changed.clear()
+        for unit in game_map.units():
+            if unit.unit_type == self.__encryptor:
+                self.__stamp(unit.x, unit.y, unit.player_index)
+
+    def mark_changed(self, location, blocked=None, fingerprint=None):
+        """Records that the firewall of a tile was added or removed, for the next update
+
+        Takes the arguments of a GameMap blocked listener, so it can be registered with add_blocked_listener.
+
+        Args:
+            * location: The tile that changed
+            * blocked: Unused, the tile is read again by update
+            * fingerprint: Unused
+
+        """
+        self.__changed.add((location[0], location[1]))
+
+    def update(self, game_map):
+        """Restamps the tiles recorded by mark_changed since the last update or rebuild
+
+        Args:
+            * game_map: The GameMap the changes were made to
+
+        """
+        for x, y in self.__changed:
+            if x + y * ARENA_SIZE in self.__stamps:
+                self.__unstamp(x, y)
+            unit = self.__encryptor_at(game_map, x, y)
+            if unit is not None:
+                self.__stamp(x, y, unit.player_index)
+        self.__changed.clear()
+
+    def path_shield(self, path, speed, player_index=0):
+        """Gets the shield a unit following a path carries on each frame, without taking damage
+
+        Frames follow ActionPhaseSimulator: at the start of a frame the unit is shielded by the encryptors
+        in range of its tile that have not shielded it yet, the shield decays, and then the unit moves if
+        1 / speed frames have passed since its last move.
+
+        Args:
+            * path: The path of the unit, as find_path_to_edge gives it
+            * speed: The speed of the unit type, a unit moves once every 1 / speed frames
+            * player_index: The player controlling the unit, 0 for you 1 for the enemy
+
+        Returns:
+            An array indexed by frame number of the unit's shield after that frame's decay, up to the frame the unit
+            reaches the end of its path. Index 0 is the start of the phase, before any shield
+
+        """
+        coverage = self.coverage[player_index]
+        shields = array('d', [0.0])
+        shielded_by = set()
+        shield = 0.0
+        step = 0
+        progress = 0.0
+        last = len(path) - 1
+        while True:
+            x, y = path[step]
+            for encryptor in coverage[x + y * ARENA_SIZE]:
+                if encryptor not in shielded_by:
+                    shielded_by.add(encryptor)
+                    shield += self.__shield_amount
+            shield = max(0.0, shield - self.__shield_decay)
+            shields.append(shield)
+            progress += speed
+            if progress >= 1 - 1e-9:
+                progress -= 1
+                if step == last:
+                    return shields
+                step += 1
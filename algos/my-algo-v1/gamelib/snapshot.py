@@ -0,0 +1,131 @@
+import struct
+
+from .arena import ARENA_SIZE
+
+# A snapshot is a fixed layout of little endian fields:
+#   header:   magic, format version, turn number, health, cores, bits and time of both players,
+#             then the number of units, breaches and bytes of unit ids
+#   blocked:  the tiles holding a firewall, one bit per tile index (x + y * ARENA_SIZE)
+#   units:    one record per unit, in GameMap order: type index in the config, player index, x, y,
+#             pending removal, stability, and the offset and length of its id in the id table
+#   breaches: x, y of every breach of the turn
+#   ids:      the utf-8 unit ids, back to back
+SNAPSHOT_MAGIC = b"GLGS"
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct("<4sHH8dIII")
+BLOCKED_BYTES = (ARENA_SIZE * ARENA_SIZE + 7) // 8
+UNIT_RECORD = struct.Struct("<BBBBBdIH")
+BREACH_RECORD = struct.Struct("<BB")
+# The id length of units without an id
+NO_ID = 0xFFFF
+
+
+def pack_game_state(game_state):
+    """Packs a game state into a snapshot
+
+    The snapshot holds the turn, the stats and resources of both players, every unit on the map, including
+    units placed with attempt_spawn, and the breach locations. Queued builds and deploys are not part of it.
+
+    Args:
+        * game_state: The GameState to pack
+
+    Returns:
+        The snapshot as bytes
+
+    """
+    type_indices = {type_config.get("shorthand"): index for index, type_config in enumerate(game_state.config["unitInformation"])}
+    units = list(game_state.game_map.units())
+    breaches = game_state.get_breach_locations()
+    ids = bytearray()
+    records = []
+    blocked = 0
+    for unit in units:
+        if unit.stationary:
+            blocked |= 1 << (unit.x + unit.y * ARENA_SIZE)
+        if unit.unit_id is None:
+            id_offset, id_length = 0, NO_ID
+        else:
+            encoded = str(unit.unit_id).encode()
+            id_offset, id_length = len(ids), len(encoded)
+            ids += encoded
+        records.append((type_indices[unit.unit_type], unit.player_index, unit.x, unit.y, unit.pending_removal, unit.stability, id_offset, id_length))
+
+    resources = game_state._player_resources
+    data = bytearray(HEADER.size + BLOCKED_BYTES + UNIT_RECORD.size * len(units) + BREACH_RECORD.size * len(breaches) + len(ids))
+    HEADER.pack_into(data, 0, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, game_state.turn_number,
+                     game_state.my_health, resources[0]['cores'], resources[0]['bits'], game_state.my_time,
+                     game_state.enemy_health, resources[1]['cores'], resources[1]['bits'], game_state.enemy_time,
+                     len(units), len(breaches), len(ids))
+    offset = HEADER.size
+    data[offset:offset + BLOCKED_BYTES] = blocked.to_bytes(BLOCKED_BYTES, "little")
+    offset += BLOCKED_BYTES
+    for record in records:
+        UNIT_RECORD.pack_into(data, offset, *record)
+        offset += UNIT_RECORD.size
+    for x, y in breaches:
+        BREACH_RECORD.pack_into(data, offset, x, y)
+        offset += BREACH_RECORD.size
+    data[offset:] = ids
+    return bytes(data)
+
+
+class SnapshotView:
+    """Reads a snapshot in place
+
+    The header is read when the view is made. Units, breaches and the blocked tiles are only read when
+    asked for, straight from the snapshot's buffer without copying it, so a worker can look at the
+    blocked tiles of a board without decoding its units.
+
+    Attributes:
+        * turn_number (int): The turn of the snapshot
+        * stats (tuple): (health, cores, bits, time) for each player, [you, enemy]
+        * unit_count (int): The number of units in the snapshot
+        * breach_count (int): The number of breaches in the snapshot
+
+    """
+    def __init__(self, snapshot):
+        """Checks the header of a snapshot
+
+        Args:
+            * snapshot: A snapshot from pack_game_state, as bytes or any other buffer
+
+        """
+        view = memoryview(snapshot)
+        fields = HEADER.unpack_from(view, 0)
+        magic, version, self.turn_number = fields[:3]
+        if not (magic == SNAPSHOT_MAGIC and version == SNAPSHOT_VERSION):
+            raise ValueError("Not a version {} game state snapshot".format(SNAPSHOT_VERSION))
+        self.stats = (fields[3:7], fields[7:11])
+        self.unit_count, self.breach_count, id_bytes = fields[11:]
+        self.__view = view
+        self.__units_start = HEADER.size + BLOCKED_BYTES
+        self.__breaches_start = self.__units_start + UNIT_RECORD.size * self.unit_count
+        self.__ids_start = self.__breaches_start + BREACH_RECORD.size * self.breach_count
+        if len(view) < self.__ids_start + id_bytes:
+            raise ValueError("The snapshot is truncated")
+
+    def blocked_bits(self):
+        """Gets the tiles holding a firewall as a bitboard
+        """
+        return int.from_bytes(self.__view[HEADER.size:self.__units_start], "little")
+
+    def units(self, shorthands=None):
+        """Reads the units of the snapshot
+
+        Args:
+            * shorthands: The unit types of the config, in order. Unit types are type indices if not given
+
+        Returns:
+            A generator of (unit_type, player_index, x, y, stability, pending_removal, unit_id) tuples, in GameMap order
+
+        """
+        ids = self.__view[self.__ids_start:]
+        for type_index, player_index, x, y, pending_removal, stability, id_offset, id_length in \
+                UNIT_RECORD.iter_unpack(self.__view[self.__units_start:self.__breaches_start]):
+            unit_id = None if id_length == NO_ID else str(ids[id_offset:id_offset + id_length], "utf-8")
+            yield (shorthands[type_index] if shorthands is not None else type_index, player_index, x, y, stability, bool(pending_removal), unit_id)
+
+    def breach_locations(self):
+        """Gets the locations units scored at, like GameState.get_breach_locations
+        """
+        return [[x, y] for x, y in BREACH_RECORD.iter_unpack(self.__view[self.__breaches_start:self.__ids_start])]
@@ -1,136 +1,46 @@
+import copy
+import gc
+import io
+import math
+import pickle
+import sys
 import unittest
+import warnings
+import weakref
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import json
+import random
 from .game_state import GameState
 from .unit import GameUnit
+from . import unit as unit_module
+from .algocore import AlgoCore
+from .util import StateMessage
 from .advanced_game_state import AdvancedGameState
+from .action_frame import ActionFrame
+from .action_phase_tracker import ActionPhaseTracker
+from .action_phase_simulator import ActionPhaseSimulator
+from .rollout_engine import RolloutEngine
+from .shared_board import SharedBoard, SharedBoardReader, StaleBoardError
+from .snapshot import SnapshotView
+from .shield_map import ShieldMap
+from .threat_map import ThreatMap
+from .navigation import ShortestPathFinder
+from .path_engine import PathEngine, PathField
+from .path_cache import PathCache
+from . import bitboard
+from .fixtures import CONFIG, TURN_0
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class BasicTests(unittest.TestCase):
 
     def make_turn_0_map(self, adv=False):
-        config = """
-        {
-            "debug":{
-                "printMapString":false,
-                "printTStrings":false,
-                "printActStrings":false,
-                "printHitStrings":false,
-                "printPlayerInputStrings":false,
-                "printBotErrors":false,
-                "printPlayerGetHitStrings":false
-            },
-            "unitInformation":[
-                {
-                "damage":0.0,
-                "cost":1,
-                "getHitRadius":0.51,
-                "display":"Filter",
-                "range":3.0,
-                "shorthand":"FF",
-                "stability":60.0
-                },
-                {
-                "damage":0.0,
-                "cost":4,
-                "getHitRadius":0.51,
-                "shieldAmount":10.0,
-                "display":"Encryptor",
-                "range":3.0,
-                "shorthand":"EF",
-                "stability":30.0
-                },
-                {
-                "damage":4.0,
-                "cost":3,
-                "getHitRadius":0.51,
-                "display":"Destructor",
-                "range":3.0,
-                "shorthand":"DF",
-                "stability":75.0
-                },
-                {
-                "damageI":1.0,
-                "damageToPlayer":1.0,
-                "cost":1.0,
-                "getHitRadius":0.51,
-                "damageF":1.0,
-                "display":"Ping",
-                "range":3.0,
-                "shorthand":"PI",
-                "stability":15.0,
-                "speed":0.5
-                },
-                {
-                "damageI":3.0,
-                "damageToPlayer":1.0,
-                "cost":3.0,
-                "getHitRadius":0.51,
-                "damageF":3.0,
-                "display":"EMP",
-                "range":5.0,
-                "shorthand":"EI",
-                "stability":5.0,
-                "speed":0.25
-                },
-                {
-                "damageI":10.0,
-                "damageToPlayer":1.0,
-                "cost":1.0,
-                "getHitRadius":0.51,
-                "damageF":0.0,
-                "display":"Scrambler",
-                "range":3.0,
-                "shorthand":"SI",
-                "stability":40.0,
-                "speed":0.25
-                },
-                {
-                "display":"Remove",
-                "shorthand":"RM"
-                }
-            ],
-            "timingAndReplay":{
-                "waitTimeBotMax":100000,
-                "waitTimeManual":1820000,
-                "waitForever":false,
-                "waitTimeBotSoft":70000,
-                "replaySave":0,
-                "storeBotTimes":true
-            },
-            "resources":{
-                "turnIntervalForBitCapSchedule":10,
-                "turnIntervalForBitSchedule":10,
-                "bitRampBitCapGrowthRate":5.0,
-                "roundStartBitRamp":10,
-                "bitGrowthRate":1.0,
-                "startingHP":30.0,
-                "maxBits":999999.0,
-                "bitsPerRound":5.0,
-                "coresPerRound":5.0,
-                "coresForPlayerDamage":1.0,
-                "startingBits":5.0,
-                "bitDecayPerRound":0.33333,
-                "startingCores":25.0
-            },
-            "mechanics":{
-                "basePlayerHealthDamage":1.0,
-                "damageGrowthBasedOnY":0.0,
-                "bitsCanStackOnDeployment":true,
-                "destroyOwnUnitRefund":0.5,
-                "destroyOwnUnitsEnabled":true,
-                "stepsRequiredSelfDestruct":5,
-                "selfDestructRadius":1.5,
-                "shieldDecayPerFrame":0.15,
-                "meleeMultiplier":0,
-                "destroyOwnUnitDelay":1,
-                "rerouteMidRound":true,
-                "firewallBuildTime":0
-            }
-        }
-        """
-        turn_0 = """{"p2Units":[[],[],[],[],[],[],[]],"turnInfo":[0,0,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0],"events":{"selfDestruct":[],"breach":[],"damage":[],"shield":[],"move":[],"spawn":[],"death":[],"attack":[],"melee":[]}}"""
         if adv:
-            return AdvancedGameState(json.loads(config), turn_0)
-        return GameState(json.loads(config), turn_0)
+            return AdvancedGameState(json.loads(CONFIG), TURN_0)
+        return GameState(json.loads(CONFIG), TURN_0)
 
     def test_basic(self, adv=False):
         self.assertEqual(True, True, "It's the end of the world as we know it, and I feel fine")
@@ -163,6 +73,62 @@ class BasicTests(unittest.TestCase):
         self.assertEqual([("DF", 13, 6)], game._build_stack, "Build queue is wrong!")
         self.assertEqual([("SI", 13, 0), ("SI", 13, 0), ("SI", 13, 0)], game._deploy_stack, "Deploy queue is wrong!")
 
+    def test_spawn_batch(self, adv=False):
+        rng = random.Random(11)
+        locations = [location for location in self.make_turn_0_map(adv).game_map if location[1] < 16]
+        for _ in range(4):
+            requests = [(rng.choice(["FF", "EF", "DF", "PI", "EI", "SI"]), rng.choice(locations), rng.choice([1, 1, 1, 2, 4])) for _ in range(60)]
+            requests += [(unit_type, list(location), count) for unit_type, location, count in requests[::5]]
+            sequential, batched = self.make_turn_0_map(adv), self.make_turn_0_map(adv)
+            for game in (sequential, batched):
+                game.game_map.add_unit("DF", [13, 2], 0)
+                game.game_map.add_unit("PI", [14, 0], 0)
+                game._player_resources[0]['cores'] = 40
+                game._player_resources[0]['bits'] = 12
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                spawned = [sequential.attempt_spawn(unit_type, location, count) for unit_type, location, count in requests]
+                outcomes = batched.attempt_spawn_batch(requests)
+            self.assertEqual(spawned, [outcome.spawned for outcome in outcomes])
+            self.assertEqual(sequential._build_stack, batched._build_stack)
+            self.assertEqual(sequential._deploy_stack, batched._deploy_stack)
+            self.assertEqual(sequential._player_resources, batched._player_resources)
+            self.assertEqual(sequential.game_map.fingerprint, batched.game_map.fingerprint)
+            for location in locations:
+                self.assertEqual([unit.unit_type for unit in sequential.game_map[location]], [unit.unit_type for unit in batched.game_map[location]])
+            for outcome in outcomes:
+                self.assertEqual(outcome.spawned == outcome.requested, outcome.reason is None)
+
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("FF", [5, 8], 0)
+        game._player_resources[0]['cores'] = 7
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            outcomes = game.attempt_spawn_batch([
+                ("DF", [13, 6], 1), ("FF", [13, 6], 1), ("FF", [5, 8], 1), ("FF", [14, 14], 1), ("FF", [0, 0], 1),
+                ("PI", [13, 5], 1), ("PI", [13, 0], 0), ("XX", [13, 0], 1), ("EF", [12, 6], 2), ("SI", [13, 0], 9), ("DF", [12, 7], 1)])
+        self.assertEqual([(1, None), (0, "blocked"), (0, "blocked"), (0, "wrong territory"), (0, "out of bounds"),
+                          (0, "not on edge"), (0, "invalid count"), (0, "invalid unit"), (1, "blocked"), (5, "unaffordable"), (0, "unaffordable")],
+                         [(outcome.spawned, outcome.reason) for outcome in outcomes])
+        self.assertEqual(10, len(caught))
+        self.assertEqual([("DF", 13, 6), ("EF", 12, 6)], game._build_stack)
+        self.assertEqual([("SI", 13, 0)] * 5, game._deploy_stack)
+        self.assertEqual((0, 0), (game.get_resource(game.CORES), game.get_resource(game.BITS)))
+
+        # Fractional locations are not tiles, they are not truncated to the tile next to them
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("FF", [13, 1], 0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            outcomes = game.attempt_spawn_batch([("FF", [13.5, 2], 1), ("PI", [13.5, 0.5], 1), ("PI", [13.0, 0.0], 1)])
+            self.assertEqual([(0, "out of bounds"), (0, "out of bounds"), (1, None)], [(outcome.spawned, outcome.reason) for outcome in outcomes])
+            self.assertFalse(game.can_spawn("FF", [13.5, 2]))
+            self.assertEqual(0, game.attempt_spawn("FF", [[13.5, 2]]))
+            self.assertEqual(0, game.attempt_remove([[13.5, 1]]))
+            self.assertEqual(1, game.attempt_remove([[13.0, 1.0]]))
+        self.assertEqual([(game.config["unitInformation"][6]["shorthand"], 13, 1)], game._build_stack)
+        self.assertEqual([("PI", 13, 0)], game._deploy_stack)
+
     def test_trivial_functions(self, adv=False):
         game = self.make_turn_0_map(adv)
 
@@ -173,6 +139,671 @@ class BasicTests(unittest.TestCase):
         self.assertEqual(0, len(game.game_map.get_locations_in_range([-500,-500], 10)), "Invalid tiles are being marked as in range")
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "A location should be in range of itself")
     
+    def test_arena_tables(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        locations = list(game.game_map)
+        self.assertEqual(420, len(locations), "The arena should have 420 tiles")
+        self.assertEqual([[13, 0], [14, 0], [12, 1]], locations[:3], "The map is iterated in the wrong order")
+        self.assertEqual([14, 27], locations[-1])
+        self.assertEqual(locations, list(game.game_map), "Iterating the map again should start from the first tile")
+        self.assertEqual(420 * 420, sum(1 for _ in game.game_map for _ in game.game_map), "Nested iterations should not share a position")
+        for x in range(-2, 30):
+            for y in range(-2, 30):
+                on_board = 0 <= y < 28 and abs(x - 13.5) <= min(y, 27 - y) + 0.5
+                self.assertEqual(on_board, game.game_map.in_arena_bounds([x, y]), "Bounds are wrong at {}".format([x, y]))
+        for location in ([13.5, 0.5], [13.5, 13.5], [3.25, 13.5], [13.0, 0.0]):
+            self.assertTrue(game.game_map.in_arena_bounds(location), "{} is on the board".format(location))
+        for location in ([12.5, 0], [28.5, 13.5], [13.5, -1.5]):
+            self.assertFalse(game.game_map.in_arena_bounds(location), "{} is off the board".format(location))
+        self.assertEqual([[14, 27], [15, 26]], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT)[:2])
+        self.assertEqual([[13, 0], [12, 1]], game.game_map.get_edges()[game.game_map.BOTTOM_LEFT][:2])
+        self.assertTrue(game.can_spawn("PI", [0, 13]), "Should be able to spawn on the bottom left edge")
+        self.assertFalse(game.can_spawn("PI", [1, 13]), "Should not be able to spawn off the edge")
+
+    def test_parsed_state(self, adv=False):
+        config = json.loads(CONFIG)
+        state_class = AdvancedGameState if adv else GameState
+        expected = state_class(config, TURN_0)
+        message = StateMessage(TURN_0, json.loads(TURN_0))
+        self.assertEqual(TURN_0, message, "A StateMessage should still be the message string")
+        for game in (state_class(config, message), state_class.from_state(config, message.state)):
+            self.assertIsInstance(game, state_class)
+            self.assertEqual((expected.turn_number, expected.my_health, expected.get_resource(expected.CORES, 1)),
+                             (game.turn_number, game.my_health, game.get_resource(game.CORES, 1)))
+            self.assertEqual(expected.game_map.fingerprint, game.game_map.fingerprint)
+        self.assertEqual(message.state, pickle.loads(pickle.dumps(message)).state)
+        freed = weakref.ref(state_class(config, message))
+        self.assertIsNone(freed(), "A GameState should not need the garbage collector to be freed")
+
+        received = []
+        ended = []
+        class Recorder(AlgoCore):
+            def on_turn(self, turn_state):
+                received.append(turn_state)
+            def on_game_end(self, turn_state):
+                ended.append(turn_state)
+        frame = json.loads(TURN_0)
+        frame["turnInfo"] = [2, 1, -1]
+        stdin, stderr = sys.stdin, sys.stderr
+        sys.stdin, sys.stderr = io.StringIO("\n".join([CONFIG.replace("\n", ""), TURN_0.replace("\n", ""), json.dumps(frame), ""])), io.StringIO()
+        try:
+            Recorder().start()
+        finally:
+            sys.stdin, sys.stderr = stdin, stderr
+        self.assertEqual(1, len(received), "on_turn should be called once")
+        self.assertIsInstance(received[0], StateMessage)
+        self.assertEqual(0, received[0].state["turnInfo"][0])
+        self.assertEqual([2], [turn_state.state["turnInfo"][0] for turn_state in ended], "on_game_end should be called once with the end state")
+
+    def test_lazy_game_state(self, adv=False):
+        config = json.loads(CONFIG)
+        state = json.loads(TURN_0)
+        state["turnInfo"] = [0, 7, -1]
+        state["p1Stats"] = [20.0, 12.0, 9.0, 1500]
+        state["p1Units"][2].append([13, 11, 60.0, "4"])
+        state["p2Units"][0].append([13, 16, 20.0, "5"])
+        state["events"]["breach"].append([[3, 10], 1.0, 3, "9", 2])
+        state_class = AdvancedGameState if adv else GameState
+        eager = state_class.from_state(config, state)
+
+        lazy = state_class.from_state(config, state, lazy=True)
+        self.assertEqual(7, lazy.turn_number)
+        self.assertEqual({"turn_number"}, {"turn_number", "my_health", "game_map", "_breach_locations"} & set(vars(lazy)),
+                         "A lazy game state should only read the turn number up front")
+        self.assertEqual(eager.get_resource(eager.CORES), lazy.get_resource(lazy.CORES))
+        self.assertNotIn("game_map", vars(lazy), "Reading resources should not build the map")
+        self.assertEqual((eager.my_health, eager.my_time, eager.enemy_health), (lazy.my_health, lazy.my_time, lazy.enemy_health))
+        self.assertEqual(eager.get_breach_locations(), lazy.get_breach_locations())
+        self.assertNotIn("game_map", vars(lazy))
+
+        copied = copy.deepcopy(state_class.from_state(config, state, lazy=True))
+        for game in (lazy, copied):
+            self.assertEqual(eager.game_map.fingerprint, game.game_map.fingerprint)
+            self.assertEqual(20.0, game.game_map[13, 16][0].stability)
+            self.assertEqual(str(eager.get_all_units_of_type("all", "me")), str(game.get_all_units_of_type("all", "me")))
+            self.assertEqual(eager.find_path_to_edge([13, 0], 0), game.find_path_to_edge([13, 0], 0))
+            self.assertEqual(1, game.attempt_spawn("FF", [10, 10]))
+            self.assertEqual(eager.get_resource(eager.CORES) - 1, game.get_resource(game.CORES))
+        with self.assertRaises(AttributeError):
+            lazy.not_an_attribute
+
+    def test_action_frame(self, adv=False):
+        config = json.loads(CONFIG)
+        state = json.loads(TURN_0)
+        state["turnInfo"] = [1, 3, 12]
+        state["p1Units"][2].append([13, 11, 75.0, "7"])
+        state["events"].update({
+            "breach": [[[3, 17], 1.0, 3, "21", 1]],
+            "damage": [[[13, 11], 2.0, 2, "7", 1]],
+            "death": [[[12, 15], 4, "30", 2, False]],
+            "spawn": [[[0, 13], 3, "21", 1]],
+            "selfDestruct": [[[5, 8], [[5, 9], [6, 9]], 15.0, 5, "31", 2]],
+            "shield": [[[10, 10], [11, 9], 10.0, 1, "8", "22", 1]],
+            "move": [[[13, 0], [13, 1], [0, 0], 3, "21", 1]],
+        })
+        frame = ActionFrame(config, StateMessage(json.dumps(state), state))
+        self.assertEqual((3, 12, 30, 5), (frame.turn_number, frame.frame_number, frame.my_health, frame.get_resource(frame.BITS, 1)))
+        self.assertEqual([[3, 17]], frame.get_breach_locations())
+        self.assertEqual(([3, 17], 1.0, "PI", "21", 0), tuple(frame.breaches()[0]))
+        self.assertEqual("DF", frame.damages()[0].unit_type)
+        self.assertEqual(("EI", 1, False), (frame.deaths()[0].unit_type, frame.deaths()[0].player_index, frame.deaths()[0].removed_by_owner))
+        self.assertEqual([0, 13], frame.spawns()[0].location)
+        self.assertEqual(([[5, 9], [6, 9]], "SI", 1), (frame.self_destructs()[0].targets, frame.self_destructs()[0].unit_type, frame.self_destructs()[0].player_index))
+        self.assertEqual(("EF", "22", 10.0), (frame.shields()[0].unit_type, frame.shields()[0].target_id, frame.shields()[0].amount))
+        self.assertEqual(([13, 0], [13, 1], "21"), (frame.moves()[0].location, frame.moves()[0].new_location, frame.moves()[0].unit_id))
+        self.assertEqual([], ActionFrame(config, TURN_0).breaches())
+        self.assertEqual("DF", frame.game_map[13, 11][0].unit_type, "The map should be built when asked for")
+
+    def test_action_phase_tracker(self, adv=False):
+        config = json.loads(CONFIG)
+        tracker = ActionPhaseTracker(config)
+        path = [[13, 0], [13, 1], [13, 2], [14, 2], [14, 3]]
+        destructor = [14, 5, 75.0, "1"]
+        for frame_number in range(6):
+            state = json.loads(TURN_0)
+            state["turnInfo"] = [1, 4, frame_number]
+            if frame_number < 4:
+                destructor[2] -= 10
+                state["p2Units"][2].append(list(destructor))
+            state["p1Units"][3].append(path[frame_number // 2] + [15.0, "2"])
+            if frame_number < 3:
+                state["p1Units"][3].append([0, 13, 15.0 - frame_number, "3"])
+            frame = tracker.update(json.dumps(state) if frame_number % 2 else state)
+            self.assertEqual(frame_number, frame.frame_number)
+            if frame_number == 1:
+                self.assertTrue(tracker.game_map.in_arena_bounds([14, 5]))
+                self.assertEqual(55.0, tracker.game_map[14, 5][0].stability, "Stability should follow the frames")
+                self.assertEqual(["2", "3"], sorted(unit.unit_id for unit in tracker.game_map[13, 0] + tracker.game_map[0, 13]))
+
+        self.assertEqual(["2"], list(tracker.units))
+        self.assertEqual([13, 2], [tracker.units["2"].x, tracker.units["2"].y])
+        self.assertEqual(1, len(tracker.game_map[13, 2]))
+        self.assertEqual(0, len(tracker.game_map[13, 0]), "Units should leave the tiles they move off")
+        self.assertEqual((3, "3"), (tracker.dead["3"][0], tracker.dead["3"][1].unit_id))
+        self.assertEqual(4, tracker.dead["1"][0])
+        self.assertEqual([], tracker.game_map[14, 5], "Destroyed firewalls should be removed")
+        self.assertEqual(0, tracker.game_map.fingerprint, "The fingerprint should follow destroyed firewalls")
+        self.assertEqual({"2": [[13, 0], [13, 1], [13, 2]], "3": [[0, 13]]}, tracker.trajectories())
+        self.assertEqual([(0, [13, 0]), (2, [13, 1]), (4, [13, 2])], tracker.trajectory("2", with_frames=True))
+        self.assertEqual([[14, 5]], tracker.trajectory("1"))
+
+        state["turnInfo"] = [1, 5, 0]
+        tracker.update(state)
+        self.assertEqual((5, []), (tracker.turn_number, list(tracker.dead)), "A new turn should start a new phase")
+
+    def test_action_phase_simulator(self, adv=False):
+        # Undefended pings walk the path find_path_to_edge gives, one tile every two frames
+        game = self.make_turn_0_map(adv)
+        path = game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)
+        game.attempt_spawn("PI", [13, 0], 3)
+        result = ActionPhaseSimulator.from_game_state(game).simulate()
+        self.assertEqual(2 * len(path), result.frames)
+        self.assertEqual([(2 * len(path), path[-1], "PI", 0)] * 3, result.breaches)
+        self.assertEqual(([0, 3.0], 27.0, 30.0), (result.health_damage, result.enemy_health, result.my_health))
+        self.assertEqual([], result.survivors)
+
+        # A destructor next to the path kills a ping with four hits, the ping hits back until it dies
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("DF", [14, 3], 1)
+        game.attempt_spawn("PI", [13, 0])
+        result = ActionPhaseSimulator.from_game_state(game).simulate()
+        self.assertEqual(([], [4.0, 16.0]), (result.breaches, result.damage_dealt))
+        self.assertEqual([("PI", 0)], [(unit.unit_type, unit.player_index) for _, unit in result.deaths])
+        self.assertEqual([("DF", 71.0)], [(unit.unit_type, unit.stability) for unit in result.survivors])
+
+        # Shields are added once per encryptor and decay every frame
+        game = self.make_turn_0_map(adv)
+        game.attempt_spawn("EF", [12, 2])
+        game.attempt_spawn("PI", [13, 0])
+        result = ActionPhaseSimulator.from_game_state(game).simulate(max_frames=3)
+        ping = [unit for unit in result.survivors if unit.unit_type == "PI"][0]
+        self.assertAlmostEqual(15.0 + 10.0 - 3 * 0.15, ping.stability)
+
+        # Walled in units self destruct on the firewalls around them
+        game = self.make_turn_0_map(adv)
+        for x in range(28):
+            if game.game_map.in_arena_bounds([x, 14]):
+                game.game_map.add_unit("FF", [x, 14], 1)
+        game.attempt_spawn("SI", [13, 0])
+        result = ActionPhaseSimulator.from_game_state(game).simulate()
+        end = result.deaths[0][1]
+        damaged = sorted([unit.x, unit.y] for unit in result.survivors if unit.stability < 60.0)
+        self.assertEqual([], result.breaches)
+        self.assertEqual(sorted(location for location in game.game_map.get_locations_in_range([end.x, end.y], 1.5)
+                                if game.contains_stationary_unit(location)), damaged)
+        self.assertTrue(all(unit.stability == 20.0 for unit in result.survivors if unit.stability < 60.0))
+
+        # Targets are picked like AdvancedGameState.get_target
+        rng = random.Random(2)
+        for _ in range(20):
+            board = AdvancedGameState(json.loads(CONFIG), TURN_0)
+            for _ in range(8):
+                location = [13 + rng.randint(-3, 3), 13 + rng.randint(-3, 3)]
+                if board.game_map.in_arena_bounds(location) and not board.game_map[location] and location[1] < 11:
+                    board.game_map.add_unit(rng.choice(["FF", "DF"]), location, 1)
+                    board.game_map[location][0].stability = rng.choice([10.0, 20.0])
+            board.game_map.add_unit("SI", [13, 12], 1)
+            board.game_map[13, 12][0].stability = rng.choice([10.0, 20.0])
+            board.game_map.add_unit("EI", [13, 11], 0)
+            emp = board.game_map[13, 11][0]
+            expected = board.get_target(emp)
+            result = ActionPhaseSimulator.from_game_state(board).simulate(max_frames=1)
+            hit = [unit for unit in result.survivors + [unit for _, unit in result.deaths]
+                   if unit.player_index == 1 and unit.stability < board.game_map[unit.x, unit.y][0].stability]
+            self.assertEqual([[expected.x, expected.y]], [[unit.x, unit.y] for unit in hit])
+
+        # Recorded frames are compared by unit id
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("DF", [14, 3], 1)
+        game.attempt_spawn("PI", [13, 0], 2)
+        frames = []
+
+        def record(frame_number, units):
+            state = json.loads(TURN_0)
+            state["turnInfo"] = [1, 0, frame_number]
+            for unit in units:
+                type_index = ["FF", "EF", "DF", "PI", "EI", "SI"].index(unit.type_info.unit_type)
+                state["p{}Units".format(unit.player_index + 1)][type_index].append([unit.x, unit.y, unit.stability, unit.unit_id])
+            frames.append(json.dumps(state))
+        record(0, [])
+        first = json.loads(frames.pop())
+        first["p2Units"][2].append([14, 3, 75.0, "1"])
+        first["p1Units"][3] += [[13, 0, 15.0, "2"], [13, 0, 15.0, "3"]]
+        simulator = ActionPhaseSimulator.from_frame(json.loads(CONFIG), first)
+        simulator.simulate(on_frame=record)
+        self.assertEqual([], simulator.validate(frames))
+        moved = json.loads(frames[5])
+        x, y, stability, unit_id = moved["p1Units"][3][0]
+        moved["p1Units"][3][0][1] += 1
+        self.assertEqual([(6, unit_id, (x, y + 1, stability), (x, y, stability))], simulator.validate([frames[4], moved]))
+
+    def test_snapshot(self, adv=False):
+        config = json.loads(CONFIG)
+        state = json.loads(TURN_0)
+        state["turnInfo"] = [0, 7, -1]
+        state["p1Stats"] = [21.0, 7.5, 12.25, 1834]
+        state["p2Stats"] = [18.0, 3.0, 0.5, 2210]
+        state["p1Units"][0] = [[3, 12, 41.3, "17"], [13, 4, 60.0, "18"]]
+        state["p1Units"][2] = [[14, 4, 11.0, "19"]]
+        state["p2Units"][1] = [[13, 20, 30.0, "20"]]
+        state["p2Units"][3] = [[13, 27, 15.0, "21"], [13, 27, 9.0, "22"]]
+        state["events"]["breach"] = [[[27, 13], 1.0, 3, "5", 2], [[0, 14], 1.0, 3, "6", 1]]
+        game = (AdvancedGameState if adv else GameState)(config, json.dumps(state))
+        game.game_map[13, 4][0].pending_removal = True
+        game.attempt_spawn("DF", [10, 10])
+        game.attempt_spawn("PI", [13, 0], 2)
+
+        snapshot = game.to_snapshot()
+        for data in (snapshot, bytearray(snapshot), memoryview(snapshot)):
+            restored = type(game).from_snapshot(config, data)
+            self.assertIsInstance(restored, type(game))
+            self.assertEqual((7, 21.0, 1834.0, 18.0, 2210.0), (restored.turn_number, restored.my_health, restored.my_time, restored.enemy_health, restored.enemy_time))
+            self.assertEqual(game._player_resources, restored._player_resources)
+            self.assertEqual([[27, 13], [0, 14]], restored.get_breach_locations())
+            self.assertEqual(game.game_map.fingerprint, restored.game_map.fingerprint)
+            for location in game.game_map:
+                self.assertEqual([(str(unit), unit.unit_id) for unit in game.game_map[location]],
+                                 [(str(unit), unit.unit_id) for unit in restored.game_map[location]])
+            self.assertEqual((6, 3), (len(restored.get_all_units_of_type("all", "me")), len(restored.get_all_units_of_type("all", "enemy"))),
+                             "Units placed with attempt_spawn should be listed like parsed ones")
+            self.assertEqual(game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT), restored.find_path_to_edge([13, 0], restored.game_map.TOP_RIGHT))
+
+        view = SnapshotView(snapshot)
+        self.assertEqual((7, 9, 2), (view.turn_number, view.unit_count, view.breach_count))
+        self.assertEqual(bitboard.from_game_map(game.game_map), view.blocked_bits())
+        shorthands = [type_config["shorthand"] for type_config in config["unitInformation"]]
+        self.assertEqual([("FF", 0, 13, 4, 60.0, True, "18"), ("DF", 0, 14, 4, 11.0, False, "19")],
+                         [unit for unit in view.units(shorthands) if unit[6] in ("18", "19")])
+        self.assertLess(len(snapshot), len(pickle.dumps([game.game_map[location] for location in game.game_map])))
+        with self.assertRaises(ValueError):
+            SnapshotView(b"XXXX" + snapshot[4:])
+        with self.assertRaises(ValueError):
+            SnapshotView(snapshot[:-3])
+
+    def test_rollout_engine(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        for x in range(10, 18):
+            game.game_map.add_unit("DF", [x, 15], 1)
+        game.attempt_spawn("FF", [13, 3])
+
+        plans = [[("PI", 5, [13, 0])], [("PI", 5, [3, 10])], [("EI", 1, [24, 10]), ("PI", 2, [24, 10])], [("SI", 2, [13, 0])]]
+        expected = []
+        for plan in plans:
+            deploys = [(unit_type, location[0], location[1]) for unit_type, count, location in plan for _ in range(count)]
+            result = ActionPhaseSimulator.from_game_state(game).simulate(deploys)
+            expected.append((plan, result.health_damage, result.damage_dealt, len(result.breaches), result.frames))
+
+        engine = RolloutEngine(game.config, workers=2)
+        self.assertEqual(17.5, engine.time_budget, "The default budget should be a quarter of waitTimeBotSoft")
+        self.assertEqual(expected, [tuple(result) for result in engine.evaluate(game, plans)])
+        self.assertEqual([], engine.evaluate(game, plans, time_budget=0))
+        with engine:
+            self.assertEqual(expected, [tuple(result) for result in engine.evaluate(game, plans, chunk_size=1)])
+            best = engine.best_plan(game, plans)
+        self.assertEqual(max(expected, key=lambda result: (result[1][1] - result[1][0], result[2][0]))[0], best.plan)
+
+    def test_shared_board(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        for x in range(10, 18):
+            game.game_map.add_unit("DF", [x, 15], 1)
+        game.attempt_spawn("FF", [13, 3])
+
+        board = SharedBoard(capacity=64)
+        reader = None
+        try:
+            version = board.publish(game)
+            self.assertEqual((1, version), (version, board.version))
+            reader = SharedBoardReader(board.name)
+            view = reader.read(version)
+            self.assertEqual(game.turn_number, view.turn_number)
+            self.assertEqual(bitboard.from_game_map(game.game_map), view.blocked_bits())
+            self.assertEqual(list(SnapshotView(game.to_snapshot()).units()), list(view.snapshot.units()))
+            for edge in range(4):
+                self.assertEqual(list(game.path_field(edge).pathlength), view.distance_field(edge).tolist())
+            with self.assertRaises(TypeError):
+                view.distance_field(0)[0] = 1
+            reader.check(version)
+            del view
+
+            # The board grew past its capacity, so readers have to follow the new name
+            name = board.name
+            game.game_map.add_unit("FF", [13, 13], 0)
+            newer = board.publish(game, distance_fields=False)
+            self.assertEqual(2, newer)
+            self.assertNotEqual(name, board.name)
+            with self.assertRaises(StaleBoardError):
+                reader.check(version)
+            reader.close()
+            reader = SharedBoardReader(board.name)
+            with self.assertRaises(StaleBoardError):
+                reader.read(version)
+            view = reader.read(newer)
+            self.assertIsNone(view.distance_field(0))
+            self.assertEqual(bitboard.from_game_map(game.game_map), view.blocked_bits())
+            del view
+        finally:
+            if reader is not None:
+                reader.close()
+            board.close()
+
+        plans = [[("PI", 5, [13, 0])], [("SI", 2, [13, 0])], [("EI", 1, [24, 10])]]
+        with RolloutEngine(game.config, workers=2, shared_board=False) as engine:
+            expected = engine.evaluate(game, plans, chunk_size=1)
+        with RolloutEngine(game.config, workers=2) as engine:
+            self.assertEqual(expected, engine.evaluate(game, plans, chunk_size=1))
+            game.game_map.remove_unit([13, 13])
+            self.assertEqual(RolloutEngine(game.config).evaluate(game, plans), engine.evaluate(game, plans, chunk_size=1),
+                             "Workers should read the new board of each evaluate")
+
+    def test_threat_map(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        rng = random.Random(11)
+        locations = list(game.game_map)
+        for location in rng.sample(locations, 60):
+            game.game_map.add_unit(rng.choice(["FF", "EF", "DF", "DF"]), location, 0 if location[1] < 14 else 1)
+        threat_map = game.threat_map()
+        self.assertIs(threat_map, game.threat_map())
+
+        # Edits through add_unit, remove_unit, item assignment and attempt_spawn are applied incrementally
+        for _ in range(40):
+            location = rng.choice(locations)
+            roll = rng.random()
+            if roll < 0.4:
+                game.game_map.remove_unit(location)
+            elif roll < 0.8:
+                # Replacing a firewall in place does not notify the map's listeners
+                if not game.contains_stationary_unit(location):
+                    game.game_map.add_unit(rng.choice(["FF", "DF"]), location, rng.randint(0, 1))
+            else:
+                game.game_map[tuple(location)] = []
+        game.game_map.remove_unit([13, 2])
+        game.game_map.remove_unit([14, 2])
+        self.assertEqual(2, game.attempt_spawn("DF", [[13, 2], [14, 2]]))
+        updated = game.threat_map()
+        self.assertIs(threat_map, updated)
+
+        rebuilt = ThreatMap(game.config)
+        rebuilt.rebuild(game.game_map)
+        self.assertEqual(list(rebuilt.damage[0]), list(updated.damage[0]))
+        self.assertEqual(list(rebuilt.damage[1]), list(updated.damage[1]))
+        advanced = AdvancedGameState(game.config, TURN_0)
+        advanced.game_map = game.game_map
+        for location in locations:
+            for player_index in (0, 1):
+                attackers = advanced.get_attackers(location, player_index)
+                index = location[0] + location[1] * 28
+                self.assertEqual(len(attackers), updated.attackers[player_index][index])
+                self.assertEqual(4.0 * len(attackers), updated.damage_at(location, player_index))
+
+        weighted = game.threat_map(stability_weighted=True)
+        destructor = game.game_map[13, 2][0]
+        destructor.stability /= 2
+        weighted.rebuild(game.game_map)
+        self.assertEqual(updated.damage_at([13, 4], 1) - 2.0, weighted.damage_at([13, 4], 1))
+        game.game_map.remove_unit([13, 2])
+        self.assertEqual(updated.damage_at([13, 4], 1) - 4.0, game.threat_map().damage_at([13, 4], 1))
+        self.assertEqual(game.threat_map().damage_at([13, 4], 1), game.threat_map(stability_weighted=True).damage_at([13, 4], 1))
+
+    def test_shield_map(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        rng = random.Random(7)
+        locations = list(game.game_map)
+        for location in rng.sample(locations, 40):
+            game.game_map.add_unit(rng.choice(["FF", "EF", "EF", "DF"]), location, 0 if location[1] < 14 else 1)
+        shield_map = game.shield_map()
+        for _ in range(40):
+            location = rng.choice(locations)
+            if rng.random() < 0.5:
+                game.game_map.remove_unit(location)
+            elif not game.contains_stationary_unit(location):
+                game.game_map.add_unit(rng.choice(["FF", "EF"]), location, rng.randint(0, 1))
+        game.game_map.remove_unit([13, 3])
+        self.assertEqual(1, game.attempt_spawn("EF", [13, 3]))
+        self.assertIs(shield_map, game.shield_map())
+
+        rebuilt = ShieldMap(game.config)
+        rebuilt.rebuild(game.game_map)
+        for player_index in (0, 1):
+            self.assertEqual(list(rebuilt.shield[player_index]), list(shield_map.shield[player_index]))
+            self.assertEqual([sorted(encryptors) for encryptors in rebuilt.coverage[player_index]],
+                             [sorted(encryptors) for encryptors in shield_map.coverage[player_index]])
+        for location in locations:
+            encryptors = sorted((x, y) for x, y in shield_map.coverage[0][location[0] + location[1] * 28])
+            expected = sorted((x, y) for x, y in game.game_map.get_locations_in_range(location, 3)
+                              if any(unit.unit_type == "EF" and unit.player_index == 0 for unit in game.game_map[x, y]))
+            self.assertEqual(expected, encryptors)
+            self.assertEqual(10.0 * len(expected), shield_map.shield[0][location[0] + location[1] * 28])
+
+        # Without destructors nothing hits the units, so the simulator's shields follow path_shield frame by frame
+        for location in list(game.game_map):
+            if game.contains_stationary_unit(location) and game.contains_stationary_unit(location).unit_type == "DF":
+                game.game_map.remove_unit(location)
+        for unit_type, location in (("PI", [13, 0]), ("EI", [3, 10]), ("SI", [20, 6])):
+            if game.contains_stationary_unit(location):
+                continue
+            recorded = [0.0]
+            ActionPhaseSimulator.from_game_state(game).simulate(
+                [(unit_type, location[0], location[1])],
+                on_frame=lambda frame, units: recorded.extend(unit.shield for unit in units if unit.unit_id == "sim-0-0"))
+            path = game.find_path_to_edge(location, game.game_map.TOP_RIGHT if location[0] < 14 else game.game_map.TOP_LEFT)
+            shields = game.shield_map().path_shield(path, game.config["unitInformation"][[3, 4, 5][["PI", "EI", "SI"].index(unit_type)]]["speed"])
+            self.assertEqual([round(shield, 9) for shield in recorded], [round(shield, 9) for shield in shields[:len(recorded)]])
+            self.assertGreater(max(shields), 0)
+
+    def test_path_damage(self, adv=False):
+        rng = random.Random(3)
+        for _ in range(4):
+            game = self.make_turn_0_map(adv)
+            for location in game.game_map:
+                roll = rng.random()
+                if location[1] >= 14 and roll < 0.08:
+                    game.game_map.add_unit("DF", location, 1)
+                elif 3 < location[1] < 14 and roll < 0.05:
+                    game.game_map.add_unit("EF", location, 0)
+            # Destructors that cannot die, so the board stays as path_damage assumes
+            for unit in game.game_map.units():
+                unit.stability = 1000.0
+
+            for unit_type, count in (("PI", 5), ("EI", 2), ("SI", 3)):
+                results = game.path_damage(unit_type, count)
+                self.assertEqual(len([location for location in game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT)
+                                      + game.game_map.get_edge_locations(game.game_map.BOTTOM_RIGHT) if not game.contains_stationary_unit(location)]),
+                                 len(results))
+                for result in results[::4]:
+                    self.assertEqual(game.find_path_to_edge(result.location, game.game_map.TOP_RIGHT if result.location[0] < 14 else game.game_map.TOP_LEFT), result.path)
+                    simulated = ActionPhaseSimulator.from_game_state(game).simulate([(unit_type, result.location[0], result.location[1])] * count)
+                    self.assertEqual(len(simulated.breaches), result.breaches)
+                    self.assertEqual(simulated.breaches[0][0] if simulated.breaches else None, result.frames if result.breaches else None)
+                    self.assertEqual(result.survivors / count, result.survival)
+
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("FF", [13, 0])
+        self.assertEqual([None], [result.path for result in game.path_damage("PI", locations=[[13, 0]])])
+        open_board = game.path_damage("PI", 3, [[14, 0]])[0]
+        self.assertEqual((3, 1.0, 3, 0.0, 0.0), (open_board.survivors, open_board.survival, open_board.breaches, open_board.damage_taken, open_board.shielding))
+        self.assertEqual(2 * len(open_board.path), open_board.frames, "A ping should take 1 / speed frames per tile")
+
+    def make_quadrant_state(self, seed, firewalls=120):
+        state = json.loads(TURN_0)
+        rng = random.Random(seed)
+        locations = list(self.make_turn_0_map().game_map)
+        stabilities = [60.0, 30.0, 75.0]
+        for i, (x, y) in enumerate(rng.sample(locations, firewalls)):
+            type_index = rng.randint(0, 2)
+            units = state["p1Units" if y < 14 else "p2Units"][type_index]
+            units.append([x, y, round(stabilities[type_index] * rng.uniform(0.1, 1.0), 1), str(i)])
+        return state
+
+    def test_quadrant_analyzer(self, adv=False):
+        import algo_strategy
+
+        def old_quadrant(x, y):
+            # The branches of the quadrant analyzer before it had a lookup table
+            if y < 14:
+                if 8 < x < 19:
+                    return 0 if y <= 8 else 1
+                return 2 if x <= 8 else 3
+            if 8 < x < 19:
+                return 4 if y >= 19 else 5
+            return 6 if x <= 8 else 7
+
+        game = (AdvancedGameState if adv else GameState).from_state(json.loads(CONFIG), self.make_quadrant_state(5))
+        unit_information = game.config["unitInformation"]
+        analyzer = algo_strategy.Quadrant()
+        tiles = [0] * 8
+        for x, y in game.game_map:
+            tiles[old_quadrant(x, y)] += 1
+            self.assertEqual(old_quadrant(x, y), analyzer.get_quadrant_for_location(x, y))
+        self.assertEqual(tuple(tiles), analyzer.tile_counts)
+        self.assertEqual(420, sum(analyzer.tile_counts))
+
+        # The numerators of the old compute_quadrant_strengths and compute_quadrant_danger
+        strength_numerators = [0.0] * 8
+        danger_numerators = [0.0] * 8
+        for unit in game.get_all_units_of_type('firewall', 'me') + game.get_all_units_of_type('firewall', 'enemy'):
+            quad = old_quadrant(unit.x, unit.y)
+            strength_numerators[quad] += unit.stability / unit_information[["FF", "EF", "DF"].index(unit.unit_type)]["stability"]
+            if unit.unit_type == "DF":
+                danger_numerators[quad] += unit.stability / unit_information[2]["stability"] * unit_information[2]["damage"]
+        strengths, dangers = analyzer.analyze(game)
+        analyzer.assign_all_firewalls_to_quadrants(game)
+        for quad in analyzer.all_quadrants:
+            self.assertAlmostEqual(strength_numerators[quad], strengths[quad] * tiles[quad])
+            self.assertAlmostEqual(danger_numerators[quad], dangers[quad] * tiles[quad])
+        self.assertTrue(any(danger_numerators))
+        self.assertEqual(sorted(strengths.values()), sorted(analyzer.compute_quadrant_strengths(game).values()))
+        self.assertEqual(sorted(dangers.values()), sorted(analyzer.compute_quadrant_danger(game).values()))
+
+    def test_quadrant_running_sums(self, adv=False):
+        import algo_strategy
+        config = json.loads(CONFIG)
+        rng = random.Random(9)
+        locations = list(self.make_turn_0_map().game_map)
+        state = self.make_quadrant_state(9, 60)
+        analyzer = algo_strategy.Quadrant()
+        for turn in range(12):
+            # A fresh copy each turn, like a newly parsed turn message
+            state = copy.deepcopy(state)
+            units = [(key, type_index, unit) for key in ("p1Units", "p2Units") for type_index in range(3) for unit in state[key][type_index]]
+            for key, type_index, unit in rng.sample(units, 6):
+                state[key][type_index].remove(unit)
+            for key, type_index, unit in rng.sample(units, 6):
+                unit[2] = round(unit[2] * rng.uniform(0.2, 1.0), 1)
+            taken = {(unit[0], unit[1]) for key, type_index, unit in units}
+            for x, y in rng.sample([location for location in locations if tuple(location) not in taken], 8):
+                state["p1Units" if y < 14 else "p2Units"][rng.randint(0, 2)].append([x, y, 20.0, "{}-{}".format(turn, x + y * 28)])
+            rng.shuffle(state["p2Units"][turn % 3])
+            if turn == 7:
+                state["p1Units"][0] = []
+
+            expected = analyzer.analyze((AdvancedGameState if adv else GameState).from_state(config, state))
+            strengths, dangers = analyzer.update(config, state)
+            for quad in analyzer.all_quadrants:
+                self.assertAlmostEqual(expected[0][quad], strengths[quad], msg="Strength of quadrant {} on turn {}".format(quad, turn))
+                self.assertAlmostEqual(expected[1][quad], dangers[quad], msg="Danger of quadrant {} on turn {}".format(quad, turn))
+        other_config = json.loads(CONFIG)
+        strengths, dangers = analyzer.update(other_config, state)
+        for quad in analyzer.all_quadrants:
+            self.assertAlmostEqual(expected[0][quad], strengths[quad])
+            self.assertAlmostEqual(expected[1][quad], dangers[quad])
+        self.assertIs(other_config, analyzer._weights[0], "The analyzer should only keep the weights of the last config")
+
+        checked = algo_strategy.Quadrant(check=True)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.assertEqual(expected, checked.update(config, state))
+            self.assertEqual([], caught, "The running sums should match analyze")
+            checked.strength_sums[checked.MY_LEFT] += 1.0
+            self.assertEqual(expected, checked.update(config, state), "Check mode should return the recomputed values")
+            self.assertEqual(1, len(caught))
+            self.assertEqual(expected, checked.update(config, state), "Check mode should have started the sums again")
+            self.assertEqual(1, len(caught))
+
+    @unittest.skipUnless(numpy, "NumPy is not installed")
+    def test_unit_store(self, adv=False):
+        from .unit_store import UnitStore
+        rng = random.Random(5)
+        for _ in range(10):
+            board = AdvancedGameState(json.loads(CONFIG), TURN_0)
+            for location in board.game_map:
+                roll = rng.random()
+                player_index = 0 if location[1] < 14 else 1
+                if roll < 0.15:
+                    board.game_map.add_unit(rng.choice(["FF", "DF", "DF"]), location, player_index)
+                elif roll < 0.25 and 10 <= location[1] <= 17:
+                    for _ in range(rng.randint(1, 2)):
+                        board.game_map.add_unit(rng.choice(["PI", "EI", "SI"]), location, rng.randint(0, 1))
+                else:
+                    continue
+                for unit in board.game_map[location]:
+                    unit.stability = float(rng.randint(1, 4) * 5)
+
+            store = UnitStore.from_game_map(board.game_map)
+            units = store.to_units()
+            originals = [unit for location in board.game_map for unit in board.game_map[location]]
+            self.assertEqual([str(unit) for unit in originals], [str(unit) for unit in units])
+            self.assertGreater(len(store), 50)
+
+            # Pings and EMPs follow get_target exactly
+            attackers = [index for index, unit in enumerate(units) if unit.unit_type in ("PI", "EI")]
+            targets = store.select_targets(attackers)
+            for index, target in zip(attackers, targets):
+                expected = board.get_target(originals[index])
+                self.assertEqual(None if expected is None else originals.index(expected), None if target < 0 else target)
+
+            # A whole frame of attacks matches the simulator, which has no shields or moves on the first frame
+            dealt = store.attack()
+            store.remove_dead()
+            simulated = ActionPhaseSimulator.from_game_state(board).simulate(max_frames=1)
+            self.assertEqual(simulated.damage_dealt, dealt)
+            self.assertEqual(sorted(str(unit) for unit in simulated.survivors), sorted(str(unit) for unit in store.to_units()))
+            self.assertEqual(len(simulated.deaths), int((~store.alive).sum()))
+
+        store = UnitStore(json.loads(CONFIG))
+        self.assertEqual(([], []), (store.select_targets().tolist(), store.to_units()))
+
+    def test_unit_types(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        config = game.config
+        destructor = GameUnit("DF", config, 0, None, 3, 12)
+        self.assertEqual((True, 0, 4.0, 3.0, 75.0, 75.0, 3), (destructor.stationary, destructor.speed, destructor.damage,
+                         destructor.range, destructor.max_stability, destructor.stability, destructor.cost))
+        self.assertEqual(10.0, GameUnit("EF", config).damage, "Encryptors should report their shield amount as damage")
+        emp = GameUnit("EI", config, 1, 2.0)
+        self.assertEqual(("EI", False, 0.25, 3.0, 3.0, 5.0, 2.0, 1), (emp.unit_type, emp.stationary, emp.speed, emp.damage_f,
+                         emp.damage_i, emp.range, emp.stability, emp.player_index))
+        self.assertFalse(hasattr(emp, "damage"), "Information units have no firewall damage")
+        self.assertIs(emp.config, config)
+
+        self.assertIs(GameUnit("EI", config).type_info, emp.type_info, "Units of one type should share their stats")
+        self.assertIsNot(GameUnit("EI", json.loads(CONFIG)).type_info, emp.type_info, "Each config should get its own stats")
+        with self.assertRaises(AttributeError):
+            emp.type_info.range = 10
+        with self.assertRaises(AttributeError):
+            emp.shield = 10
+        copied = copy.deepcopy(emp)
+        self.assertIs(copied.type_info, emp.type_info)
+        self.assertEqual(str(emp), str(pickle.loads(pickle.dumps(emp))))
+
+        # Stats can still be set per unit, without changing the other units of the type
+        destructor.damage = 8.0
+        destructor.range = 4.5
+        self.assertEqual((8.0, 4.5, 75.0), (destructor.damage, destructor.range, destructor.max_stability))
+        self.assertEqual((4.0, 3.0), (GameUnit("DF", config).damage, GameUnit("DF", config).range))
+        unpickled = pickle.loads(pickle.dumps(destructor))
+        self.assertEqual((8.0, 4.5, "DF"), (unpickled.damage, unpickled.range, unpickled.unit_type))
+        shared = pickle.loads(pickle.dumps([GameUnit("DF", config), GameUnit("DF", config)]))
+        self.assertIs(shared[0].type_info, shared[1].type_info, "Unpickled units should share their stats again")
+
+        # The shared records of a config are dropped with the last unit of the config
+        other_config = json.loads(CONFIG)
+        key = id(other_config)
+        units = [GameUnit("PI", other_config), GameUnit("FF", other_config)]
+        self.assertIn(key, unit_module._unit_types)
+        del units, other_config
+        gc.collect()
+        self.assertNotIn(key, unit_module._unit_types, "The cache of unit types kept an unused config alive")
+
     def test_get_units(self, adv=False):
         game = self.make_turn_0_map(adv)
         self.assertEqual(0, len(game.game_map[13,13]), "There should not be a unit on this location")
@@ -188,6 +819,21 @@ class BasicTests(unittest.TestCase):
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
         self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3)), "Wrong number of tiles in range")
 
+    def test_range_stencils(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game_map = game.game_map
+        for radius in (0, 1, 3, 4.5, 5):
+            for x, y in [[0, 13], [13, 0], [27, 14], [5, 10], [13, 13], [20, 24], [14, 27], [-3, 2]]:
+                expected = []
+                for i in range(int(x - radius), int(x + radius + 1)):
+                    for j in range(int(y - radius), int(y + radius + 1)):
+                        if game_map.in_arena_bounds([i, j]) and math.sqrt((x - i)**2 + (y - j)**2) < radius + 0.51:
+                            expected.append([i, j])
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    self.assertEqual(expected, game_map.get_locations_in_range([x, y], radius), "Wrong tiles in range {} of {}".format(radius, [x, y]))
+                    self.assertEqual([i + j * 28 for i, j in expected], list(game_map.get_indices_in_range([x, y], radius)))
+
     def _test_get_attackers(self):
         game = self.make_turn_0_map(True)
         
@@ -236,6 +882,204 @@ class BasicTests(unittest.TestCase):
         self.future_turn_testing_function(game, 17.9, 19)
         self.future_turn_testing_function(game, 18.9, 20)
 
+    def make_random_map(self, seed, density, adv=False):
+        game = self.make_turn_0_map(adv)
+        rng = random.Random(seed)
+        for location in game.game_map:
+            if rng.random() < density:
+                game.game_map.add_unit("FF", location, 0 if location[1] < game.HALF_ARENA else 1)
+        return game
+
+    def test_path_engine_matches_reference(self, adv=False):
+        reference = ShortestPathFinder()
+        engine = PathEngine()
+        for seed in range(6):
+            game = self.make_random_map(seed, 0.1 + 0.05 * seed, adv)
+            for edge in range(4):
+                end_points = game.game_map.get_edge_locations(edge)
+                for start in game.game_map.get_edge_locations((edge + 2) % 4) + [[13, 13], [6, 10]]:
+                    expected = reference.navigate_multiple_endpoints(start, end_points, game)
+                    got = engine.navigate_multiple_endpoints(start, end_points, game)
+                    self.assertEqual(expected, got, "Path from {} to edge {} differs on board {}".format(start, edge, seed))
+
+    def test_path_field_matches_find_path(self, adv=False):
+        for seed in range(2):
+            game = self.make_random_map(seed, 0.2 + 0.1 * seed, adv)
+            for edge in range(4):
+                field = game.path_field(edge)
+                self.assertIs(field, game.path_field(edge), "The field should be reused while the board is unchanged")
+                for start in game.game_map:
+                    if game.contains_stationary_unit(start):
+                        self.assertIsNone(field.get_path(start))
+                        continue
+                    self.assertEqual(game.find_path_to_edge(start, edge), field.get_path(start), "Path from {} to edge {} differs on board {}".format(start, edge, seed))
+            free = next(location for location in game.game_map if not game.contains_stationary_unit(location))
+            game.game_map.add_unit("FF", free, 0)
+            self.assertIsNone(game.path_field(edge).get_path(free), "The field should follow changes to the board")
+
+    def test_path_field_incremental_repair(self, adv=False):
+        rng = random.Random(5)
+        for seed in range(3):
+            game = self.make_random_map(seed, 0.25, adv)
+            fields = [game.path_field(edge) for edge in range(4)]
+            locations = list(game.game_map)
+            for _ in range(60):
+                location = rng.choice(locations)
+                if game.contains_stationary_unit(location):
+                    game.game_map.remove_unit(location)
+                else:
+                    game.game_map.add_unit("DF", location, 0 if location[1] < game.HALF_ARENA else 1)
+                for edge, field in enumerate(fields):
+                    self.assertIs(field, game.path_field(edge), "The field should be repaired, not rebuilt")
+                    expected = PathField(field.blocked, game.game_map.get_edge_locations(edge))
+                    self.assertEqual(list(expected.pathlength), list(field.pathlength), "Repair after changing {} differs from a full search".format(location))
+            for edge, field in enumerate(fields):
+                for start in locations[::7]:
+                    if not game.contains_stationary_unit(start):
+                        self.assertEqual(game.find_path_to_edge(start, edge), field.get_path(start))
+
+    def test_path_overlay(self, adv=False):
+        game = self.make_random_map(2, 0.2, adv)
+        game.path_cache = PathCache()
+        rng = random.Random(2)
+        locations = list(game.game_map)
+        fingerprint = game.game_map.fingerprint
+        for _ in range(30):
+            blocked = [location for location in rng.sample(locations, 4) if not game.contains_stationary_unit(location)]
+            unblocked = [location for location in rng.sample(locations, 40) if game.contains_stationary_unit(location)][:3]
+            overlay = game.with_overlay(blocked=blocked, unblocked=unblocked)
+            starts = [location for location in game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT) if not overlay.contains_stationary_unit(location)]
+            paths = [overlay.find_path_to_edge(start, game.game_map.TOP_RIGHT) for start in starts]
+            self.assertEqual(fingerprint, game.game_map.fingerprint, "The overlay changed the game state")
+
+            removed = [(location, game.game_map[location]) for location in unblocked]
+            for location in unblocked:
+                game.game_map.remove_unit(location)
+            for location in blocked:
+                game.game_map.add_unit("FF", location)
+            self.assertEqual(overlay.fingerprint, game.game_map.fingerprint, "The overlay fingerprint should match the changed board")
+            self.assertEqual([game.find_path_to_edge(start, game.game_map.TOP_RIGHT) for start in starts], paths)
+            for location in blocked:
+                game.game_map.remove_unit(location)
+            for location, units in removed:
+                game.game_map[tuple(location)] = units
+            self.assertEqual(fingerprint, game.game_map.fingerprint)
+
+    def test_path_overlay_fractional_locations(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            overlay = game.with_overlay(blocked=[[13.5, 1]], unblocked=[[13.5, 2]])
+            self.assertEqual(2, len(caught), "Fractional locations should be skipped with a warning")
+            self.assertEqual(([], [], game.game_map.fingerprint), (overlay.blocked, overlay.unblocked, overlay.fingerprint))
+            self.assertFalse(overlay.contains_stationary_unit([13, 1]))
+            self.assertFalse(overlay.contains_stationary_unit([13.5, 1]))
+            self.assertFalse(game.can_spawn("FF", [13.5, 1]))
+            self.assertIsNone(overlay.find_path_to_edge([13.5, 0], game.game_map.TOP_RIGHT))
+            self.assertEqual(3, len(caught))
+        overlay = game.with_overlay(blocked=[[13.0, 1.0]])
+        self.assertEqual([[13, 1]], overlay.blocked)
+        expected = game.with_overlay(blocked=[[13, 1]]).find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)
+        self.assertEqual(expected[1:], overlay.find_path_to_edge([13.0, 0.0], game.game_map.TOP_RIGHT)[1:])
+
+    def test_bitboard(self, adv=False):
+        game = self.make_random_map(4, 0.2, adv)
+        self.assertEqual(420, bitboard.count(bitboard.ARENA_MASK), "The arena should have 420 tiles")
+        for edge in range(4):
+            self.assertEqual(sorted(game.game_map.get_edge_locations(edge)), sorted(bitboard.to_locations(bitboard.EDGE_MASKS[edge])))
+        self.assertEqual(4, bitboard.count(bitboard.expand(bitboard.location_bit([13, 13]))))
+        self.assertEqual(2, bitboard.count(bitboard.expand(bitboard.location_bit([0, 13]))), "Expansion should not wrap around rows")
+
+        blocked = bitboard.from_game_map(game.game_map)
+        copied = bitboard.to_game_map(blocked, GameState(json.loads(CONFIG), TURN_0).game_map, "FF")
+        self.assertEqual(blocked, bitboard.from_game_map(copied))
+
+        open_bits = bitboard.ARENA_MASK & ~blocked
+        for start in list(game.game_map)[::7]:
+            if blocked & bitboard.location_bit(start):
+                continue
+            pocket = bitboard.flood_fill(bitboard.location_bit(start), open_bits)
+            reaches = [bool(pocket & bitboard.EDGE_MASKS[edge]) for edge in range(4)]
+            self.assertEqual([game.path_field(edge).reaches_edge(start) for edge in range(4)], reaches)
+            layers = bitboard.distance_layers(bitboard.EDGE_MASKS[0], open_bits)
+            if reaches[0]:
+                self.assertEqual(len(game.find_path_to_edge(start, 0)) - 1, [bool(layer & bitboard.location_bit(start)) for layer in layers].index(True))
+
+    def test_path_cache(self, adv=False):
+        game = self.make_random_map(3, 0.1, adv)
+        game.path_cache = PathCache(maxsize=2)
+        path = game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)
+        self.assertEqual(path, game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT))
+        self.assertEqual((1, 1), (game.path_cache.hits, game.path_cache.misses), "The second query should be a hit")
+
+        fingerprint = game.game_map.fingerprint
+        self.assertEqual(1, game.attempt_spawn("FF", path[2]), "Could not block the path")
+        self.assertNotEqual(fingerprint, game.game_map.fingerprint, "Spawning a firewall should change the fingerprint")
+        self.assertNotEqual(path, game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT), "The cache returned a path through a firewall")
+        self.assertEqual(2, game.path_cache.misses)
+
+        game.game_map.remove_unit(path[2])
+        self.assertEqual(fingerprint, game.game_map.fingerprint, "Removing the firewall should restore the fingerprint")
+        game.game_map.refresh_fingerprint()
+        self.assertEqual(fingerprint, game.game_map.fingerprint, "The incremental fingerprint is out of sync")
+        self.assertEqual(path, game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT))
+        self.assertEqual(2, game.path_cache.hits, "The path on the restored board should still be cached")
+
+        expected = copy.deepcopy(path)
+        game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)[1][0] += 1
+        self.assertEqual(expected, game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT), "Changing a returned path changed the cache")
+        overlay = game.with_overlay(blocked=[[5, 12]])
+        overlay_path = copy.deepcopy(overlay.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT))
+        overlay.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)[1][0] += 1
+        self.assertEqual(overlay_path, overlay.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT))
+        batch = game.find_paths_batch([([13, 0], game.game_map.TOP_RIGHT), ([13, 0], game.game_map.TOP_RIGHT)])
+        batch[0][1][0] += 1
+        self.assertEqual(expected, batch[1])
+
+        game.find_path_to_edge([14, 0], game.game_map.TOP_LEFT)
+        self.assertEqual(2, len(game.path_cache), "The cache grew past its maxsize")
+        game.path_cache.reset_stats()
+        self.assertEqual(0, game.path_cache.stats()['hits'])
+
+    def test_find_paths_batch(self, adv=False):
+        game = self.make_random_map(4, 0.15, adv)
+        game.path_cache = PathCache()
+        queries = []
+        for start_edge, target_edge in ((2, 0), (3, 1), (1, 3), (0, 2)):
+            queries += [(location, target_edge) for location in game.game_map.get_edge_locations(start_edge)[::3]]
+        queries.append(queries[0])
+        reference = ShortestPathFinder()
+        expected = []
+        for start, target_edge in queries:
+            if game.contains_stationary_unit(start):
+                expected.append(None)
+            else:
+                expected.append(reference.navigate_multiple_endpoints(start, game.game_map.get_edge_locations(target_edge), game))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.assertEqual(expected, game.find_paths_batch(queries, workers=3, min_parallel=0), "Threaded batch paths are wrong or out of order")
+            self.assertEqual(expected, game.find_paths_batch(queries), "Cached batch paths are wrong")
+            game.path_cache.clear()
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                self.assertEqual(expected, game.find_paths_batch(queries, executor, min_parallel=0), "Process pool batch paths are wrong or out of order")
+            game.path_cache.clear()
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                submitted = []
+                pool_map = executor.map
+                executor.map = lambda *args: submitted.append(args) or pool_map(*args)
+                self.assertEqual(expected, game.find_paths_batch(queries, executor))
+                self.assertEqual([], submitted, "Small batches should be searched without the executor")
+
+        # One GameState and one ShortestPathFinder shared by several threads
+        game.path_cache.clear()
+        open_queries = [query for query, path in zip(queries, expected) if path is not None]
+        open_expected = [path for path in expected if path is not None]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            self.assertEqual(open_expected, list(pool.map(lambda query: game.find_path_to_edge(*query), open_queries)))
+            self.assertEqual(open_expected, list(pool.map(
+                lambda query: reference.navigate_multiple_endpoints(query[0], game.game_map.get_edge_locations(query[1]), game), open_queries)))
+
     def future_turn_testing_function(self, game, expected, turns):
         actual = game.project_future_bits(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} power {} turns from now, got {}".format(expected, turns, actual))
@@ -0,0 +1,128 @@
+from array import array
+
+from .arena import ARENA_SIZE, indices_in_range
+
+
+class ThreatMap:
+    """The damage destructors deal each frame to a unit standing on each tile, for both players
+
+    The map is built in one pass over the board by adding each destructor's damage to every tile
+    in its range, and kept up to date per tile after that: mark_changed records the tiles whose
+    firewall was added or removed and update restamps only those. GameState.threat_map registers
+    mark_changed as a GameMap blocked listener, so firewalls placed with attempt_spawn or
+    add_unit / remove_unit are picked up automatically.
+
+    Replacing a firewall with another one on the same tile, or changing stability in place, does
+    not notify the listeners. Call rebuild after doing either.
+
+    Attributes:
+        * config (JSON): Contains information about the game
+        * stability_weighted (bool): Whether each destructor's damage is scaled by its stability / max stability
+        * damage (tuple): For each player, [you, enemy], an array indexed by tile index (x + y * ARENA_SIZE)
+          of the damage per frame enemy destructors deal to a unit of that player on the tile
+        * attackers (tuple): For each player, an array indexed by tile index of the number of enemy destructors
+          that reach the tile, the length of AdvancedGameState.get_attackers
+
+    """
+    def __init__(self, config, stability_weighted=False):
+        """Sets up an empty map, see rebuild
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * stability_weighted: Scale each destructor's damage by the fraction of its stability it has left
+
+        """
+        self.config = config
+        self.stability_weighted = stability_weighted
+        destructor = config["unitInformation"][2]
+        self.__destructor = destructor["shorthand"]
+        self.__damage = destructor["damage"]
+        self.__range = destructor["range"]
+        self.damage = (array('d', [0.0] * (ARENA_SIZE * ARENA_SIZE)), array('d', [0.0] * (ARENA_SIZE * ARENA_SIZE)))
+        self.attackers = (array('l', [0] * (ARENA_SIZE * ARENA_SIZE)), array('l', [0] * (ARENA_SIZE * ARENA_SIZE)))
+        # The (defending player, weight) stamped by the destructor on each tile, to take it back off when it goes
+        self.__stamps = {}
+        self.__changed = set()
+
+    def __weight(self, unit):
+        if self.stability_weighted:
+            return self.__damage * unit.stability / unit.max_stability
+        return self.__damage
+
+    def __stamp(self, x, y, unit):
+        defender = 1 - unit.player_index
+        weight = self.__weight(unit)
+        damage, attackers = self.damage[defender], self.attackers[defender]
+        for index in indices_in_range(x, y, self.__range):
+            damage[index] += weight
+            attackers[index] += 1
+        self.__stamps[x + y * ARENA_SIZE] = (defender, weight)
+
+    def __unstamp(self, x, y):
+        defender, weight = self.__stamps.pop(x + y * ARENA_SIZE)
+        damage, attackers = self.damage[defender], self.attackers[defender]
+        for index in indices_in_range(x, y, self.__range):
+            attackers[index] -= 1
+            # Exactly zero once the last destructor is gone, whatever rounding the weights left behind
+            damage[index] = damage[index] - weight if attackers[index] else 0.0
+
+    def __destructor_at(self, game_map, x, y):
+        for unit in game_map[x, y]:
+            if unit.unit_type == self.__destructor:
+                return unit
+
+    def rebuild(self, game_map):
+        """Computes the whole map from the destructors of a board
+
+        Args:
+            * game_map: The GameMap to read
+
+        """
+        for values in self.damage + self.attackers:
+            values[:] = array(values.typecode, [0] * len(values))
+        self.__stamps.clear()
+        self.__changed.clear()
+        for unit in game_map.units():
+            if unit.unit_type == self.__destructor:
+                self.__stamp(unit.x, unit.y, unit)
+
+    def mark_changed(self, location, blocked=None, fingerprint=None):
+        """Records that the firewall of a tile was added or removed, for the next update
+
+        Takes the arguments of a GameMap blocked listener, so it can be registered with add_blocked_listener.
+
+        Args:
+            * location: The tile that changed
+            * blocked: Unused, the tile is read again by update
+            * fingerprint: Unused
+
+        """
+        self.__changed.add((location[0], location[1]))
+
+    def update(self, game_map):
+        """Restamps the tiles recorded by mark_changed since the last update or rebuild
+
+        Args:
+            * game_map: The GameMap the changes were made to
+
+        """
+        for x, y in self.__changed:
+            if x + y * ARENA_SIZE in self.__stamps:
+                self.__unstamp(x, y)
+            unit = self.__destructor_at(game_map, x, y)
+            if unit is not None:
+                self.__stamp(x, y, unit)
+        self.__changed.clear()
+
+    def damage_at(self, location, player_index):
+        """Gets the damage per frame a unit of a player would take from destructors at a location
+
+        Args:
+            * location: The location of a hypothetical unit
+            * player_index: The player controlling the unit, 0 for you 1 for the enemy
+
+        Returns:
+            The damage per frame, 0 outside the range of every enemy destructor
+
+        """
+        return self.damage[player_index][location[0] + location[1] * ARENA_SIZE]
@@ -1,8 +1,137 @@
+import weakref
+
+
 def is_stationary(unit_type, firewall_types):
     return unit_type in firewall_types
 
+
+class UnitType:
+    """The stats shared by every unit of one type, read once from the config
+
+    Records are immutable and shared: get_unit_type returns the same record for a config and
+    unit type every time, so units only need to hold a reference to it. A unit whose stats are
+    set by hand gets its own copy of the record, see GameUnit.
+
+    Attributes:
+        * unit_type (string): The shorthand of the type
+        * config (JSON): The config the stats were read from
+        * stationary (bool): Whether or not this type is a firewall
+        * speed (float): A unit will move once every 1/speed frames
+        * damage (int): The damage dealt to enemy information, or the shield amount for encryptors. Firewalls only.
+        * damage_f (int): The damage dealt to enemy firewalls. Information only.
+        * damage_i (int): The damage dealt to enemy information. Information only.
+        * range (float): The effective range of this type
+        * max_stability (float): The starting health of this type
+        * cost (int): The resource cost of this type
+
+    """
+    __slots__ = ('unit_type', 'config', 'stationary', 'speed', 'damage', 'damage_f', 'damage_i', 'range', 'max_stability', 'cost', '_table')
+
+    def __init__(self, unit_type, config, table=None):
+        unit_information = config["unitInformation"]
+        shorthands = [type_config.get("shorthand") for type_config in unit_information]
+        # The first three types of the config are the firewalls, the second one is the encryptor
+        stationary = is_stationary(unit_type, shorthands[:3])
+        type_config = unit_information[shorthands.index(unit_type)]
+        stats = {'unit_type': unit_type, 'config': config, 'stationary': stationary}
+        if stationary:
+            stats['speed'] = 0
+            if unit_type == shorthands[1]:
+                stats['damage'] = type_config["shieldAmount"]
+            else:
+                stats['damage'] = type_config["damage"]
+        else:
+            stats['speed'] = type_config["speed"]
+            stats['damage_f'] = type_config["damageF"]
+            stats['damage_i'] = type_config["damageI"]
+        stats['range'] = type_config["range"]
+        stats['max_stability'] = type_config["stability"]
+        stats['cost'] = type_config["cost"]
+        # The shared records of the config, kept alive by its records so get_unit_type keeps returning them
+        stats['_table'] = table
+        for name, value in stats.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UnitType records are shared between units and cannot be changed")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        if self._table is not None:
+            return (get_unit_type, (self.config, self.unit_type))
+        return (_unit_type_from_stats, (self._stats(),))
+
+    def _stats(self):
+        return {name: getattr(self, name) for name in self.__slots__ if hasattr(self, name)}
+
+    def _replace(self, **stats):
+        """Gets an unshared copy of this record with some stats changed
+        """
+        changed = self._stats()
+        changed.update(stats)
+        changed['_table'] = None
+        return _unit_type_from_stats(changed)
+
+
+def _unit_type_from_stats(stats):
+    record = object.__new__(UnitType)
+    for name, value in stats.items():
+        object.__setattr__(record, name, value)
+    return record
+
+
+class _UnitTypeTable(dict):
+    """The shared records of one config, by unit type. Holds the config so its id cannot be reused while the table lives
+    """
+    def __init__(self, config):
+        super().__init__()
+        self.config = config
+
+
+# id(config) -> _UnitTypeTable. Tables are only kept while units or records of the config are alive, so
+# configs that are no longer used are freed, by the garbage collector since records and their table form a cycle
+_unit_types = weakref.WeakValueDictionary()
+# The table of the last config looked up, checked first since units are nearly always built with the same config
+_last_table = lambda: None
+
+
+def get_unit_type(config, unit_type):
+    """Gets the shared UnitType record of a unit type, building it the first time it is asked for
+
+    Args:
+        * config (JSON): Contains information about the game
+        * unit_type (string): The shorthand of the unit type
+
+    Returns:
+        The UnitType for unit_type under config
+
+    """
+    global _last_table
+    table = _last_table()
+    if table is None or table.config is not config:
+        table = _unit_types.get(id(config))
+        if table is None or table.config is not config:
+            table = _unit_types[id(config)] = _UnitTypeTable(config)
+        _last_table = weakref.ref(table)
+    record = table.get(unit_type)
+    if record is None:
+        record = table[unit_type] = UnitType(unit_type, config, table)
+    return record
+
+
 class GameUnit:
-    """Holds information about a Unit. 
+    """Holds information about a Unit.
+
+    Units only store their own state. Their stats live in a UnitType record shared by all
+    units of the same type, and are read through properties. Setting a stat on a unit, for
+    example unit.damage = 5, gives that unit its own copy of the record, so other units of
+    the type are not changed. Units have __slots__, so attributes that are not listed here
+    cannot be added to them.
 
     Attributes:
         * unit_type (string): This unit's type
@@ -19,38 +148,103 @@ class GameUnit:
         * range (float): The effective range of this unit
         * stability (float): The current health of this unit
         * cost (int): The resource cost of this unit
+        * unit_id (string): The id the engine gave this unit, None for units that were not read from the engine
+        * type_info (:obj: UnitType): The shared stats of this unit's type
 
     """
-    def __init__(self, unit_type, config, player_index=None, stability=None, x=-1, y=-1):
+    __slots__ = ('type_info', 'player_index', 'pending_removal', 'x', 'y', 'stability', 'unit_id')
+
+    def __init__(self, unit_type, config, player_index=None, stability=None, x=-1, y=-1, unit_id=None):
         """ Initialize unit variables using args passed
 
         """
-        self.unit_type = unit_type
-        self.config = config
+        self.type_info = get_unit_type(config, unit_type)
         self.player_index = player_index
         self.pending_removal = False
         self.x = x
         self.y = y
-        self.__serialize_type()
-        self.stability = self.max_stability if not stability else stability
-
-    def __serialize_type(self):
-        from .game_state import FIREWALL_TYPES, UNIT_TYPE_TO_INDEX, ENCRYPTOR
-        self.stationary = is_stationary(self.unit_type, FIREWALL_TYPES)
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        if self.stationary:
-            self.speed = 0
-            if self.unit_type == ENCRYPTOR:
-                self.damage = type_config["shieldAmount"]
-            else:
-                self.damage = type_config["damage"]
-        else:
-            self.speed = type_config["speed"]
-            self.damage_f = type_config["damageF"]
-            self.damage_i = type_config["damageI"]
-        self.range = type_config["range"]
-        self.max_stability = type_config["stability"]
-        self.cost = type_config["cost"]
+        self.stability = self.type_info.max_stability if not stability else stability
+        self.unit_id = unit_id
+
+    @property
+    def unit_type(self):
+        return self.type_info.unit_type
+
+    @unit_type.setter
+    def unit_type(self, value):
+        self.type_info = self.type_info._replace(unit_type=value)
+
+    @property
+    def config(self):
+        return self.type_info.config
+
+    @config.setter
+    def config(self, value):
+        self.type_info = self.type_info._replace(config=value)
+
+    @property
+    def stationary(self):
+        return self.type_info.stationary
+
+    @stationary.setter
+    def stationary(self, value):
+        self.type_info = self.type_info._replace(stationary=value)
+
+    @property
+    def speed(self):
+        return self.type_info.speed
+
+    @speed.setter
+    def speed(self, value):
+        self.type_info = self.type_info._replace(speed=value)
+
+    @property
+    def damage(self):
+        return self.type_info.damage
+
+    @damage.setter
+    def damage(self, value):
+        self.type_info = self.type_info._replace(damage=value)
+
+    @property
+    def damage_f(self):
+        return self.type_info.damage_f
+
+    @damage_f.setter
+    def damage_f(self, value):
+        self.type_info = self.type_info._replace(damage_f=value)
+
+    @property
+    def damage_i(self):
+        return self.type_info.damage_i
+
+    @damage_i.setter
+    def damage_i(self, value):
+        self.type_info = self.type_info._replace(damage_i=value)
+
+    @property
+    def range(self):
+        return self.type_info.range
+
+    @range.setter
+    def range(self, value):
+        self.type_info = self.type_info._replace(range=value)
+
+    @property
+    def max_stability(self):
+        return self.type_info.max_stability
+
+    @max_stability.setter
+    def max_stability(self, value):
+        self.type_info = self.type_info._replace(max_stability=value)
+
+    @property
+    def cost(self):
+        return self.type_info.cost
+
+    @cost.setter
+    def cost(self, value):
+        self.type_info = self.type_info._replace(cost=value)
 
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
@@ -62,4 +256,3 @@ class GameUnit:
 
     def __repr__(self):
         return self.__toString()
-
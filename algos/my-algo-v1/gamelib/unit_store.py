@@ -0,0 +1,243 @@
+"""
+A NumPy struct-of-arrays store of the units on the board, for resolving whole frames at once.
+
+NumPy is optional: gamelib does not import this module, so algos without NumPy installed are
+not affected. Import it directly with
+
+    from gamelib.unit_store import UnitStore
+"""
+
+import math
+
+import numpy as np
+
+from .arena import ARENA_SIZE, HALF_ARENA
+from .unit import GameUnit
+
+
+class UnitStore:
+    """Holds a set of units as parallel arrays, one entry per unit
+
+    Units keep their entry for the whole life of the store. Dead units are only marked in the alive
+    mask, so an entry index always refers to the same unit.
+
+    Attributes:
+        * config (JSON): Contains information about the game
+        * shorthands (list): The unit type of each type index, in config order
+        * x (ndarray): The x coordinate of each unit
+        * y (ndarray): The y coordinate of each unit
+        * stability (ndarray): The current health of each unit, shield included
+        * shield (ndarray): The part of stability that comes from encryptor shields
+        * type_index (ndarray): The index of the unit type of each unit in the config
+        * player_index (ndarray): The player that controls each unit. 0 for you, 1 for your opponent
+        * alive (ndarray): Whether or not each unit is still on the board
+        * unit_ids (list): The engine id of each unit, None for units that were not read from the engine
+
+    """
+    def __init__(self, config, units=()):
+        """Builds a store from a list of units
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * units: The GameUnits to store, in the order get_target would see them in
+
+        """
+        self.config = config
+        unit_information = config["unitInformation"]
+        self.shorthands = [type_config.get("shorthand") for type_config in unit_information]
+        # The last type marks removals, so it never has a unit
+        type_count = len(self.shorthands) - 1
+        stationary = np.zeros(type_count, dtype=bool)
+        stationary[:3] = True
+        self.__type_stationary = stationary
+        self.__type_range = np.array([unit_information[i].get("range", 0) for i in range(type_count)], dtype=np.float64)
+        # Encryptors shield instead of dealing damage
+        self.__type_damage = np.array([unit_information[i].get("damage", 0) if not i == 1 else 0 for i in range(type_count)], dtype=np.float64)
+        self.__type_damage_f = np.array([unit_information[i].get("damageF", 0) for i in range(type_count)], dtype=np.float64)
+        self.__type_damage_i = np.array([unit_information[i].get("damageI", 0) for i in range(type_count)], dtype=np.float64)
+        # A unit is in range if its center is within range + 0.51, compared on squared distances like arena.range_stencil
+        self.__type_reach = np.array([max(squared for squared in range(int(radius + 1) ** 2 + 1) if math.sqrt(squared) < radius + 0.51)
+                                      for radius in self.__type_range], dtype=np.int64)
+        self.__type_can_attack = ~stationary | (self.__type_damage > 0)
+        self.__scrambler = 5
+
+        units = list(units)
+        type_indices = {shorthand: index for index, shorthand in enumerate(self.shorthands)}
+        self.x = np.array([unit.x for unit in units], dtype=np.int64)
+        self.y = np.array([unit.y for unit in units], dtype=np.int64)
+        self.stability = np.array([unit.stability for unit in units], dtype=np.float64)
+        self.shield = np.zeros(len(units), dtype=np.float64)
+        self.type_index = np.array([type_indices[unit.unit_type] for unit in units], dtype=np.int64)
+        self.player_index = np.array([unit.player_index for unit in units], dtype=np.int64)
+        self.alive = np.ones(len(units), dtype=bool)
+        self.unit_ids = [unit.unit_id for unit in units]
+
+    @classmethod
+    def from_game_map(cls, game_map):
+        """Builds a store with every unit on a GameMap
+
+        Args:
+            * game_map: The GameMap to read
+
+        Returns:
+            A UnitStore
+
+        """
+        units = []
+        for location in game_map:
+            units.extend(game_map[location])
+        return cls(game_map.config, units)
+
+    def __len__(self):
+        return len(self.x)
+
+    def to_units(self, alive_only=True):
+        """Builds GameUnits from the store
+
+        Args:
+            * alive_only: Leave out the units that died
+
+        Returns:
+            A list of GameUnits, in store order
+
+        """
+        units = []
+        for index in range(len(self)):
+            if alive_only and not self.alive[index]:
+                continue
+            unit = GameUnit(self.shorthands[self.type_index[index]], self.config, int(self.player_index[index]), None,
+                            int(self.x[index]), int(self.y[index]), self.unit_ids[index])
+            unit.stability = float(self.stability[index])
+            units.append(unit)
+        return units
+
+    @property
+    def stationary(self):
+        """Whether or not each unit is a firewall"""
+        return self.__type_stationary[self.type_index]
+
+    def attackers(self):
+        """Gets the units that attack each frame: living destructors and information units
+
+        Returns:
+            An array of entry indices
+
+        """
+        return np.flatnonzero(self.alive & self.__type_can_attack[self.type_index])
+
+    def in_range(self, attackers=None):
+        """Tests which living units are in range of each attacker
+
+        Uses the rule of GameMap.get_locations_in_range: a unit is in range if its tile center is
+        within the attackers range + 0.51.
+
+        Args:
+            * attackers: Entry indices of the attacking units, all attackers if not given
+
+        Returns:
+            A boolean array with one row per attacker and one column per entry
+
+        """
+        if attackers is None:
+            attackers = self.attackers()
+        return self.__in_range(attackers, self.__squared_distances(attackers))
+
+    def __squared_distances(self, attackers):
+        dx = self.x[None, :] - self.x[attackers, None]
+        dy = self.y[None, :] - self.y[attackers, None]
+        return dx * dx + dy * dy
+
+    def __in_range(self, attackers, squared_distances):
+        return (squared_distances <= self.__type_reach[self.type_index[attackers]][:, None]) & self.alive[None, :]
+
+    def select_targets(self, attackers=None):
+        """Picks the target of every attacker at once
+
+        Targets are picked with the priorities of AdvancedGameState.get_target: information units first,
+        then the nearest unit, the lowest stability, the lowest y and the furthest x from the center.
+        Remaining ties go to the unit get_target would have seen first. Destructors and scramblers
+        only attack information units.
+
+        Args:
+            * attackers: Entry indices of the attacking units, all attackers if not given
+
+        Returns:
+            An array with the entry index of each attackers target, -1 where there is none
+
+        """
+        if attackers is None:
+            attackers = self.attackers()
+        attackers = np.asarray(attackers, dtype=np.int64)
+        targets = np.full(len(attackers), -1, dtype=np.int64)
+        if not len(attackers) or not len(self):
+            return targets
+        stationary = self.stationary
+        attacker_types = self.type_index[attackers]
+        mobile_only = self.__type_stationary[attacker_types] | (attacker_types == self.__scrambler)
+        squared_distances = self.__squared_distances(attackers)
+        candidates = self.__in_range(attackers, squared_distances)
+        candidates &= self.player_index[None, :] != self.player_index[attackers, None]
+        candidates &= ~(mobile_only[:, None] & stationary[None, :])
+
+        # Sort the (attacker, candidate) pairs by attacker and then by priority, and keep the first pair of each attacker.
+        # get_target visits tiles by x then y, and the units of a tile in order, which breaks the remaining ties
+        rows, columns = np.nonzero(candidates)
+        if not len(rows):
+            return targets
+        x = self.x[columns]
+        y = self.y[columns]
+        order = (x * ARENA_SIZE + y) * len(self) + columns
+        ranked = np.lexsort((order, -np.abs(HALF_ARENA - 0.5 - x), y, self.stability[columns],
+                             squared_distances[rows, columns], stationary[columns], rows))
+        rows, columns = rows[ranked], columns[ranked]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+        targets[rows[first]] = columns[first]
+        return targets
+
+    def apply_damage(self, attackers, targets):
+        """Deals the damage of each attacker to its target, all at once
+
+        Destructors deal their damage, information units their damage_f to firewalls and damage_i to
+        information units. Shields are used up first.
+
+        Args:
+            * attackers: Entry indices of the attacking units
+            * targets: The entry index of each attackers target, -1 for none, as returned by select_targets
+
+        Returns:
+            The damage dealt by each player, [you, enemy]
+
+        """
+        attackers = np.asarray(attackers, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        hit = targets >= 0
+        attackers, targets = attackers[hit], targets[hit]
+        attacker_types = self.type_index[attackers]
+        damage = np.where(self.__type_stationary[attacker_types], self.__type_damage[attacker_types],
+                          np.where(self.stationary[targets], self.__type_damage_f[attacker_types], self.__type_damage_i[attacker_types]))
+        taken = np.zeros(len(self), dtype=np.float64)
+        np.add.at(taken, targets, damage)
+        self.stability -= taken
+        np.maximum(self.shield - taken, 0, out=self.shield)
+        return np.bincount(self.player_index[attackers], weights=damage, minlength=2)[:2].tolist()
+
+    def attack(self):
+        """Resolves the attacks of one frame: every attacker picks its target, then all damage is dealt
+
+        Returns:
+            The damage dealt by each player, [you, enemy]
+
+        """
+        attackers = self.attackers()
+        return self.apply_damage(attackers, self.select_targets(attackers))
+
+    def remove_dead(self):
+        """Marks the units without stability left as dead
+
+        Returns:
+            The entry indices of the units that died
+        """
+        dead = np.flatnonzero(self.alive & (self.stability <= 0))
+        self.alive[dead] = False
+        return dead
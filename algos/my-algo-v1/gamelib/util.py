@@ -4,6 +4,26 @@ import sys
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
 
+class StateMessage(str):
+    """A game state message from the engine, together with its parsed json
+
+    AlgoCore parses every message once to see what kind it is, and passes one of these to on_turn
+    and on_action_frame. GameState reads the parsed json from it instead of parsing the string again,
+    and everything else can keep treating it as the original string.
+
+    Attributes:
+        * state (dict): The parsed message. Shared by every GameState built from it, do not modify it
+
+    """
+    def __new__(cls, string, state):
+        message = super().__new__(cls, string)
+        message.state = state
+        return message
+
+    def __reduce__(self):
+        return (StateMessage, (str(self), self.state))
+
+
 def get_command():
     """Gets input from stdin
 